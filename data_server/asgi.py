@@ -0,0 +1,315 @@
+"""ASGI entry point for the ingest routes, using asyncpg and httpx.
+
+Serves /api/main, /api/wake (plus their /batch variants), /api/dead and
+/health with the same request and response shapes as the Flask app in
+main.py, for deployments where thousands of gateways hold connections open
+at once. Parsing, validation and the SOS rate-limit cache are shared through
+ingest.py. Query, export, latest and stream endpoints remain Flask-only; every
+commit is announced with NOTIFY on ingest.ROWS_CHANNEL so the Flask app's
+latest cache and stream subscribers see rows inserted here.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+
+import asyncpg
+import httpx
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from ingest import (MAIN_INGEST_COLUMNS, ROWS_CHANNEL, WAKE_COLUMNS, WAKE_BINARY_MIMETYPE, WATER_DETECTED_INDEX,
+                    BatchError, SosRateLimitCache, auto_sos_message, batch_summary, column_arrays, main_insert_sql,
+                    mark_duplicates, parse_batch, parse_main_row, parse_wake_binary, parse_wake_row,
+                    rows_notification)
+
+load_dotenv()
+
+DATABASE_URL = os.environ.get('DATABASE_URL')
+API_KEY = os.environ.get('API_KEY')
+BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', 10000))
+
+sos_rate_limit = SosRateLimitCache()
+
+
+def insert_sql(table, columns):
+    placeholders = ', '.join(f'${index}' for index in range(1, len(columns) + 1))
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+MAIN_INSERT_SQL = main_insert_sql(lambda n: f'${n}')
+WAKE_INSERT_SQL = insert_sql('wake_data', WAKE_COLUMNS)
+
+
+def require_api_key(f):
+    """Decorator to require API key authentication"""
+    @wraps(f)
+    async def decorated_function(request):
+        auth_header = request.headers.get('Authorization')
+
+        if not auth_header:
+            return JSONResponse({'error': 'Authorization header missing'}, 401)
+
+        if not auth_header.startswith('Bearer '):
+            return JSONResponse({'error': 'Invalid authorization format. Use Bearer token'}, 401)
+
+        token = auth_header.split(' ')[1]
+
+        if token != API_KEY:
+            return JSONResponse({'error': 'Invalid API key'}, 401)
+
+        return await f(request)
+    return decorated_function
+
+
+async def read_json(request):
+    """Request body as JSON, or None if it is not valid JSON"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def send_slack_sos_message(http, message_text):
+    """Send a message to the Slack SOS webhook. Returns (ok, error_message)."""
+    slack_webhook_url = os.environ.get('SLACK_SOS_WEBHOOK')
+    if not slack_webhook_url:
+        return False, 'SLACK_SOS_WEBHOOK environment variable not set'
+
+    try:
+        response = await http.post(slack_webhook_url, json={'text': message_text}, timeout=10)
+        response.raise_for_status()
+        return True, None
+    except httpx.HTTPError as e:
+        return False, str(e)
+
+
+async def warm_sos_rate_limit(pool):
+    """Load every SOS sent within the rate-limit window from sos_events into the cache"""
+    rows = await pool.fetch(
+        """
+        SELECT experiment_id, EXTRACT(EPOCH FROM NOW() - MAX(created_at))::float8
+        FROM sos_events
+        WHERE created_at >= NOW() - make_interval(secs => $1)
+        GROUP BY experiment_id
+        """,
+        float(sos_rate_limit.ttl),
+    )
+    return sos_rate_limit.load([tuple(row) for row in rows])
+
+
+async def log_sos_event(pool, experiment_id, source, message):
+    await pool.execute(
+        'INSERT INTO sos_events (experiment_id, source, message) VALUES ($1, $2, $3)',
+        experiment_id, source, message,
+    )
+    sos_rate_limit.record(experiment_id)
+
+
+async def maybe_send_auto_sos(state, experiment_id):
+    """Send an SOS for this experiment if one hasn't been sent in the last 24 hours."""
+    if sos_rate_limit.is_limited(experiment_id):
+        return False
+
+    age = await state.pool.fetchval(
+        """
+        SELECT EXTRACT(EPOCH FROM NOW() - created_at)::float8
+        FROM sos_events
+        WHERE experiment_id = $1
+          AND created_at >= NOW() - make_interval(secs => $2)
+        ORDER BY created_at DESC
+        LIMIT 1
+        """,
+        experiment_id, float(sos_rate_limit.ttl),
+    )
+    if age is not None:
+        sos_rate_limit.record(experiment_id, age)
+        return False
+
+    message_text = auto_sos_message(experiment_id)
+    ok, _ = await send_slack_sos_message(state.http, message_text)
+    if ok:
+        # Cache before logging so a failed insert cannot cause a repeat SOS from this process
+        sos_rate_limit.record(experiment_id)
+        try:
+            await log_sos_event(state.pool, experiment_id, 'auto', message_text)
+        except Exception:
+            pass
+    return ok
+
+
+def trigger_auto_sos(state, rows):
+    """Schedule an auto SOS check for each experiment with water detected, without awaiting it"""
+    for experiment_id in {row[0] for row in rows if row[WATER_DETECTED_INDEX]}:
+        if experiment_id in state.sos_pending or sos_rate_limit.is_limited(experiment_id):
+            continue
+        state.sos_pending.add(experiment_id)
+        task = asyncio.get_running_loop().create_task(maybe_send_auto_sos(state, experiment_id))
+        task.add_done_callback(lambda _, experiment_id=experiment_id: state.sos_pending.discard(experiment_id))
+        state.sos_tasks.add(task)
+        task.add_done_callback(state.sos_tasks.discard)
+
+
+async def notify_rows(conn, table, rows):
+    """Announce new rows on ROWS_CHANNEL (sent on commit) so the Flask app refreshes latest and stream"""
+    payloads = [rows_notification(table, experiment_id) for experiment_id in {row[0] for row in rows}]
+    await conn.execute('SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload', ROWS_CHANNEL, payloads)
+
+
+async def store_rows(state, table, rows):
+    """Insert rows in one transaction and return those inserted; main_data skips duplicate keys and triggers auto SOS"""
+    async with state.pool.acquire() as conn:
+        async with conn.transaction():
+            if table == 'main_data':
+                records = await conn.fetch(MAIN_INSERT_SQL, *column_arrays(rows, len(MAIN_INGEST_COLUMNS)))
+                inserted = [tuple(record) for record in records]
+            else:
+                await conn.executemany(WAKE_INSERT_SQL, rows)
+                inserted = rows
+            if inserted:
+                await notify_rows(conn, table, inserted)
+    if table == 'main_data':
+        trigger_auto_sos(state, inserted)
+    return inserted
+
+
+async def write_batch(state, table, rows, results, received, started):
+    inserted = await store_rows(state, table, rows) if rows else []
+    if table == 'main_data':
+        mark_duplicates(rows, inserted, results)
+    response, status = batch_summary(len(inserted), results, received, time.perf_counter() - started)
+    return JSONResponse(response, status)
+
+
+async def ingest_batch(request, table, parse_row):
+    started = time.perf_counter()
+    try:
+        rows, results = parse_batch(await read_json(request), parse_row, BATCH_MAX_ROWS)
+    except BatchError as e:
+        return JSONResponse({'error': str(e)}, e.status)
+    return await write_batch(request.app.state, table, rows, results, len(results), started)
+
+
+def is_wake_binary(request):
+    return request.headers.get('content-type', '').split(';')[0].strip() == WAKE_BINARY_MIMETYPE
+
+
+@require_api_key
+async def add_main_data(request):
+    """Add main sensor data"""
+    try:
+        row = parse_main_row(await read_json(request))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, 400)
+
+    if not await store_rows(request.app.state, 'main_data', [row]):
+        return JSONResponse({'status': 'duplicate'})
+    return JSONResponse({'status': 'success'})
+
+
+@require_api_key
+async def add_main_data_batch(request):
+    """Add many main sensor rows in a single transaction"""
+    return await ingest_batch(request, 'main_data', parse_main_row)
+
+
+@require_api_key
+async def add_wake_data(request):
+    """Add wake sensor data"""
+    try:
+        if is_wake_binary(request):
+            rows, results = parse_wake_binary(await request.body(), request.query_params.get('experiment_id'))
+            if len(results) != 1:
+                raise ValueError('Use /api/wake/batch to send more than one binary record')
+            if not rows:
+                raise ValueError(results[0]['error'])
+            row = rows[0]
+        else:
+            row = parse_wake_row(await read_json(request))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, 400)
+
+    await store_rows(request.app.state, 'wake_data', [row])
+    return JSONResponse({'status': 'success'})
+
+
+@require_api_key
+async def add_wake_data_batch(request):
+    """Add many wake sensor rows in a single transaction"""
+    if is_wake_binary(request):
+        started = time.perf_counter()
+        try:
+            rows, results = parse_wake_binary(await request.body(), request.query_params.get('experiment_id'))
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, 400)
+        if len(results) > BATCH_MAX_ROWS:
+            return JSONResponse({'error': f'Batch exceeds the maximum of {BATCH_MAX_ROWS} rows'}, 413)
+        return await write_batch(request.app.state, 'wake_data', rows, results, len(results), started)
+
+    return await ingest_batch(request, 'wake_data', parse_wake_row)
+
+
+@require_api_key
+async def send_sos(request):
+    """Send SOS message to Slack webhook"""
+    body = await read_json(request)
+    if not isinstance(body, dict):
+        body = {}
+    experiment_id = body.get('experiment_id', 'unknown')
+    message_text = body.get('message', '🚨 I am drowning. Please help. 🚨')
+
+    state = request.app.state
+    ok, err = await send_slack_sos_message(state.http, message_text)
+    if ok:
+        try:
+            await log_sos_event(state.pool, experiment_id, 'manual', message_text)
+        except Exception:
+            pass
+        return JSONResponse({'status': 'success', 'message': 'SOS sent to Slack'})
+    return JSONResponse({'error': f'Failed to send SOS to Slack: {err}'}, 500)
+
+
+async def health(request):
+    return JSONResponse({'status': 'healthy'})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    state = app.state
+    state.pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=int(os.environ.get('DB_POOL_MIN', 1)),
+        max_size=int(os.environ.get('DB_POOL_MAX', 10)),
+        timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    )
+    state.http = httpx.AsyncClient()
+    state.sos_pending = set()
+    state.sos_tasks = set()
+    warmed = await warm_sos_rate_limit(state.pool)
+    print(f"🚨 SOS rate limit cache warmed with {warmed} experiment(s)")
+    try:
+        yield
+    finally:
+        # Let in-flight SOS sends finish before the pool and client go away
+        if state.sos_tasks:
+            await asyncio.wait(state.sos_tasks, timeout=15)
+        await state.http.aclose()
+        await state.pool.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/main', add_main_data, methods=['POST']),
+        Route('/api/main/batch', add_main_data_batch, methods=['POST']),
+        Route('/api/wake', add_wake_data, methods=['POST']),
+        Route('/api/wake/batch', add_wake_data_batch, methods=['POST']),
+        Route('/api/dead', send_sos, methods=['POST']),
+        Route('/health', health),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,70 @@
+"""Compare two bench.load result files and flag regressions.
+
+Prints per-stream throughput and latency for both runs with the relative
+change, and exits with status 1 if any metric got worse by more than
+``--threshold`` percent (lower throughput, higher latency or CPU).
+
+    python -m bench.compare bench/results/before.json bench/results/after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# metric -> True if higher is better
+METRICS = {'req_per_sec': True, 'rows_per_sec': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False}
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before, after, threshold):
+    regressions = []
+    rows = []
+    for name in sorted(set(before['streams']) | set(after['streams'])):
+        old = before['streams'].get(name, {})
+        new = after['streams'].get(name, {})
+        for metric, higher_is_better in METRICS.items():
+            delta = change(old.get(metric), new.get(metric))
+            worse = delta is not None and (-delta if higher_is_better else delta) > threshold
+            rows.append((f'{name}.{metric}', old.get(metric), new.get(metric), delta, worse))
+            if worse:
+                regressions.append(f'{name}.{metric}')
+    for label in ('db_cpu', 'server_cpu'):
+        old = (before.get(label) or {}).get('percent')
+        new = (after.get(label) or {}).get('percent')
+        delta = change(old, new)
+        worse = delta is not None and delta > threshold
+        rows.append((f'{label}.percent', old, new, delta, worse))
+        if worse:
+            regressions.append(f'{label}.percent')
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change counted as a regression')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{before.get('revision')} ({before.get('server')}) -> {after.get('revision')} ({after.get('server')})")
+    rows, regressions = compare(before, after, args.threshold)
+    for label, old, new, delta, worse in rows:
+        shown = f'{delta:+.1f}%' if delta is not None else '-'
+        print(f"{label:28} {old if old is not None else '-':>10} {new if new is not None else '-':>10} "
+              f"{shown:>9}{'  ⚠️' if worse else ''}")
+    if regressions:
+        print(f"Regressions over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Hold ``--connections`` simultaneous clients open against the Flask and ASGI servers.
+
+Every client opens its own connection and POSTs ``--requests`` main rows back
+to back; all clients start together, so the server sees that many concurrent
+sockets. Reports throughput, latency percentiles and errors per server.
+
+    DATABASE_URL=postgresql://localhost/glas_bench python -m bench.concurrency --connections 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from bench import servers
+
+EXPERIMENT_ID = 'bench-concurrency'
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def client(url, headers, requests, start, latencies, errors):
+    row = dict(experiment_id=EXPERIMENT_ID, temperature_1=20.5, temperature_2=20.1, temperature_3=19.8,
+               temperature_4=19.5, ph=7.1, battery_level=88, tds=310, turbidity=2.5, water_detected=False)
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+        await start.wait()
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                response = await http.post(f'{url}/api/main', json=row, headers=headers)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+
+async def load(url, connections, requests):
+    headers = {'Authorization': f"Bearer {os.environ['API_KEY']}"}
+    start = asyncio.Event()
+    latencies = []
+    errors = {}
+    tasks = [asyncio.create_task(client(url, headers, requests, start, latencies, errors))
+             for _ in range(connections)]
+    await asyncio.sleep(0.5)
+    started = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return {
+        'connections': connections,
+        'requests': connections * requests,
+        'ok': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'req_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=5, help='requests per connection')
+    parser.add_argument('--server', choices=servers.SERVERS, action='append',
+                        help='server to load (repeatable; default both)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('API_KEY', 'bench')
+    # Each connection needs a socket on both ends of the loopback
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.connections * 2 + 256)), hard))
+
+    results = {}
+    for name in args.server or servers.SERVERS:
+        url, stop = servers.start(name)
+        try:
+            results[name] = asyncio.run(load(url, args.connections, args.requests))
+        finally:
+            stop()
+        print(f"{name}: {json.dumps(results[name])}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
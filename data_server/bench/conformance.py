@@ -0,0 +1,158 @@
+"""Run the same HTTP checks against the Flask and ASGI servers.
+
+Both apps must answer the shared ingest routes identically, so every check is
+plain HTTP against a base URL and the suite is run once per server. Needs a
+database with the schema applied; the Slack webhook is a local FakeSlack.
+
+    DATABASE_URL=postgresql://localhost/glas_bench python -m bench.conformance
+    python -m bench.conformance --server asgi
+"""
+import argparse
+import os
+import struct
+import sys
+import uuid
+
+import requests
+from dotenv import load_dotenv
+
+from bench import servers
+from bench.fake_slack import FakeSlack
+
+
+def main_row(experiment_id, **overrides):
+    row = dict(experiment_id=experiment_id, temperature_1=20.5, temperature_2=20.1, temperature_3=19.8,
+               temperature_4=19.5, ph=7.1, battery_level=88, tds=310, turbidity=2.5, water_detected=False)
+    row.update(overrides)
+    return row
+
+
+def wake_row(experiment_id, **overrides):
+    row = dict(experiment_id=experiment_id, rotation_data=','.join(['0.5'] * 16), hydrophone_reading=1.0,
+               water_level=2.0)
+    row.update(overrides)
+    return row
+
+
+def check_auth(url, headers, experiment_id):
+    assert requests.get(f'{url}/health').json() == {'status': 'healthy'}
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id))
+    assert response.status_code == 401 and response.json() == {'error': 'Authorization header missing'}
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id), headers={'Authorization': 'Token x'})
+    assert response.status_code == 401 and 'Bearer' in response.json()['error']
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id),
+                             headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401 and response.json() == {'error': 'Invalid API key'}
+
+
+def check_single_rows(url, headers, experiment_id):
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id), headers=headers)
+    assert response.status_code == 200 and response.json() == {'status': 'success'}, response.text
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id, ph='acidic'), headers=headers)
+    assert response.status_code == 400 and response.json() == {'error': "Field 'ph' must be a number"}
+    response = requests.post(f'{url}/api/wake', json=wake_row(experiment_id), headers=headers)
+    assert response.status_code == 200 and response.json() == {'status': 'success'}, response.text
+    response = requests.post(f'{url}/api/wake', json=wake_row(experiment_id, rotation_data='1,2'), headers=headers)
+    assert response.status_code == 400 and 'exactly 16' in response.json()['error']
+
+
+def check_batches(url, headers, experiment_id):
+    rows = [main_row(experiment_id)] * 50 + [{'experiment_id': experiment_id}]
+    response = requests.post(f'{url}/api/main/batch', json=rows, headers=headers)
+    body = response.json()
+    assert response.status_code == 200 and body['status'] == 'partial', body
+    assert (body['inserted'], body['rejected']) == (50, 1)
+    assert body['results'][-1] == {'index': 50, 'status': 'error', 'error': "Missing field 'water_detected'"}
+
+    response = requests.post(f'{url}/api/wake/batch', json={'rows': [wake_row(experiment_id)] * 20},
+                             headers=headers)
+    assert response.status_code == 200 and response.json()['inserted'] == 20
+
+    response = requests.post(f'{url}/api/main/batch', json={'nope': 1}, headers=headers)
+    assert response.status_code == 400 and 'JSON array' in response.json()['error']
+
+
+def check_dedupe(url, headers, experiment_id):
+    key = dict(probe_id='MAIN', iterations=1, device_timestamp=experiment_id)
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id, **key), headers=headers)
+    assert response.json() == {'status': 'success'}, response.text
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id, **key), headers=headers)
+    assert response.status_code == 200 and response.json() == {'status': 'duplicate'}, response.text
+    response = requests.post(f'{url}/api/main', json=main_row(experiment_id, probe_id='MAIN'), headers=headers)
+    assert response.status_code == 400 and 'sent together' in response.json()['error']
+
+    rows = [main_row(experiment_id, **dict(key, iterations=n)) for n in range(1, 4)] * 2 + [main_row(experiment_id)]
+    body = requests.post(f'{url}/api/main/batch', json=rows, headers=headers).json()
+    assert (body['inserted'], body['duplicates'], body['rejected']) == (3, 4, 0), body
+    assert [result['status'] for result in body['results']] == ['duplicate', 'ok', 'ok'] + ['duplicate'] * 3 + ['ok']
+
+
+def check_wake_binary(url, headers, experiment_id):
+    binary_headers = dict(headers, **{'Content-Type': 'application/vnd.glas.wake+f32'})
+    record = struct.pack('<18f', *range(18))
+    response = requests.post(f'{url}/api/wake/batch', params={'experiment_id': experiment_id},
+                             data=record * 3, headers=binary_headers)
+    assert response.status_code == 200 and response.json()['inserted'] == 3, response.text
+    response = requests.post(f'{url}/api/wake', params={'experiment_id': experiment_id}, data=record,
+                             headers=binary_headers)
+    assert response.status_code == 200, response.text
+    response = requests.post(f'{url}/api/wake', params={'experiment_id': experiment_id}, data=record * 2,
+                             headers=binary_headers)
+    assert response.status_code == 400 and '/api/wake/batch' in response.json()['error']
+    response = requests.post(f'{url}/api/wake/batch', data=record, headers=binary_headers)
+    assert response.status_code == 400 and 'experiment_id' in response.json()['error']
+
+
+def check_sos(url, headers, experiment_id, slack):
+    before = len(slack.messages)
+    response = requests.post(f'{url}/api/dead', json={'experiment_id': experiment_id, 'message': 'help'},
+                             headers=headers)
+    assert response.status_code == 200 and response.json()['status'] == 'success', response.text
+    assert [message['text'] for message in slack.messages[before:]] == ['help']
+
+
+def check_auto_sos(url, headers, experiment_id, slack):
+    for _ in range(3):
+        response = requests.post(f'{url}/api/main', json=main_row(experiment_id, water_detected=True),
+                                 headers=headers)
+        assert response.status_code == 200
+    assert slack.wait_for(lambda texts: any(experiment_id in text for text in texts)), 'no auto SOS sent'
+    texts = [message['text'] for message in slack.messages]
+    assert sum(experiment_id in text for text in texts) == 1, texts
+
+
+CHECKS = (check_auth, check_single_rows, check_batches, check_dedupe, check_wake_binary)
+SLACK_CHECKS = (check_sos, check_auto_sos)
+
+
+def run(name):
+    failures = 0
+    with FakeSlack() as slack:
+        os.environ['SLACK_SOS_WEBHOOK'] = slack.url
+        url, stop = servers.start(name)
+        headers = {'Authorization': f"Bearer {os.environ['API_KEY']}"}
+        try:
+            for check in CHECKS + SLACK_CHECKS:
+                experiment_id = f'bench-conformance-{uuid.uuid4().hex[:8]}'
+                args = (url, headers, experiment_id, slack) if check in SLACK_CHECKS else (url, headers, experiment_id)
+                try:
+                    check(*args)
+                    print(f'  ✓ {name} {check.__name__}')
+                except AssertionError as e:
+                    failures += 1
+                    print(f'  ✗ {name} {check.__name__}: {e}')
+        finally:
+            stop()
+    return failures
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=servers.SERVERS, action='append',
+                        help='server to check (repeatable; default both)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('API_KEY', 'bench')
+    failures = sum(run(name) for name in args.server or servers.SERVERS)
+    sys.exit(1 if failures else 0)
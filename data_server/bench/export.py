@@ -0,0 +1,102 @@
+"""Measure export throughput (MB/s) and peak RSS for a large wake_data experiment.
+
+Seeds ``--rows`` synthetic wake rows at the probe's 4 Hz rate (skipped if the
+bench experiment already has that many), then streams each format through
+the Flask app in-process and reports bytes/sec and the process's peak RSS.
+
+    DATABASE_URL=postgresql://localhost/glas_bench python -m bench.export --rows 10000000
+"""
+import argparse
+import os
+import resource
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+EXPERIMENT_ID = 'bench-export'
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(main, partitions, rows):
+    with main.get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT COUNT(*) FROM wake_data WHERE experiment_id = %s', (EXPERIMENT_ID,))
+            existing = cur.fetchone()[0]
+        if existing >= rows:
+            return existing
+        end = datetime.utcnow()
+        start = end - timedelta(seconds=rows * 0.25)
+        partitions.ensure_range(conn, 'wake_data', start, end)
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM wake_data WHERE experiment_id = %s', (EXPERIMENT_ID,))
+            cur.execute('''
+                INSERT INTO wake_data (timestamp, experiment_id, yaw, pitch, roll, ax, ay, az, gx, gy, gz,
+                                       qx, qy, qz, qw, lax, lay, laz, hydrophone_reading, water_level)
+                SELECT %s + i * INTERVAL '250 milliseconds', %s,
+                       sin(i / 40.0) * 30, cos(i / 50.0) * 10, sin(i / 70.0) * 5,
+                       random(), random(), 9.8 + random(), random(), random(), random(),
+                       0, 0, 0, 1, random(), random(), random(), random() * 3, 1000 + random() * 50
+                FROM generate_series(0, %s - 1) AS i
+            ''', (start, EXPERIMENT_ID, rows))
+        conn.commit()
+    return rows
+
+
+def measure(client, headers, fmt):
+    started = time.perf_counter()
+    response = client.get(f'/api/export/wake_data?experiment_id={EXPERIMENT_ID}&format={fmt}',
+                          headers=headers, buffered=False)
+    total = 0
+    for chunk in response.response:
+        total += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    result = {
+        'format': fmt,
+        'bytes': total,
+        'seconds': elapsed,
+        'mb_per_sec': total / elapsed / 1e6,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(f"{fmt:>8}: {total / 1e6:9.1f} MB in {elapsed:7.2f}s = {result['mb_per_sec']:7.1f} MB/s   "
+          f"peak RSS {result['peak_rss_mb']:7.1f} MB")
+    return result
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--formats', default='csv,parquet,arrow')
+    parser.add_argument('--cleanup', action='store_true', help='delete the seeded rows afterwards')
+    args = parser.parse_args()
+
+    import main as server
+    import partitions
+
+    os.environ.setdefault('API_KEY', 'bench')
+    server.API_KEY = os.environ['API_KEY']
+    headers = {'Authorization': f"Bearer {server.API_KEY}"}
+
+    print(f"Seeding {args.rows} rows...")
+    seeded = seed(server, partitions, args.rows)
+    print(f"{seeded} rows ready, baseline peak RSS {peak_rss_mb():.1f} MB")
+
+    client = server.app.test_client()
+    results = [measure(client, headers, fmt) for fmt in args.formats.split(',')]
+
+    if args.cleanup:
+        with server.get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM wake_data WHERE experiment_id = %s', (EXPERIMENT_ID,))
+            conn.commit()
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Local stand-in for the Slack SOS webhook.
+
+Records every POSTed payload and can be slowed down or made to fail, so the
+SOS path can be exercised without touching Slack:
+
+    with FakeSlack(delay=2.0) as slack:
+        os.environ['SLACK_SOS_WEBHOOK'] = slack.url
+        ...
+        assert len(slack.messages) == 1
+
+Run it directly to get a webhook URL for a manually started server:
+
+    python -m bench.fake_slack --port 8099 --delay 0.5
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSlack:
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, status=200):
+        self.delay = delay
+        self.status = status
+        self.messages = []
+        self.latencies = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/webhook'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                started = time.perf_counter()
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if fake.delay:
+                    time.sleep(fake.delay)
+                with fake._lock:
+                    fake.messages.append(json.loads(body or b'{}'))
+                    fake.latencies.append(time.perf_counter() - started)
+                self.send_response(fake.status)
+                self.send_header('Content-Type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(b'ok' if fake.status < 400 else b'error')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def wait_for(self, predicate, timeout=10.0):
+        """Poll until ``predicate(texts)`` is true for the message texts received so far"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                texts = [message.get('text') for message in self.messages]
+            if predicate(texts):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Slack webhook for local testing')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before responding')
+    parser.add_argument('--status', type=int, default=200, help='HTTP status to respond with')
+    args = parser.parse_args()
+
+    slack = FakeSlack(port=args.port, delay=args.delay, status=args.status)
+    print(f"🪝 Fake Slack webhook listening on {slack.url}")
+    try:
+        slack._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for message in slack.messages:
+            print(message.get('text'))
+
+
+if __name__ == '__main__':
+    main()
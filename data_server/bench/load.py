@@ -0,0 +1,283 @@
+"""Drive the ingest endpoints with synthetic probe traffic and record the results as JSON.
+
+Starts a throwaway Postgres (unless DATABASE_URL is set), a FakeSlack webhook
+and the chosen server in its own process, then sends traffic open-loop: each
+stream fires on its own schedule whether or not earlier requests finished,
+and latency is measured from the scheduled send time, so a stalled server
+shows up as latency instead of as a lower request rate. Reports per-stream
+throughput, p50/p95/p99 latency, and CPU used by Postgres and the server.
+
+    python -m bench.load --duration 30 --main-rate 200 --wake-rate 200 --main-batch-rate 2
+    python -m bench.load --server asgi --out bench/results/asgi.json
+    python -m bench.compare bench/results/before.json bench/results/after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import psycopg2
+from dotenv import load_dotenv
+
+from bench import servers
+from bench.fake_slack import FakeSlack
+from bench.postgres import LocalPostgres, cpu_seconds, postmaster_pid
+from bench.traffic import Traffic
+
+DATA_SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(DATA_SERVER_DIR, 'bench', 'results')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DATA_SERVER_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', '.'], cwd=DATA_SERVER_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Stream:
+    """One kind of request sent at a fixed rate"""
+
+    def __init__(self, name, rate, build, rows_per_request=1):
+        self.name = name
+        self.rate = rate
+        self.build = build
+        self.rows_per_request = rows_per_request
+        self.latencies = []
+        self.errors = {}
+        self.sent = 0
+
+    def summary(self, elapsed):
+        ok = len(self.latencies)
+        result = {
+            'rate': self.rate,
+            'sent': self.sent,
+            'ok': ok,
+            'errors': self.errors,
+            'req_per_sec': round(ok / elapsed, 1),
+            'rows_per_sec': round(ok * self.rows_per_request / elapsed, 1),
+        }
+        if ok:
+            result.update({
+                'p50_ms': round(percentile(self.latencies, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(self.latencies, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(self.latencies, 0.99) * 1000, 2),
+                'max_ms': round(max(self.latencies) * 1000, 2),
+            })
+        return result
+
+
+def build_streams(args, traffic):
+    def main_single():
+        return {'url': '/api/main', 'json': traffic.probe().main_row()}
+
+    def wake_single():
+        return {'url': '/api/wake', 'json': traffic.probe().wake_row()}
+
+    def main_batch():
+        probe = traffic.probe()
+        return {'url': '/api/main/batch', 'json': [probe.main_row() for _ in range(args.batch_size)]}
+
+    def wake_batch():
+        probe = traffic.probe()
+        return {'url': '/api/wake/batch', 'json': [probe.wake_row() for _ in range(args.batch_size)]}
+
+    def wake_binary():
+        probe = traffic.probe()
+        return {'url': '/api/wake/batch', 'params': {'experiment_id': probe.experiment_id},
+                'content': probe.wake_binary(args.batch_size),
+                'headers': {'Content-Type': 'application/vnd.glas.wake+f32'}}
+
+    streams = [
+        Stream('main', args.main_rate, main_single),
+        Stream('wake', args.wake_rate, wake_single),
+        Stream('main_batch', args.main_batch_rate, main_batch, args.batch_size),
+        Stream('wake_batch', args.wake_batch_rate, wake_batch, args.batch_size),
+        Stream('wake_binary', args.wake_binary_rate, wake_binary, args.batch_size),
+    ]
+    return [stream for stream in streams if stream.rate > 0]
+
+
+async def send(client, slots, headers, stream, request, scheduled):
+    try:
+        # Requests wait for a free connection here rather than in httpx's pool, which slows down
+        # badly with thousands of queued requests; the wait still counts towards latency
+        async with slots:
+            response = await client.post(request['url'], json=request.get('json'), content=request.get('content'),
+                                         params=request.get('params'),
+                                         headers={**headers, **request.get('headers', {})})
+        if response.status_code in (200, 202):
+            stream.latencies.append(time.perf_counter() - scheduled)
+        else:
+            stream.errors[str(response.status_code)] = stream.errors.get(str(response.status_code), 0) + 1
+    except httpx.HTTPError as e:
+        stream.errors[type(e).__name__] = stream.errors.get(type(e).__name__, 0) + 1
+
+
+async def drive(stream, client, slots, headers, started, duration, pending):
+    interval = 1 / stream.rate
+    while True:
+        scheduled = started + stream.sent * interval
+        if scheduled - started >= duration:
+            return
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Built after the wait so probe state advances in send order
+        task = asyncio.create_task(send(client, slots, headers, stream, stream.build(), scheduled))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        stream.sent += 1
+
+
+async def run_load(url, streams, duration, connections):
+    headers = {'Authorization': f"Bearer {os.environ['API_KEY']}"}
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    pending = set()
+    slots = asyncio.Semaphore(connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        # Warm the connection pool and the server before the clock starts
+        await asyncio.gather(*(client.get('/health') for _ in range(min(connections, 32))))
+        started = time.perf_counter()
+        await asyncio.gather(*(drive(stream, client, slots, headers, started, duration, pending)
+                               for stream in streams))
+        if pending:
+            await asyncio.wait(pending)
+        return time.perf_counter() - started
+
+
+def wait_for_server(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with status {process.returncode}')
+        try:
+            if httpx.get(f'{url}/health', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('server did not become healthy')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def benchmark(args):
+    import main as schema
+
+    schema.DATABASE_URL = os.environ['DATABASE_URL']
+    schema.init_db()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    db_pid = postmaster_pid(conn)
+    conn.close()
+
+    traffic = Traffic(args.probes, args.seed, args.water_probability)
+    streams = build_streams(args, traffic)
+    if not streams:
+        sys.exit('Every rate is 0; nothing to send')
+
+    with FakeSlack(delay=args.slack_delay) as slack:
+        port = free_port()
+        env = dict(os.environ, SLACK_SOS_WEBHOOK=slack.url)
+        process = subprocess.Popen([sys.executable, '-m', 'bench.servers', args.server, '--port', str(port)],
+                                   cwd=DATA_SERVER_DIR, env=env)
+        url = f'http://127.0.0.1:{port}'
+        try:
+            wait_for_server(url, process)
+            db_cpu_before = cpu_seconds(db_pid)
+            server_cpu_before = cpu_seconds(process.pid)
+            elapsed = asyncio.run(run_load(url, streams, args.duration, args.connections))
+            db_cpu = cpu_seconds(db_pid)
+            server_cpu = cpu_seconds(process.pid)
+        finally:
+            # SIGINT lets the server run its atexit hooks (write-behind drain, SOS dispatcher)
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        def cpu(before, after):
+            if before is None or after is None:
+                return None
+            return {'seconds': round(after - before, 3), 'percent': round((after - before) / elapsed * 100, 1)}
+
+        return {
+            'revision': git_revision(),
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'server': args.server,
+            'config': {key: value for key, value in vars(args).items() if key != 'out'},
+            'elapsed_s': round(elapsed, 3),
+            'streams': {stream.name: stream.summary(elapsed) for stream in streams},
+            'db_cpu': cpu(db_cpu_before, db_cpu),
+            'server_cpu': cpu(server_cpu_before, server_cpu),
+            'slack_messages': len(slack.messages),
+        }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=servers.SERVERS, default='flask')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of traffic')
+    parser.add_argument('--main-rate', type=float, default=100, help='POST /api/main per second')
+    parser.add_argument('--wake-rate', type=float, default=100, help='POST /api/wake per second')
+    parser.add_argument('--main-batch-rate', type=float, default=1, help='POST /api/main/batch per second')
+    parser.add_argument('--wake-batch-rate', type=float, default=1, help='JSON POST /api/wake/batch per second')
+    parser.add_argument('--wake-binary-rate', type=float, default=1, help='binary POST /api/wake/batch per second')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per batch request')
+    parser.add_argument('--probes', type=int, default=10, help='simulated probes (one experiment each)')
+    parser.add_argument('--water-probability', type=float, default=0.0001,
+                        help='chance a main row reports water, which exercises auto SOS')
+    parser.add_argument('--slack-delay', type=float, default=0.2, help='seconds the fake Slack takes to answer')
+    parser.add_argument('--connections', type=int, default=64, help='client connection limit')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='result file (default bench/results/<time>-<revision>-<server>.json)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('API_KEY', 'bench')
+    if os.environ.get('DATABASE_URL'):
+        result = benchmark(args)
+    else:
+        with LocalPostgres() as pg:
+            os.environ['DATABASE_URL'] = pg.dsn
+            result = benchmark(args)
+
+    out = args.out
+    if out is None:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{result['revision'] or 'unknown'}-{args.server}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    for name, stream in result['streams'].items():
+        latency = f"p50 {stream.get('p50_ms')} / p95 {stream.get('p95_ms')} / p99 {stream.get('p99_ms')} ms"
+        print(f"{name:12} {stream['req_per_sec']:>8} req/s {stream['rows_per_sec']:>9} rows/s  {latency}"
+              f"{'  errors ' + json.dumps(stream['errors']) if stream['errors'] else ''}")
+    print(f"db cpu {result['db_cpu']}  server cpu {result['server_cpu']}  slack messages {result['slack_messages']}")
+    print(f"📄 {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Compare per-request psycopg2.connect against the pooled connection path.
+
+Runs the /api/main INSERT against a local Postgres from several threads and
+reports requests/sec plus p50/p99 latency for each strategy.
+
+    DATABASE_URL=postgresql://localhost/glas_bench python -m bench.pool --requests 2000 --threads 8
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from dotenv import load_dotenv
+
+import db
+
+INSERT_MAIN = '''
+    INSERT INTO main_data (experiment_id, temperature_1, temperature_2, temperature_3, temperature_4,
+                          ph, battery_level, tds, turbidity, water_detected)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+'''
+ROW = ('bench-pool', 21.5, 21.4, 21.3, 21.2, 7.1, 88.0, 230.0, 3.2, False)
+
+
+def insert_with_connect(dsn):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(INSERT_MAIN, ROW)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def insert_with_pool(dsn):
+    with db.get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(INSERT_MAIN, ROW)
+        conn.commit()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(name, fn, dsn, total, threads):
+    def timed(_):
+        start = time.perf_counter()
+        fn(dsn)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'strategy': name,
+        'requests': total,
+        'threads': threads,
+        'requests_per_sec': total / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+    print(f"{name:>8}: {result['requests_per_sec']:8.1f} req/s   "
+          f"p50 {result['p50_ms']:6.2f} ms   p99 {result['p99_ms']:6.2f} ms")
+    return result
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    dsn = os.environ['DATABASE_URL']
+    os.environ.setdefault('DB_POOL_MAX', str(args.threads))
+
+    results = [
+        run('connect', insert_with_connect, dsn, args.requests, args.threads),
+        run('pool', insert_with_pool, dsn, args.requests, args.threads),
+    ]
+
+    with db.get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM main_data WHERE experiment_id = 'bench-pool'")
+        conn.commit()
+    return results
+
+
+if __name__ == '__main__':
+    main()
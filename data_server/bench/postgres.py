@@ -0,0 +1,119 @@
+"""Throwaway local Postgres for benchmarks, and CPU accounting for its processes.
+
+Uses ``initdb``/``pg_ctl`` from PG_BIN or PATH when they are installed;
+otherwise falls back to the ``pgserver`` pip package, which bundles a
+Postgres build (and handles running as root). The cluster lives in a temp
+directory, listens only on a Unix socket and is removed on stop.
+
+    with LocalPostgres() as pg:
+        os.environ['DATABASE_URL'] = pg.dsn
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _bin_dir():
+    if os.environ.get('PG_BIN'):
+        return os.environ['PG_BIN']
+    pg_ctl = shutil.which('pg_ctl')
+    return os.path.dirname(pg_ctl) if pg_ctl else None
+
+
+class LocalPostgres:
+    def __init__(self):
+        self.dsn = None
+        self.pid = None
+        self._tmp = None
+        self._server = None
+
+    def start(self):
+        bin_dir = _bin_dir()
+        if bin_dir and os.geteuid() != 0:
+            self._start_pg_ctl(bin_dir)
+        else:
+            self._start_pgserver()
+        return self
+
+    def _start_pg_ctl(self, bin_dir):
+        self._tmp = tempfile.mkdtemp(prefix='glas-bench-pg-')
+        data = os.path.join(self._tmp, 'data')
+        subprocess.run([os.path.join(bin_dir, 'initdb'), '-D', data, '-U', 'postgres', '--auth=trust',
+                        '-E', 'UTF8'], check=True, capture_output=True)
+        options = f"-k {self._tmp} -c listen_addresses=''"
+        subprocess.run([os.path.join(bin_dir, 'pg_ctl'), '-D', data, '-o', options, '-l',
+                        os.path.join(self._tmp, 'postgres.log'), '-w', 'start'], check=True, capture_output=True)
+        with open(os.path.join(data, 'postmaster.pid')) as f:
+            self.pid = int(f.readline())
+        self.dsn = f'postgresql://postgres@/postgres?host={self._tmp}'
+        self._bin_dir = bin_dir
+        self._data = data
+
+    def _start_pgserver(self):
+        try:
+            import pgserver
+        except ImportError:
+            raise RuntimeError('No Postgres found: install it (or set PG_BIN), pip install pgserver, '
+                               'or point DATABASE_URL at an existing database')
+        self._tmp = tempfile.mkdtemp(prefix='glas-bench-pg-')
+        self._server = pgserver.get_server(self._tmp, cleanup_mode='delete')
+        self.pid = self._server.get_pid()
+        self.dsn = self._server.get_uri()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.cleanup()
+            self._server = None
+        elif self.dsn is not None:
+            subprocess.run([os.path.join(self._bin_dir, 'pg_ctl'), '-D', self._data, '-m', 'fast', 'stop'],
+                           capture_output=True)
+        if self._tmp:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+        self.dsn = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def postmaster_pid(conn):
+    """PID of the server behind ``conn`` if its data directory is readable from here, else None"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SHOW data_directory')
+            data_directory = cur.fetchone()[0]
+        with open(os.path.join(data_directory, 'postmaster.pid')) as f:
+            return int(f.readline())
+    except Exception:
+        conn.rollback()
+        return None
+
+
+def cpu_seconds(pid):
+    """User + system CPU seconds of a process and its live children, or None without psutil.
+
+    Backends that exit during a run take their CPU time with them, so
+    benchmark clients should hold pooled connections open for the whole run.
+    """
+    if psutil is None or pid is None:
+        return None
+    try:
+        root = psutil.Process(pid)
+        total = 0.0
+        for process in [root] + root.children(recursive=True):
+            try:
+                times = process.cpu_times()
+                total += times.user + times.system
+            except psutil.NoSuchProcess:
+                pass
+        return total
+    except psutil.Error:
+        return None
@@ -0,0 +1,95 @@
+"""Start the Flask (main.py) or ASGI (asgi.py) app for benchmarks.
+
+``start`` runs it in-process on a free port; ``python -m bench.servers flask
+--port 5055`` runs it in the foreground, so load generators can keep the
+server in its own process.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+
+SERVERS = ('flask', 'asgi')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_flask():
+    from werkzeug.serving import make_server
+
+    import main as server
+
+    os.environ.setdefault('API_KEY', 'bench')
+    server.API_KEY = os.environ['API_KEY']
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{httpd.server_port}', httpd.shutdown
+
+
+def start_asgi():
+    import uvicorn
+
+    import asgi as server
+
+    os.environ.setdefault('API_KEY', 'bench')
+    server.API_KEY = os.environ['API_KEY']
+    port = _free_port()
+    config = uvicorn.Config(server.app, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+    httpd = uvicorn.Server(config)
+    thread = threading.Thread(target=lambda: asyncio.run(httpd.serve()), daemon=True)
+    thread.start()
+    while not httpd.started:
+        if not thread.is_alive():
+            raise RuntimeError('uvicorn failed to start')
+        time.sleep(0.05)
+
+    def stop():
+        httpd.should_exit = True
+        thread.join(timeout=20)
+    return f'http://127.0.0.1:{port}', stop
+
+
+def start(name):
+    """Start server ``name`` and return ``(base_url, stop)``"""
+    return {'flask': start_flask, 'asgi': start_asgi}[name]()
+
+
+def serve(name, port):
+    """Run server ``name`` on ``port`` until interrupted"""
+    os.environ.setdefault('API_KEY', 'bench')
+    if name == 'asgi':
+        import uvicorn
+
+        import asgi as server
+
+        server.API_KEY = os.environ['API_KEY']
+        uvicorn.run(server.app, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+        return
+
+    from werkzeug.serving import make_server
+
+    import main as server
+
+    server.API_KEY = os.environ['API_KEY']
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    httpd = make_server('127.0.0.1', port, server.app, threaded=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a data server app for benchmarking')
+    parser.add_argument('server', choices=SERVERS)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+    serve(args.server, args.port)
@@ -0,0 +1,133 @@
+"""Load test /api/stream with hundreds of concurrent SSE subscribers.
+
+Opens ``--subscribers`` streams for one experiment, posts ``--rows`` main rows
+at ``--rate`` rows/sec, and reports how many events each subscriber received,
+how many were dropped for slow consumers, and delivery latency (server commit
+to client receipt). Starts the app in-process unless ``--url`` is given.
+
+    DATABASE_URL=postgresql://localhost/glas_bench python -m bench.sse --subscribers 300 --rows 500 --rate 50
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from dotenv import load_dotenv
+from werkzeug.serving import make_server
+
+EXPERIMENT_ID = 'bench-sse'
+
+
+def start_local_server():
+    import main as server
+
+    os.environ.setdefault('API_KEY', 'bench')
+    server.API_KEY = os.environ['API_KEY']
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{httpd.server_port}', httpd
+
+
+class Subscriber(threading.Thread):
+    def __init__(self, url, headers, ready):
+        super().__init__(daemon=True)
+        self.url = url
+        self.headers = headers
+        self.ready = ready
+        self.received = 0
+        self.dropped = 0
+        self.latencies = []
+        self.error = None
+
+    def run(self):
+        try:
+            with requests.get(self.url, headers=self.headers, stream=True, timeout=(5, 60)) as response:
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith('retry:'):
+                        self.ready.release()
+                    elif line.startswith('event:'):
+                        event = line[6:].strip()
+                    elif line.startswith('data:'):
+                        payload = json.loads(line[5:])
+                        if event == 'dropped':
+                            self.dropped += payload['dropped']
+                        else:
+                            sent = datetime.fromisoformat(payload['received_at']).replace(tzinfo=timezone.utc)
+                            self.latencies.append((datetime.now(timezone.utc) - sent).total_seconds())
+                            self.received += 1
+                            if payload.get('temperature_1') == -1:
+                                return
+        except Exception as e:
+            self.error = e
+            self.ready.release()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running server (default: start one in-process)')
+    parser.add_argument('--subscribers', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=50.0, help='rows posted per second')
+    args = parser.parse_args()
+
+    httpd = None
+    base_url = args.url
+    if base_url is None:
+        base_url, httpd = start_local_server()
+    headers = {'Authorization': f"Bearer {os.environ.get('API_KEY', 'bench')}"}
+
+    ready = threading.Semaphore(0)
+    subscribers = [Subscriber(f'{base_url}/api/stream/{EXPERIMENT_ID}', headers, ready)
+                   for _ in range(args.subscribers)]
+    for subscriber in subscribers:
+        subscriber.start()
+    for _ in subscribers:
+        ready.acquire()
+    print(f"{args.subscribers} subscribers connected, posting {args.rows} rows at {args.rate}/s")
+
+    row = {'experiment_id': EXPERIMENT_ID, 'temperature_1': 20.0, 'temperature_2': 20.0, 'temperature_3': 20.0,
+           'temperature_4': 20.0, 'ph': 7.0, 'battery_level': 90.0, 'tds': 200.0, 'turbidity': 3.0,
+           'water_detected': False}
+    session = requests.Session()
+    started = time.perf_counter()
+    for i in range(args.rows):
+        last = i == args.rows - 1
+        session.post(f'{base_url}/api/main', json=dict(row, temperature_1=-1 if last else 20.0), headers=headers)
+        delay = started + (i + 1) / args.rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    for subscriber in subscribers:
+        subscriber.join(timeout=30)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for s in subscribers for latency in s.latencies)
+    received = [s.received for s in subscribers]
+    result = {
+        'subscribers': args.subscribers,
+        'rows_posted': args.rows,
+        'events_delivered': sum(received),
+        'events_dropped': sum(s.dropped for s in subscribers),
+        'min_received_per_subscriber': min(received),
+        'errors': sum(1 for s in subscribers if s.error),
+        'fanout_events_per_sec': sum(received) / elapsed,
+        'p50_latency_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_latency_ms': latencies[int(0.99 * (len(latencies) - 1))] * 1000 if latencies else None,
+    }
+    print(json.dumps(result, indent=2))
+
+    if httpd is not None:
+        httpd.shutdown()
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Synthetic probe traffic shaped like what the gateways forward.
+
+Each simulated probe has its own experiment and drifts slowly: temperatures
+and water quality random-walk, the battery drains, iterations count up and
+the device timestamp advances like the RTC string in the LoRa payload. Wake
+rows carry a unit quaternion and small IMU noise. Seeded, so a run is
+reproducible.
+"""
+import math
+import random
+import struct
+from datetime import datetime, timedelta
+
+WAKE_BINARY_FORMAT = '<18f'
+
+
+class Probe:
+    def __init__(self, index, rng, water_probability=0.0):
+        self.rng = rng
+        self.experiment_id = f'bench-load-{index}'
+        self.probe_id = f'MAIN-{index}'
+        self.water_probability = water_probability
+        self.iterations = 0
+        self.clock = datetime(2025, 8, 7, 3, 0, 0) + timedelta(minutes=index)
+        self.temperatures = [rng.uniform(12, 24) for _ in range(4)]
+        self.ph = rng.uniform(6.5, 8.0)
+        self.tds = rng.uniform(150, 400)
+        self.turbidity = rng.uniform(0, 10)
+        self.battery = rng.uniform(80, 100)
+        self.heading = rng.uniform(0, 360)
+
+    def _walk(self, value, step, low, high):
+        return min(high, max(low, value + self.rng.gauss(0, step)))
+
+    def main_row(self):
+        self.iterations += 1
+        self.clock += timedelta(seconds=10)
+        self.temperatures = [self._walk(t, 0.05, -2, 35) for t in self.temperatures]
+        self.ph = self._walk(self.ph, 0.01, 0, 14)
+        self.tds = self._walk(self.tds, 1.0, 0, 2000)
+        self.turbidity = self._walk(self.turbidity, 0.2, 0, 100)
+        self.battery = max(0.0, self.battery - 0.001)
+        clock = self.clock
+        return {
+            'experiment_id': self.experiment_id,
+            'temperature_1': round(self.temperatures[0], 2),
+            'temperature_2': round(self.temperatures[1], 2),
+            'temperature_3': round(self.temperatures[2], 2),
+            'temperature_4': round(self.temperatures[3], 2),
+            'ph': round(self.ph, 2),
+            'battery_level': round(self.battery, 2),
+            'tds': round(self.tds, 2),
+            'turbidity': round(self.turbidity, 2),
+            'water_detected': self.rng.random() < self.water_probability,
+            'probe_id': self.probe_id,
+            'iterations': self.iterations,
+            'device_timestamp': (f'{clock.year}/{clock.month}/{clock.day}/{clock.isoweekday()}/'
+                                 f'{clock.hour}/{clock.minute}/{clock.second}/0'),
+        }
+
+    def wake_values(self):
+        """The 18 wake values in WAKE_COLUMNS order (after experiment_id)"""
+        rng = self.rng
+        self.heading = (self.heading + rng.gauss(0, 0.5)) % 360
+        pitch, roll = rng.gauss(0, 2), rng.gauss(0, 2)
+        half = math.radians(self.heading) / 2
+        quaternion = [rng.gauss(0, 0.01), rng.gauss(0, 0.01), math.sin(half), math.cos(half)]
+        norm = math.sqrt(sum(q * q for q in quaternion))
+        accel = [rng.gauss(0, 0.05), rng.gauss(0, 0.05), 9.81 + rng.gauss(0, 0.05)]
+        gyro = [rng.gauss(0, 0.01) for _ in range(3)]
+        linear = [rng.gauss(0, 0.05) for _ in range(3)]
+        return [self.heading, pitch, roll, *accel, *gyro, *(q / norm for q in quaternion), *linear,
+                rng.uniform(0, 1), rng.uniform(0, 50)]
+
+    def wake_row(self):
+        values = [round(v, 4) for v in self.wake_values()]
+        return {
+            'experiment_id': self.experiment_id,
+            'rotation_data': ','.join(str(v) for v in values[:16]),
+            'hydrophone_reading': values[16],
+            'water_level': values[17],
+        }
+
+    def wake_binary(self, records):
+        return b''.join(struct.pack(WAKE_BINARY_FORMAT, *self.wake_values()) for _ in range(records))
+
+
+class Traffic:
+    """Round-robins requests across ``probes`` simulated probes"""
+
+    def __init__(self, probes=10, seed=1, water_probability=0.0):
+        rng = random.Random(seed)
+        self.probes = [Probe(index, rng, water_probability) for index in range(probes)]
+        self._next = 0
+
+    def probe(self):
+        probe = self.probes[self._next % len(self.probes)]
+        self._next += 1
+        return probe
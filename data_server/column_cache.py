@@ -0,0 +1,309 @@
+"""Memory-mappable per-experiment column files for offline analysis.
+
+``sync`` copies one experiment's numeric main_data/wake_data columns into
+``<COLUMN_CACHE_DIR>/<experiment_id>/<table>/<column>.npy``, one NumPy file
+per column in timestamp order, and ``load`` maps them back as read-only
+arrays without copying, so a month of readings opens in milliseconds.
+
+Rows are fetched with a binary COPY whose nulls are replaced by NaN (-1
+for water_detected), which makes every record the same width and lets the
+whole result be decoded as one big-endian structured array. Later syncs
+fetch only rows with an id above the last one cached and append them in
+place; if backfilled rows (sd_import.py) land before the cached end, the
+table is rebuilt instead so the files stay sorted by timestamp.
+
+    python column_cache.py sync lake-2025-08
+    python column_cache.py info lake-2025-08
+
+    import column_cache
+    wake = column_cache.load('lake-2025-08', 'wake_data', start=datetime(2025, 8, 1))
+    wake['yaw'].mean()
+"""
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ingest import MAIN_COLUMNS, WAKE_COLUMNS
+
+COLUMN_CACHE_DIR = os.environ.get('COLUMN_CACHE_DIR', 'column_cache')
+
+# table -> (column, binary COPY wire type, stored dtype); nullable columns are coalesced.
+# timestamp goes over the wire as Postgres sends it, an int8 of microseconds.
+CACHED_COLUMNS = {
+    'main_data': [('id', 'int4', '<i4'), ('timestamp', 'int8', '<M8[us]')]
+                 + [(column, 'float4', '<f4') for column in MAIN_COLUMNS[1:-1]]
+                 + [('water_detected', 'int2', '<i2')],
+    'wake_data': [('id', 'int4', '<i4'), ('timestamp', 'int8', '<M8[us]')]
+                 + [(column, 'float4', '<f4') for column in WAKE_COLUMNS[1:]],
+}
+COLUMN_DTYPES = {column: dtype for columns in CACHED_COLUMNS.values() for column, _, dtype in columns}
+
+# Binary COPY framing: 11-byte signature, flags and extension length; -1 field count ends the data
+COPY_HEADER_BYTES = 19
+COPY_TRAILER_BYTES = 2
+# Postgres binary timestamps count microseconds from 2000-01-01
+PG_EPOCH_US = 946684800 * 1000000
+
+# .npy headers are written at a fixed size with room for any row count, so appends only rewrite the shape
+NPY_HEADER_BYTES = 128
+
+# Seconds to wait for ingest transactions that were open when a sync started
+SETTLE_TIMEOUT = 10
+
+
+def _select_expr(column, pg_type):
+    if column == 'water_detected':
+        return 'COALESCE(water_detected::int, -1)::int2'
+    if pg_type == 'float4':
+        return f"COALESCE({column}, 'NaN')::float4"
+    if column == 'timestamp':
+        return column
+    return f'{column}::{pg_type}'
+
+
+def _wire_dtype(columns):
+    """Structured dtype of one binary COPY record: field count, then (length, value) per column"""
+    fields = [('count', '>i2')]
+    for column, pg_type, _ in columns:
+        fields += [(f'{column}_len', '>i4'), (column, {'int2': '>i2', 'int4': '>i4', 'int8': '>i8',
+                                                       'float4': '>f4'}[pg_type])]
+    return np.dtype(fields)
+
+
+def _npy_header(dtype, rows):
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (rows,)}
+    text = repr(header).encode('latin1')
+    # Magic and version (8 bytes) and the header length (2), then the dict padded with spaces to a newline
+    length = NPY_HEADER_BYTES - len(np.lib.format.MAGIC_PREFIX) - 4
+    return (np.lib.format.MAGIC_PREFIX + bytes([1, 0]) + length.to_bytes(2, 'little')
+            + text.ljust(length - 1) + b'\n')
+
+
+def _table_dir(cache_dir, experiment_id, table):
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', experiment_id)
+    return os.path.join(cache_dir, safe, table)
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, 'meta.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _wait_for_writers(conn, table):
+    """Return the highest id it is safe to cache.
+
+    Ids come from a sequence, so a transaction that is still open can commit
+    an id below one that is already visible (see rollups.refresh). Waits
+    until every transaction open at the start has finished, which for ingest
+    is a few milliseconds.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT MAX(id), txid_snapshot_xmax(txid_current_snapshot()) FROM {table}')
+        upper, xmax = cur.fetchone()
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while time.monotonic() < deadline:
+            cur.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+            if cur.fetchone()[0] >= xmax:
+                break
+            conn.commit()
+            time.sleep(0.05)
+    conn.commit()
+    return upper
+
+
+def copy_records(conn, table, condition, params, out, limit=None):
+    """Binary COPY the cached columns of ``table`` rows matching ``condition`` into ``out``.
+
+    Returns them decoded as a structured array in timestamp order (memory-
+    mapped when ``out`` is a named file, a view of the buffer for BytesIO),
+    or None if nothing matched. At most ``limit`` rows are copied when it is
+    given. Use ``column_values`` to get native columns.
+    """
+    columns = CACHED_COLUMNS[table]
+    select = ', '.join(_select_expr(column, pg_type) for column, pg_type, _ in columns)
+    query = f'SELECT {select} FROM {table} WHERE {condition} ORDER BY timestamp, id'
+    if limit is not None:
+        query += f' LIMIT {int(limit)}'
+    with conn.cursor() as cur:
+        sql = cur.mogrify(query, params).decode()
+        cur.copy_expert(f'COPY ({sql}) TO STDOUT (FORMAT binary)', out)
+    conn.commit()
+    out.flush()
+    size = out.tell()
+    wire = _wire_dtype(columns)
+    body = size - COPY_HEADER_BYTES - COPY_TRAILER_BYTES
+    if body % wire.itemsize:
+        raise RuntimeError(f'Unexpected binary COPY size {size} for {table}')
+    if body == 0:
+        return None
+    if isinstance(out, io.BytesIO):
+        return np.frombuffer(out.getbuffer(), dtype=wire, offset=COPY_HEADER_BYTES, count=body // wire.itemsize)
+    return np.memmap(out.name, dtype=wire, mode='r', offset=COPY_HEADER_BYTES, shape=(body // wire.itemsize,))
+
+
+def _fetch(conn, table, experiment_id, after_id, upper_id, spool):
+    """The experiment's rows with ``after_id < id <= upper_id``, spooled through ``spool``"""
+    return copy_records(conn, table, 'experiment_id = %s AND id > %s AND id <= %s',
+                        (experiment_id, after_id, upper_id), spool)
+
+
+def column_values(records, column):
+    """One column of ``copy_records`` output as a native array in its cached dtype"""
+    dtype = COLUMN_DTYPES[column]
+    if column == 'timestamp':
+        return (records[column].astype('<i8') + PG_EPOCH_US).view(dtype)
+    return records[column].astype(dtype)
+
+
+def _append(directory, table, records, rows):
+    """Append decoded records to every column file, trimming any tail a crashed sync left behind"""
+    for column, _, dtype in CACHED_COLUMNS[table]:
+        values = column_values(records, column)
+        path = os.path.join(directory, f'{column}.npy')
+        with open(path, 'r+b') as f:
+            f.truncate(NPY_HEADER_BYTES + rows * values.itemsize)
+            f.seek(0, os.SEEK_END)
+            values.tofile(f)
+            f.seek(0)
+            f.write(_npy_header(dtype, rows + len(values)))
+
+
+def _create(directory, table):
+    os.makedirs(directory, exist_ok=True)
+    for column, _, dtype in CACHED_COLUMNS[table]:
+        with open(os.path.join(directory, f'{column}.npy'), 'wb') as f:
+            f.write(_npy_header(dtype, 0))
+
+
+def sync_table(conn, experiment_id, table, cache_dir=COLUMN_CACHE_DIR, rebuild=False):
+    """Bring one experiment's cached table up to date; returns a summary dict"""
+    directory = _table_dir(cache_dir, experiment_id, table)
+    meta = None if rebuild else read_meta(directory)
+    if meta is not None and meta.get('columns') != [column for column, _, _ in CACHED_COLUMNS[table]]:
+        meta = None
+    started = time.monotonic()
+    upper_id = _wait_for_writers(conn, table) or 0
+    after_id = meta['last_id'] if meta else 0
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, prefix='.copy-') as spool:
+        records = _fetch(conn, table, experiment_id, after_id, upper_id, spool)
+        if meta is not None and records is not None and int(records['timestamp'][0]) + PG_EPOCH_US < meta['last_timestamp_us']:
+            # Backfilled rows sort before the cached end: refetch everything so the files stay in order
+            spool.seek(0)
+            spool.truncate()
+            meta, after_id = None, 0
+            records = _fetch(conn, table, experiment_id, 0, upper_id, spool)
+
+        mode = 'append' if meta is not None else 'rebuild'
+        target = directory if meta is not None else directory + '.tmp'
+        rows = meta['rows'] if meta is not None else 0
+        if meta is None:
+            shutil.rmtree(target, ignore_errors=True)
+            _create(target, table)
+            meta = {'experiment_id': experiment_id, 'table': table,
+                    'columns': [column for column, _, _ in CACHED_COLUMNS[table]],
+                    'rows': 0, 'last_id': 0, 'last_timestamp_us': None}
+        added = 0
+        if records is not None:
+            _append(target, table, records, rows)
+            added = len(records)
+            meta['rows'] = rows + added
+            meta['last_timestamp_us'] = int(records['timestamp'][-1]) + PG_EPOCH_US
+            del records
+        meta['last_id'] = max(meta['last_id'], upper_id)
+        meta['synced_at'] = time.time()
+        _write_meta(target, meta)
+
+    if target != directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(target, directory)
+    return {'table': table, 'mode': mode, 'added': added, 'rows': meta['rows'],
+            'elapsed_s': round(time.monotonic() - started, 3)}
+
+
+def sync(conn, experiment_id, tables=tuple(CACHED_COLUMNS), cache_dir=COLUMN_CACHE_DIR, rebuild=False):
+    """Sync every table in ``tables`` for one experiment; returns their summaries"""
+    return [sync_table(conn, experiment_id, table, cache_dir, rebuild) for table in tables]
+
+
+def load(experiment_id, table, columns=None, start=None, end=None, cache_dir=COLUMN_CACHE_DIR):
+    """Map a cached table as ``{column: read-only array}`` without copying.
+
+    ``start``/``end`` (datetimes or numpy datetime64, end exclusive) are
+    found by binary search on the sorted timestamp column and returned as
+    views. Missing values are NaN, and -1 for water_detected.
+    """
+    directory = _table_dir(cache_dir, experiment_id, table)
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f'No cached {table} for {experiment_id!r} in {cache_dir}; run sync first')
+    rows = meta['rows']
+
+    def column_array(column):
+        # Slice to the committed row count in case a sync was interrupted mid-append
+        return np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')[:rows]
+
+    timestamps = column_array('timestamp')
+    first, last = 0, rows
+    if start is not None:
+        first = int(np.searchsorted(timestamps, np.datetime64(start, 'us'), side='left'))
+    if end is not None:
+        last = int(np.searchsorted(timestamps, np.datetime64(end, 'us'), side='left'))
+    names = columns or meta['columns']
+    unknown = set(names) - set(meta['columns'])
+    if unknown:
+        raise KeyError(f"Unknown column(s) {', '.join(sorted(unknown))} for {table}")
+    return {column: (timestamps if column == 'timestamp' else column_array(column))[first:last]
+            for column in names}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=('sync', 'info'))
+    parser.add_argument('experiment_id')
+    parser.add_argument('--table', choices=tuple(CACHED_COLUMNS), help='only this table (default both)')
+    parser.add_argument('--dir', default=COLUMN_CACHE_DIR, help='cache directory (default COLUMN_CACHE_DIR)')
+    parser.add_argument('--rebuild', action='store_true', help='refetch everything instead of appending')
+    args = parser.parse_args()
+    tables = (args.table,) if args.table else tuple(CACHED_COLUMNS)
+
+    if args.command == 'info':
+        for table in tables:
+            meta = read_meta(_table_dir(args.dir, args.experiment_id, table))
+            if meta is None:
+                print(f'{table}: not cached')
+                continue
+            last = np.datetime64(meta['last_timestamp_us'], 'us') if meta['last_timestamp_us'] else None
+            print(f"{table}: {meta['rows']:,} rows up to id {meta['last_id']}, last reading {last}")
+        sys.exit()
+
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+    try:
+        for result in sync(conn, args.experiment_id, tables, args.dir, args.rebuild):
+            print(f"✓ {result['table']}: {result['mode']} +{result['added']:,} rows, "
+                  f"{result['rows']:,} cached ({result['elapsed_s']}s)")
+    finally:
+        conn.close()
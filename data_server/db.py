@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2 import pool as pg_pool
+
+import metrics
+import profiler
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT seconds"""
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool with health checks.
+
+    psycopg2's ThreadedConnectionPool raises as soon as it is exhausted, so a
+    semaphore sized to ``maxconn`` makes callers wait (up to ``timeout``) for a
+    connection instead. Connections that sat idle longer than
+    ``healthcheck_interval`` are pinged with ``SELECT 1`` before being handed
+    out, and broken ones are discarded and replaced.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0, healthcheck_interval=30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self.in_use = 0
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def getconn(self):
+        """Check out a healthy connection, waiting for a free slot if needed"""
+        with metrics.DB_CONNECT_SECONDS.time(), profiler.stage('get_db_connection'):
+            return self._getconn()
+
+    def _getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f'No database connection available after {self.timeout}s')
+        try:
+            # Retry once per pool slot so a burst of dead connections (e.g. after
+            # a Postgres restart) is flushed instead of surfacing as errors
+            for _ in range(self.maxconn):
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    break
+                self._pool.putconn(conn, close=True)
+            else:
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection, discarding it if it is closed or mid-transaction"""
+        close = conn.closed != 0
+        if not close:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+        with self._lock:
+            self.in_use -= 1
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it from the environment on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.environ.get('DATABASE_URL'),
+                    minconn=int(os.environ.get('DB_POOL_MIN', 1)),
+                    maxconn=int(os.environ.get('DB_POOL_MAX', 10)),
+                    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                    healthcheck_interval=float(os.environ.get('DB_POOL_HEALTHCHECK_INTERVAL', 30)),
+                )
+    return _pool
+
+
+def get_db_connection():
+    """Context manager yielding a pooled database connection.
+
+    Callers commit explicitly; anything left uncommitted is rolled back when
+    the connection goes back to the pool.
+    """
+    return get_pool().connection()
@@ -0,0 +1,88 @@
+"""Fan-out of committed rows to Server-Sent Events subscribers (GET /api/stream)"""
+import itertools
+import json
+import os
+import threading
+from collections import deque
+
+
+class Subscription:
+    """One SSE client's pending frames.
+
+    The queue is bounded: when a slow client falls more than ``max_pending``
+    frames behind, the oldest frames are dropped (newer readings supersede
+    them) and the client is told how many it missed.
+    """
+
+    def __init__(self, experiment_id, max_pending):
+        self.experiment_id = experiment_id
+        self._frames = deque()
+        self._max_pending = max_pending
+        self._dropped = 0
+        self._ready = threading.Condition()
+
+    def push(self, frame):
+        with self._ready:
+            if len(self._frames) >= self._max_pending:
+                self._frames.popleft()
+                self._dropped += 1
+            self._frames.append(frame)
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Block until frames arrive or ``timeout`` passes; returns ``(frames, dropped_since_last_call)``"""
+        with self._ready:
+            self._ready.wait_for(lambda: self._frames, timeout)
+            frames = list(self._frames)
+            self._frames.clear()
+            dropped, self._dropped = self._dropped, 0
+        return frames, dropped
+
+
+class EventBroadcaster:
+    """Shared in-process fan-out of committed rows to SSE subscribers.
+
+    Each event is serialized once and the same bytes are appended to every
+    subscriber of that experiment, so N viewers cost one encode and no
+    database reads.
+    """
+
+    def __init__(self, max_pending=256):
+        self.max_pending = max_pending
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, experiment_id):
+        subscription = Subscription(experiment_id, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(experiment_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.experiment_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.experiment_id]
+
+    def has_subscribers(self, experiment_id):
+        return experiment_id in self._subscribers
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, experiment_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(experiment_id, ()))
+        if not subscribers:
+            return
+        frame = f'id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n'.encode()
+        for subscription in subscribers:
+            subscription.push(frame)
+
+
+event_broadcaster = EventBroadcaster(int(os.environ.get('SSE_MAX_PENDING', 256)))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
@@ -0,0 +1,336 @@
+"""Framework-neutral pieces of the ingest path, shared by the Flask app (main.py) and the ASGI app (asgi.py)"""
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+MAIN_COLUMNS = ('experiment_id', 'temperature_1', 'temperature_2', 'temperature_3', 'temperature_4',
+                'ph', 'battery_level', 'tds', 'turbidity', 'water_detected')
+WAKE_COLUMNS = ('experiment_id', 'yaw', 'pitch', 'roll', 'ax', 'ay', 'az', 'gx', 'gy', 'gz',
+                'qx', 'qy', 'qz', 'qw', 'lax', 'lay', 'laz', 'hydrophone_reading', 'water_level')
+
+# Optional per-packet dedupe key sent by the gateway (LoRa payload fields 0-2).
+# Parsed main rows are ordered like MAIN_INGEST_COLUMNS, with the key None when absent.
+MAIN_KEY_COLUMNS = ('probe_id', 'iterations', 'device_timestamp')
+MAIN_INGEST_COLUMNS = MAIN_COLUMNS + MAIN_KEY_COLUMNS
+WATER_DETECTED_INDEX = MAIN_COLUMNS.index('water_detected')
+
+# Largest magnitude a REAL column stores, and the range of an INTEGER column. Values
+# outside them would fail the whole multi-row insert, so they are rejected per row.
+REAL_MAX = 3.4e38
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _real(value, field):
+    """Check that a parsed float fits a REAL column (NaN is allowed)"""
+    if math.isinf(value) or abs(value) > REAL_MAX:
+        raise ValueError(f"Field '{field}' is out of range")
+    return value
+
+
+def _number(data, field):
+    """Read a numeric field from a JSON row, raising ValueError with a client-facing message"""
+    if field not in data:
+        raise ValueError(f"Missing field '{field}'")
+    value = data[field]
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"Field '{field}' must be a number")
+    try:
+        number = float(value)
+    except (ValueError, OverflowError):
+        raise ValueError(f"Field '{field}' must be a number")
+    return _real(number, field)
+
+
+BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+def _boolean(data, field):
+    """Read a boolean field strictly: true/false, 1/0 or their string forms; "false" must not read as True"""
+    value = data[field]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in BOOLEAN_STRINGS:
+        return BOOLEAN_STRINGS[value.strip().lower()]
+    raise ValueError(f"Field '{field}' must be a boolean")
+
+
+def _main_key(data):
+    """Read the optional (probe_id, iterations, device_timestamp) key; all three or none"""
+    present = [column for column in MAIN_KEY_COLUMNS if data.get(column) is not None]
+    if not present:
+        return (None, None, None)
+    if len(present) != len(MAIN_KEY_COLUMNS):
+        raise ValueError('probe_id, iterations and device_timestamp must be sent together')
+    iterations = data['iterations']
+    if isinstance(iterations, bool) or not isinstance(iterations, (int, str)):
+        raise ValueError("Field 'iterations' must be an integer")
+    try:
+        iterations = int(iterations)
+    except ValueError:
+        raise ValueError("Field 'iterations' must be an integer")
+    if not INT32_MIN <= iterations <= INT32_MAX:
+        raise ValueError("Field 'iterations' is out of range")
+    return (str(data['probe_id']), iterations, str(data['device_timestamp']))
+
+
+def parse_main_row(data):
+    """Validate a main sensor JSON row and return it as a tuple ordered like MAIN_INGEST_COLUMNS"""
+    if not isinstance(data, dict):
+        raise ValueError('Row must be a JSON object')
+    if 'experiment_id' not in data:
+        raise ValueError("Missing field 'experiment_id'")
+    if 'water_detected' not in data:
+        raise ValueError("Missing field 'water_detected'")
+    return (str(data['experiment_id']),
+            *(_number(data, column) for column in MAIN_COLUMNS[1:-1]),
+            _boolean(data, 'water_detected'),
+            *_main_key(data))
+
+
+def main_row_key(row):
+    """The dedupe key of a parsed main row, or None if it was sent without one"""
+    key = row[len(MAIN_COLUMNS):]
+    return key if key[0] is not None else None
+
+
+def main_insert_sql(placeholder):
+    """INSERT for parsed main rows that skips any whose dedupe key is already stored.
+
+    Takes one array parameter per MAIN_INGEST_COLUMNS entry (``placeholder(n)``
+    renders the n-th, 1-based, in the driver's style) and returns the rows that
+    were actually inserted. Keys are claimed in main_data_keys, whose primary
+    key is the unique index; main_data itself is partitioned on timestamp and
+    cannot carry one. Repeats within the batch keep their first occurrence,
+    and rows without a key are always inserted. Rows are inserted, and so
+    numbered and returned, in batch order, which keeps the last returned row
+    per experiment its latest one.
+    """
+    types = ['text'] + ['real'] * (len(MAIN_COLUMNS) - 2) + ['boolean', 'text', 'integer', 'text']
+    arrays = ', '.join(f'{placeholder(n)}::{kind}[]' for n, kind in enumerate(types, 1))
+    columns = ', '.join(MAIN_INGEST_COLUMNS)
+    key = ', '.join(MAIN_KEY_COLUMNS)
+    return f"""
+        WITH incoming AS (
+            SELECT * FROM unnest({arrays}) WITH ORDINALITY AS t({columns}, ordinal)
+        ), claimed AS (
+            INSERT INTO main_data_keys ({key})
+            SELECT DISTINCT {key} FROM incoming WHERE probe_id IS NOT NULL
+            ON CONFLICT DO NOTHING
+            RETURNING {key}
+        )
+        INSERT INTO main_data ({columns})
+        SELECT {columns} FROM (
+            SELECT * FROM (
+                SELECT DISTINCT ON ({key}) incoming.*
+                FROM incoming JOIN claimed USING ({key})
+                ORDER BY {key}, ordinal
+            ) AS first_seen
+            UNION ALL
+            SELECT * FROM incoming WHERE probe_id IS NULL
+        ) AS accepted
+        ORDER BY ordinal
+        RETURNING {columns}
+    """
+
+
+def column_arrays(rows, width):
+    """Transpose rows into one list per column, the parameters main_insert_sql expects"""
+    if not rows:
+        return [[] for _ in range(width)]
+    return [list(column) for column in zip(*rows)]
+
+
+def mark_duplicates(rows, inserted, results):
+    """Flag the ok results whose row was skipped as a duplicate; returns how many were"""
+    inserted_keys = {main_row_key(row) for row in inserted}
+    seen = set()
+    duplicates = 0
+    ok_results = (result for result in results if result['status'] == 'ok')
+    for row, result in zip(rows, ok_results):
+        key = main_row_key(row)
+        if key is None:
+            continue
+        if key in seen or key not in inserted_keys:
+            result['status'] = 'duplicate'
+            duplicates += 1
+        seen.add(key)
+    return duplicates
+
+
+def parse_wake_row(data):
+    """Validate a wake sensor JSON row and return it as a tuple ordered like WAKE_COLUMNS"""
+    if not isinstance(data, dict):
+        raise ValueError('Row must be a JSON object')
+    if 'experiment_id' not in data:
+        raise ValueError("Missing field 'experiment_id'")
+    if not isinstance(data.get('rotation_data'), str):
+        raise ValueError("Missing field 'rotation_data'")
+
+    # Parse rotation data string into individual values
+    try:
+        rotation_values = [float(x.strip()) for x in data['rotation_data'].split(',')]
+    except ValueError:
+        raise ValueError('Rotation data must contain only numbers')
+    if len(rotation_values) != 16:
+        raise ValueError('Rotation data must contain exactly 16 comma-separated values')
+    for value in rotation_values:
+        _real(value, 'rotation_data')
+
+    return (str(data['experiment_id']), *rotation_values,
+            _number(data, 'hydrophone_reading'), _number(data, 'water_level'))
+
+
+class BatchError(ValueError):
+    """A batch body that cannot be processed at all, with the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_batch(body, parse_row, max_rows):
+    """Validate every row of a JSON batch body; returns ``(rows, results)`` with one result per input row"""
+    if isinstance(body, dict):
+        body = body.get('rows')
+    if not isinstance(body, list):
+        raise BatchError('Body must be a JSON array of rows or {"rows": [...]}')
+    if len(body) > max_rows:
+        raise BatchError(f'Batch exceeds the maximum of {max_rows} rows', 413)
+
+    rows = []
+    results = []
+    for index, data in enumerate(body):
+        try:
+            rows.append(parse_row(data))
+            results.append({'index': index, 'status': 'ok'})
+        except ValueError as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+    return rows, results
+
+
+def batch_summary(inserted, results, received, elapsed):
+    """Response body and HTTP status for a processed batch"""
+    duplicates = sum(result['status'] == 'duplicate' for result in results)
+    rejected = received - inserted - duplicates
+    accepted = inserted + duplicates
+    response = {
+        'status': 'success' if not rejected else ('partial' if accepted else 'error'),
+        'inserted': inserted,
+        'duplicates': duplicates,
+        'rejected': rejected,
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'rows_per_sec': round(inserted / elapsed, 1) if elapsed > 0 else None,
+        'results': results,
+    }
+    return response, 200 if accepted or not received else 400
+
+
+# Channel the ASGI app notifies after each commit, once per table and experiment,
+# so the Flask app (latest, stream) sees rows it did not insert itself.
+ROWS_CHANNEL = 'glas_rows'
+
+
+def rows_notification(table, experiment_id):
+    """NOTIFY payload announcing new rows of ``table`` for an experiment"""
+    return json.dumps([table, experiment_id])
+
+
+def parse_rows_notification(payload):
+    """``(table, experiment_id)`` from a rows_notification payload"""
+    table, experiment_id = json.loads(payload)
+    return table, experiment_id
+
+
+# Packed wake records: the WAKE_COLUMNS after experiment_id as little-endian
+# float32, 72 bytes per row. experiment_id travels in the query string and NaN
+# stands for a missing value.
+WAKE_BINARY_MIMETYPE = 'application/vnd.glas.wake+f32'
+WAKE_BINARY_DTYPE = np.dtype('<f4')
+WAKE_BINARY_FIELDS = len(WAKE_COLUMNS) - 1
+
+
+def parse_wake_binary(body, experiment_id):
+    """Decode packed wake records, vectorized with NumPy; returns ``(rows, results)`` like parse_batch.
+
+    Rows are tuples ordered like WAKE_COLUMNS. A record holding ±inf is
+    rejected on its own, as ``_real`` rejects it in a JSON row.
+    """
+    if not experiment_id:
+        raise ValueError('experiment_id query parameter is required for binary wake data')
+    record_size = WAKE_BINARY_FIELDS * WAKE_BINARY_DTYPE.itemsize
+    if not body or len(body) % record_size:
+        raise ValueError(f'Binary wake data must be a multiple of {record_size} bytes')
+    values = np.frombuffer(body, dtype=WAKE_BINARY_DTYPE).reshape(-1, WAKE_BINARY_FIELDS).astype(np.float64)
+    infinite = np.isinf(values)
+    missing = np.isnan(values)
+    if missing.any():
+        values = values.astype(object)
+        values[missing] = None
+    if not infinite.any():
+        rows = [(experiment_id, *row) for row in values.tolist()]
+        return rows, [{'index': index, 'status': 'ok'} for index in range(len(rows))]
+
+    rows = []
+    results = []
+    first_infinite = infinite.argmax(axis=1)
+    for index, (row, bad) in enumerate(zip(values.tolist(), infinite.any(axis=1))):
+        if bad:
+            field = WAKE_COLUMNS[1 + first_infinite[index]]
+            results.append({'index': index, 'status': 'error', 'error': f"Field '{field}' is out of range"})
+        else:
+            rows.append((experiment_id, *row))
+            results.append({'index': index, 'status': 'ok'})
+    return rows, results
+
+
+SOS_RATE_LIMIT_SECONDS = 24 * 60 * 60
+
+
+class SosRateLimitCache:
+    """Process-local record of when each experiment last sent an SOS.
+
+    Times are kept on the monotonic clock and seeded from the age Postgres
+    reports, so the server and database clocks never need to agree. A fresh
+    entry answers "rate-limited" without a query; a miss or an expired entry
+    falls back to sos_events, since another process may have sent since.
+    """
+
+    def __init__(self, ttl=SOS_RATE_LIMIT_SECONDS):
+        self.ttl = ttl
+        self._last_sent = {}
+        self._lock = threading.Lock()
+
+    def load(self, rows):
+        """Seed the cache from ``(experiment_id, seconds_since_last_sos)`` rows"""
+        for experiment_id, age in rows:
+            self.record(experiment_id, float(age))
+        return len(rows)
+
+    def record(self, experiment_id: str, age: float = 0.0):
+        """Remember that an SOS went out ``age`` seconds ago"""
+        sent_at = time.monotonic() - age
+        with self._lock:
+            if sent_at > self._last_sent.get(experiment_id, float('-inf')):
+                self._last_sent[experiment_id] = sent_at
+
+    def is_limited(self, experiment_id: str):
+        """True if a cached SOS for this experiment is still within the TTL"""
+        with self._lock:
+            sent_at = self._last_sent.get(experiment_id)
+            if sent_at is None:
+                return False
+            if time.monotonic() - sent_at < self.ttl:
+                return True
+            del self._last_sent[experiment_id]
+            return False
+
+
+def auto_sos_message(experiment_id):
+    return f"🚨 Water detected for experiment {experiment_id}. Please help. 🚨"
@@ -0,0 +1,58 @@
+"""Flask wiring for request metrics and the profiler: per-request hooks and GET/DELETE /admin/profile"""
+import time
+from functools import wraps
+
+from flask import Blueprint, Response, g, jsonify, request
+
+import metrics
+import profiler
+
+blueprint = Blueprint('instrumentation', __name__)
+
+
+@blueprint.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler.should_profile(request.headers.get(profiler.PROFILE_HEADER)):
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        profiler.start(f'{request.method} {route}')
+
+
+@blueprint.teardown_app_request
+def finish_request_profile(exc):
+    profiler.finish()
+
+
+@blueprint.after_app_request
+def record_request_metrics(response):
+    """Count every request and time its handler (streamed bodies are timed to the first byte)"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUESTS.inc(route, request.method, str(response.status_code))
+    started = g.get('request_started')
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method)
+    return response
+
+
+def require_admin_key(f):
+    """Decorator for admin endpoints, which take ADMIN_API_KEY as the Bearer token"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not profiler.ADMIN_API_KEY:
+            return jsonify({'error': 'ADMIN_API_KEY environment variable not set'}), 403
+        if request.headers.get('Authorization') != f'Bearer {profiler.ADMIN_API_KEY}':
+            return jsonify({'error': 'Invalid admin key'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@blueprint.route('/admin/profile', methods=['GET', 'DELETE'])
+@require_admin_key
+def get_profile():
+    """Aggregated stage timings as folded stacks (default) or JSON (?format=json); DELETE resets them"""
+    if request.method == 'DELETE':
+        profiler.reset()
+        return jsonify({'status': 'reset'})
+    if request.args.get('format') == 'json':
+        return jsonify({'sample_rate': profiler.SAMPLE_RATE, 'stacks': profiler.summary()})
+    return Response(profiler.folded(), mimetype='text/plain')
@@ -0,0 +1,45 @@
+"""Periodic background jobs (rollup refresh, partition maintenance) run on daemon threads"""
+import atexit
+import os
+import threading
+
+import partitions
+import rollups
+from db import get_db_connection
+from query import ROLLUP_SOURCES
+
+ROLLUP_INTERVAL = float(os.environ.get('ROLLUP_INTERVAL', 60))
+PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get('PARTITION_MAINTENANCE_INTERVAL', 6 * 60 * 60))
+
+
+def refresh_rollups():
+    """Fold raw rows added since the last run into the 1m/1h/1d rollup tables"""
+    processed = {}
+    with get_db_connection() as conn:
+        for table, columns in ROLLUP_SOURCES.items():
+            processed[table] = rollups.refresh(conn, table, columns)
+    return processed
+
+
+def maintain_partitions():
+    """Create upcoming monthly partitions and apply the retention policy"""
+    with get_db_connection() as conn:
+        return partitions.maintain(conn)
+
+
+background_stop = threading.Event()
+atexit.register(background_stop.set)
+
+
+def start_background_job(name, interval, job):
+    """Run ``job`` every ``interval`` seconds on a daemon thread until shutdown"""
+    def loop():
+        while not background_stop.wait(interval):
+            try:
+                job()
+            except Exception as e:
+                print(f"⚠️ Background job {name} failed: {e}")
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
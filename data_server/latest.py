@@ -0,0 +1,128 @@
+"""In-memory latest main and wake reading per experiment, for GET /api/latest"""
+import itertools
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from db import get_db_connection
+from ingest import MAIN_INGEST_COLUMNS, WAKE_COLUMNS
+
+
+class LatestReadings:
+    """Most recent main and wake reading per experiment, updated on every insert.
+
+    Rows inserted by the ASGI ingest app arrive as notifications (see
+    notifications.py) and invalidate the experiment instead, so it is reloaded.
+
+    Each change gets a new version, which doubles as the ETag for
+    GET /api/latest, so unchanged polls are answered from memory with a 304.
+    At most ``max_entries`` experiments are kept, least recently used first
+    out, and experiments without any rows are never cached, so arbitrary ids
+    in query strings cannot grow it. Inserts only update experiments already
+    cached: a miss does not know the other kind's stored reading, so it is
+    left for the next ``load``.
+    """
+
+    KINDS = {'main_data': 'main', 'wake_data': 'wake'}
+    EMPTY = {'main': None, 'wake': None}
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+        # experiment_id -> whether rows arrived (or it was invalidated) while a load was reading it
+        self._loading = {}
+        # Distinguishes ETags issued by different server processes/restarts
+        self._instance = uuid.uuid4().hex[:8]
+
+    def _etag(self, version):
+        return f'{self._instance}-{version}'
+
+    def update(self, table, columns, rows, received_at):
+        """Record the last row per experiment from a committed insert"""
+        kind = self.KINDS[table]
+        newest = {}
+        for row in rows:
+            newest[row[0]] = row
+        with self._lock:
+            for experiment_id, row in newest.items():
+                entry = self._entries.get(experiment_id)
+                if entry is None:
+                    if experiment_id in self._loading:
+                        self._loading[experiment_id] = True
+                    continue
+                entry[kind] = dict(zip(columns[1:], row[1:]), received_at=received_at)
+                entry['version'] = next(self._versions)
+                self._entries.move_to_end(experiment_id)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, experiment_id):
+        """Return ``(snapshot, etag)`` from memory, or None if this experiment has not been loaded"""
+        with self._lock:
+            entry = self._entries.get(experiment_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(experiment_id)
+            return {'main': entry['main'], 'wake': entry['wake']}, self._etag(entry['version'])
+
+    def invalidate(self, experiment_id):
+        """Forget an experiment so its next get() misses and load() reads it again"""
+        with self._lock:
+            self._entries.pop(experiment_id, None)
+            if experiment_id in self._loading:
+                self._loading[experiment_id] = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for experiment_id in self._loading:
+                self._loading[experiment_id] = True
+
+    def load(self, experiment_id):
+        """Fill a cache miss from the database (newest row per table) and return ``(snapshot, etag)``.
+
+        An experiment with no rows is answered with a fixed ETag and not cached.
+        """
+        with self._lock:
+            self._loading.setdefault(experiment_id, False)
+        try:
+            loaded = self._read(experiment_id)
+        except Exception:
+            with self._lock:
+                self._loading.pop(experiment_id, None)
+            raise
+        with self._lock:
+            # Rows committed while reading may be missing from ``loaded``; answer without caching then
+            stale = self._loading.pop(experiment_id, True)
+            if experiment_id not in self._entries and not stale:
+                if loaded == self.EMPTY:
+                    return dict(self.EMPTY), self._etag(0)
+                self._entries[experiment_id] = dict(loaded, version=next(self._versions))
+                self._evict()
+        return self.get(experiment_id) or (dict(loaded), self._etag(0))
+
+    def _read(self, experiment_id):
+        """Newest main and wake row of an experiment from the database"""
+        loaded = {}
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                for table, kind in self.KINDS.items():
+                    columns = MAIN_INGEST_COLUMNS if table == 'main_data' else WAKE_COLUMNS
+                    cur.execute(f"""
+                        SELECT timestamp, {', '.join(columns[1:])}
+                        FROM {table}
+                        WHERE experiment_id = %s
+                        ORDER BY timestamp DESC, id DESC
+                        LIMIT 1
+                    """, (experiment_id,))
+                    row = cur.fetchone()
+                    loaded[kind] = dict(zip(columns[1:], row[1:]), received_at=row[0].isoformat()) if row else None
+        return loaded
+
+
+latest_readings = LatestReadings(int(os.environ.get('LATEST_CACHE_SIZE', 10000)))
@@ -1,15 +1,43 @@
 import os
+import re
+import sys
+import json
+import time
+import atexit
+import signal
 import psycopg2
-import requests
-from flask import Flask, request, jsonify
+import psycopg2.extras
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 
-# Load environment variables from .env file
+# Load environment variables from .env file (before the modules below read their settings)
 load_dotenv()
 
+from db import get_db_connection, get_pool
+from ingest import (MAIN_COLUMNS, MAIN_INGEST_COLUMNS, WAKE_COLUMNS, WAKE_BINARY_MIMETYPE, WATER_DETECTED_INDEX,
+                    BatchError, batch_summary, column_arrays, main_insert_sql, mark_duplicates, parse_batch,
+                    parse_main_row, parse_wake_binary, parse_wake_row)
+from events import SSE_HEARTBEAT_SECONDS, event_broadcaster
+from jobs import (PARTITION_MAINTENANCE_INTERVAL, ROLLUP_INTERVAL, background_stop, maintain_partitions,
+                  refresh_rollups, start_background_job)
+from latest import LatestReadings, latest_readings
+from notifications import start_rows_listener
+from query import ROLLUP_SOURCES, numeric_columns, parse_range_args, parse_time, query_buckets
+from sos import log_sos_event, send_slack_sos_message, sos_dispatcher, warm_sos_rate_limit
+from write_behind import WriteBehindQueue
+import export
+import instrumentation
+import metrics
+import partitions
+import profiler
+import rollups
+import wake_metrics
+
 # Initialize Flask app
 app = Flask(__name__)
+app.register_blueprint(instrumentation.blueprint)
 
 # Database configuration
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -19,86 +47,22 @@ def require_api_key(f):
     """Decorator to require API key authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        
-        if not auth_header:
-            return jsonify({'error': 'Authorization header missing'}), 401
-        
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Invalid authorization format. Use Bearer token'}), 401
-        
-        token = auth_header.split(' ')[1]
-        
-        if token != API_KEY:
-            return jsonify({'error': 'Invalid API key'}), 401
-        
-        return f(*args, **kwargs)
-    return decorated_function
+        with profiler.stage('require_api_key'):
+            auth_header = request.headers.get('Authorization')
 
-def send_slack_sos_message(message_text: str):
-    """Send a message to the Slack SOS webhook. Returns (ok, error_message)."""
-    slack_webhook_url = os.environ.get('SLACK_SOS_WEBHOOK')
-    if not slack_webhook_url:
-        return False, 'SLACK_SOS_WEBHOOK environment variable not set'
+            if not auth_header:
+                return jsonify({'error': 'Authorization header missing'}), 401
 
-    payload = {'text': message_text}
-    try:
-        response = requests.post(slack_webhook_url, json=payload, timeout=10)
-        response.raise_for_status()
-        return True, None
-    except requests.exceptions.RequestException as e:
-        return False, str(e)
-
-def log_sos_event(experiment_id: str, source: str, message: str):
-    """Insert an SOS event record for auditing/rate limiting. Best-effort; exceptions bubble up."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO sos_events (experiment_id, source, message)
-                VALUES (%s, %s, %s)
-                """,
-                (experiment_id, source, message),
-            )
-        conn.commit()
-    finally:
-        conn.close()
+            if not auth_header.startswith('Bearer '):
+                return jsonify({'error': 'Invalid authorization format. Use Bearer token'}), 401
 
-def maybe_send_auto_sos(experiment_id: str):
-    """Send an SOS for this experiment if one hasn't been sent in the last 24 hours."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT 1
-                FROM sos_events
-                WHERE experiment_id = %s
-                  AND created_at >= NOW() - INTERVAL '24 hours'
-                ORDER BY created_at DESC
-                LIMIT 1
-                """,
-                (experiment_id,),
-            )
-            recent = cur.fetchone()
-
-        if recent:
-            return False  # rate-limited
+            token = auth_header.split(' ')[1]
 
-    finally:
-        conn.close()
+            if token != API_KEY:
+                return jsonify({'error': 'Invalid API key'}), 401
 
-    # Not rate-limited; send and log
-    message_text = f"🚨 Water detected for experiment {experiment_id}. Please help. 🚨"
-    ok, err = send_slack_sos_message(message_text)
-    if ok:
-        try:
-            log_sos_event(experiment_id, 'auto', message_text)
-        except Exception:
-            # Best-effort logging; do not raise to caller
-            pass
-    return ok
+        return f(*args, **kwargs)
+    return decorated_function
 
 def init_db():
     """Initialize database with schema"""
@@ -106,66 +70,329 @@ def init_db():
     with open('schema.sql', 'r') as f:
         with conn.cursor() as cur:
             cur.execute(f.read())
+    rollups.create_tables(conn, ROLLUP_SOURCES)
     conn.commit()
-    conn.close()
+    try:
+        # Raises NotPartitionedError on a database from before partitioning
+        partitions.maintain(conn)
+    finally:
+        conn.close()
 
-def get_db_connection():
-    """Get database connection"""
-    return psycopg2.connect(DATABASE_URL)
+BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', 10000))
+
+MAIN_INSERT_SQL = main_insert_sql(lambda n: '%s')
+
+def insert_rows(conn, table, columns, rows):
+    """Insert many rows inside the caller's transaction; returns the rows actually inserted.
+
+    main_data rows go through the dedupe-key insert in a single statement, so
+    repeats (LoRa retransmits, SD backlog replays) are skipped; other tables
+    use multi-row VALUES statements.
+    """
+    with conn.cursor() as cur, metrics.DB_QUERY_SECONDS.time(f'insert_{table}'), profiler.stage('execute'):
+        if table == 'main_data':
+            cur.execute(MAIN_INSERT_SQL, column_arrays(rows, len(columns)))
+            inserted = cur.fetchall()
+            if len(inserted) < len(rows):
+                metrics.DUPLICATE_ROWS.inc(table, amount=len(rows) - len(inserted))
+            return inserted
+        psycopg2.extras.execute_values(
+            cur,
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+            rows,
+            page_size=1000,
+        )
+    return rows
+
+def trigger_auto_sos(rows):
+    """Queue the rate-limited auto SOS once per experiment that reported water"""
+    experiments = {row[0] for row in rows if row[WATER_DETECTED_INDEX]}
+    for experiment_id in experiments:
+        sos_dispatcher.submit(experiment_id)
+
+def rows_committed(table, columns, rows):
+    """Hook run after rows are committed: update the latest-value cache, notify SSE subscribers, queue auto SOS"""
+    metrics.ROWS_INSERTED.inc(table, amount=len(rows))
+    received_at = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+    latest_readings.update(table, columns, rows, received_at)
+    kind = LatestReadings.KINDS[table]
+    for row in rows:
+        if event_broadcaster.has_subscribers(row[0]):
+            event_broadcaster.publish(row[0], kind, dict(zip(columns[1:], row[1:]), received_at=received_at))
+    if table == 'main_data':
+        trigger_auto_sos(rows)
+    else:
+        # New rows are timestamped now, so only cached ranges reaching the present are stale
+        wake_metrics.metric_cache.invalidate({row[0] for row in rows},
+                                             datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1))
+
+def rows_notified(table, experiment_id):
+    """Rows committed by the ASGI ingest app: reload the latest reading and pass the newest row to SSE subscribers"""
+    latest_readings.invalidate(experiment_id)
+    if table == 'wake_data':
+        wake_metrics.metric_cache.invalidate({experiment_id},
+                                             datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1))
+    if event_broadcaster.has_subscribers(experiment_id):
+        kind = LatestReadings.KINDS[table]
+        snapshot, _ = latest_readings.load(experiment_id)
+        if snapshot[kind] is not None:
+            event_broadcaster.publish(experiment_id, kind, snapshot[kind])
+
+def store_rows(table, columns, rows):
+    """Insert rows in one transaction, then run the post-commit hooks on those not skipped as duplicates"""
+    with get_db_connection() as conn:
+        inserted = insert_rows(conn, table, columns, rows)
+        with metrics.DB_QUERY_SECONDS.time('commit'), profiler.stage('commit'):
+            conn.commit()
+    if inserted:
+        rows_committed(table, columns, inserted)
+    return inserted
+
+write_behind = None
+if os.environ.get('WRITE_BEHIND', '').lower() in ('1', 'true', 'yes'):
+    write_behind = WriteBehindQueue(
+        insert_rows, rows_committed,
+        maxsize=int(os.environ.get('WRITE_BEHIND_QUEUE_SIZE', 10000)),
+        batch_rows=int(os.environ.get('WRITE_BEHIND_BATCH_ROWS', 500)),
+        flush_ms=float(os.environ.get('WRITE_BEHIND_FLUSH_MS', 50)),
+        durability=os.environ.get('WRITE_BEHIND_DURABILITY', 'sync'),
+    )
+    # Registered after the SOS dispatcher so it runs first at exit and its rows can still queue an SOS
+    atexit.register(write_behind.stop)
+
+def stop_on_sigterm(signum, frame):
+    """SIGTERM skips atexit, so drain the write-behind queue here before exiting"""
+    write_behind.stop()
+    sys.exit(0)
+
+def accept_row(table, columns, row):
+    """Insert one row now, or queue it in write-behind mode; returns the response"""
+    if write_behind is not None:
+        if not write_behind.submit(table, columns, row):
+            return jsonify({'error': 'Ingest queue is full, retry shortly'}), 503, {'Retry-After': '1'}
+        return jsonify({'status': 'queued'}), 202
+    # Also triggers auto SOS if water is detected, rate-limited per experiment
+    if not store_rows(table, columns, [row]):
+        return jsonify({'status': 'duplicate'})
+    return jsonify({'status': 'success'})
+
+def ingest_batch(table, columns, parse_row):
+    """Validate every row of a JSON batch and insert the valid ones in one transaction"""
+    started = time.perf_counter()
+    try:
+        with profiler.stage('parse_body'):
+            rows, results = parse_batch(request.get_json(silent=True), parse_row, BATCH_MAX_ROWS)
+    except BatchError as e:
+        return None, (jsonify({'error': str(e)}), e.status)
+    return rows, write_batch(table, columns, rows, results, len(results), started)
+
+def write_batch(table, columns, rows, results, received, started):
+    """Insert validated batch rows in one transaction and report per-row results and throughput"""
+    inserted = store_rows(table, columns, rows) if rows else []
+    if table == 'main_data':
+        mark_duplicates(rows, inserted, results)
+    response, status = batch_summary(len(inserted), results, received, time.perf_counter() - started)
+    return jsonify(response), status
+
+def bucket_response(columns, experiment_id, start, end, bucket, source, rows):
+    """Shape aggregated bucket rows as JSON"""
+    names = [column for column, _ in numeric_columns(columns)]
+    buckets = []
+    for row in rows:
+        entry = {'time': row[0].isoformat(), 'count': row[1]}
+        for i, name in enumerate(names):
+            low, high, avg, last = row[2 + i * 4:6 + i * 4]
+            entry[name] = {'min': low, 'max': high, 'avg': float(avg) if avg is not None else None, 'last': last}
+        buckets.append(entry)
+    return jsonify({
+        'experiment_id': experiment_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'bucket_seconds': bucket,
+        'source': source,
+        'columns': names,
+        'buckets': buckets,
+    })
+
+def range_endpoint(table, columns):
+    try:
+        experiment_id, start, end, bucket = parse_range_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    use_rollups = request.args.get('source', 'auto') != 'raw'
+    source, rows = query_buckets(table, columns, experiment_id, start, end, bucket, use_rollups)
+    return bucket_response(columns, experiment_id, start, end, bucket, source, rows)
 
 # API Endpoints
+def pool_connections():
+    pool = get_pool()
+    return {('in_use',): pool.in_use, ('max',): pool.maxconn}
+
+metrics.Gauge('glas_db_pool_connections', 'Database connections checked out, and the pool size',
+              pool_connections, ('state',))
+metrics.Gauge('glas_sos_queue_depth', 'Auto SOS checks waiting for the dispatcher', lambda: sos_dispatcher.qsize())
+metrics.Gauge('glas_write_behind_queue_depth', 'Rows waiting in the write-behind queue',
+              lambda: write_behind.stats()['depth'] if write_behind is not None else None)
+metrics.Gauge('glas_write_behind_queue_capacity', 'Size of the write-behind queue',
+              lambda: write_behind.maxsize if write_behind is not None else None)
+metrics.Gauge('glas_sse_subscribers', 'Open /api/stream connections', lambda: event_broadcaster.subscriber_count())
+
+@app.route('/metrics')
+@require_api_key
+def get_metrics():
+    """Prometheus text exposition of request, database, ingest and SOS metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/main', methods=['POST'])
 @require_api_key
 def add_main_data():
     """Add main sensor data"""
-    data = request.json
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute('''
-            INSERT INTO main_data (experiment_id, temperature_1, temperature_2, temperature_3, temperature_4, 
-                                  ph, battery_level, tds, turbidity, water_detected)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (data['experiment_id'], data['temperature_1'], data['temperature_2'], data['temperature_3'], 
-              data['temperature_4'], data['ph'], data['battery_level'], 
-              data['tds'], data['turbidity'], data['water_detected']))
-    conn.commit()
-    conn.close()
-    # Trigger auto SOS if water is detected, rate-limited per experiment
     try:
-        if data.get('water_detected'):
-            experiment_id = data.get('experiment_id', 'unknown')
-            maybe_send_auto_sos(experiment_id)
-    except Exception:
-        # Do not fail the data ingestion if SOS flow has issues
-        pass
+        with profiler.stage('parse_body'):
+            row = parse_main_row(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    return jsonify({'status': 'success'})
+    return accept_row('main_data', MAIN_INGEST_COLUMNS, row)
+
+@app.route('/api/main/batch', methods=['POST'])
+@require_api_key
+def add_main_data_batch():
+    """Add many main sensor rows in a single transaction"""
+    _, response = ingest_batch('main_data', MAIN_INGEST_COLUMNS, parse_main_row)
+    return response
+
+@app.route('/api/main', methods=['GET'])
+@require_api_key
+def get_main_data():
+    """Downsampled main sensor data for a time range"""
+    return range_endpoint('main_data', MAIN_COLUMNS)
 
 @app.route('/api/wake', methods=['POST'])
 @require_api_key
 def add_wake_data():
     """Add wake sensor data"""
-    data = request.json
-    
-    # Parse rotation data string into individual values
-    rotation_values = [float(x.strip()) for x in data['rotation_data'].split(',')]
-    
-    if len(rotation_values) != 16:
-        return jsonify({'error': 'Rotation data must contain exactly 16 comma-separated values'}), 400
-    
-    yaw, pitch, roll, ax, ay, az, gx, gy, gz, qx, qy, qz, qw, lax, lay, laz = rotation_values
-    
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute('''
-            INSERT INTO wake_data (experiment_id, yaw, pitch, roll, ax, ay, az, gx, gy, gz, 
-                                  qx, qy, qz, qw, lax, lay, laz, hydrophone_reading, water_level)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (data['experiment_id'], yaw, pitch, roll, ax, ay, az, gx, gy, gz, qx, qy, qz, qw, lax, lay, laz,
-              data['hydrophone_reading'], data['water_level']))
-    conn.commit()
-    conn.close()
-    return jsonify({'status': 'success'})
+    try:
+        with profiler.stage('parse_body'):
+            if request.mimetype == WAKE_BINARY_MIMETYPE:
+                rows, results = parse_wake_binary(request.get_data(), request.args.get('experiment_id'))
+                if len(results) != 1:
+                    raise ValueError('Use /api/wake/batch to send more than one binary record')
+                if not rows:
+                    raise ValueError(results[0]['error'])
+                row = rows[0]
+            else:
+                row = parse_wake_row(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return accept_row('wake_data', WAKE_COLUMNS, row)
+
+@app.route('/api/wake/batch', methods=['POST'])
+@require_api_key
+def add_wake_data_batch():
+    """Add many wake sensor rows in a single transaction"""
+    if request.mimetype == WAKE_BINARY_MIMETYPE:
+        started = time.perf_counter()
+        try:
+            with profiler.stage('parse_body'):
+                rows, results = parse_wake_binary(request.get_data(), request.args.get('experiment_id'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if len(results) > BATCH_MAX_ROWS:
+            return jsonify({'error': f'Batch exceeds the maximum of {BATCH_MAX_ROWS} rows'}), 413
+        return write_batch('wake_data', WAKE_COLUMNS, rows, results, len(results), started)
+
+    _, response = ingest_batch('wake_data', WAKE_COLUMNS, parse_wake_row)
+    return response
+
+@app.route('/api/wake', methods=['GET'])
+@require_api_key
+def get_wake_data():
+    """Downsampled wake sensor data for a time range"""
+    return range_endpoint('wake_data', WAKE_COLUMNS)
+
+@app.route('/api/wake/metrics', methods=['GET'])
+@require_api_key
+def get_wake_metrics():
+    """Derived wake IMU series (tilt, heave, ...) for a time range, bucketed like GET /api/wake"""
+    try:
+        experiment_id, start, end, bucket = parse_range_args(request.args)
+        names = [name.strip() for name in request.args.get('metrics', ','.join(wake_metrics.METRICS)).split(',')
+                 if name.strip()]
+        wake_metrics.check_names(names)
+        start, end = wake_metrics.snap_range(start, end, bucket)
+        with get_db_connection() as conn, metrics.DB_QUERY_SECONDS.time('query_wake_metrics'), \
+                profiler.stage('execute'):
+            timestamps, series = wake_metrics.compute(conn, experiment_id, start, end, names)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = wake_metrics.bucket_rows(timestamps, series, bucket)
+    return bucket_response(('experiment_id', *series), experiment_id, start, end, bucket, 'wake_metrics', rows)
+
+@app.route('/api/latest/<experiment_id>')
+@require_api_key
+def get_latest(experiment_id):
+    """Latest main and wake reading for an experiment, served from memory with ETag support"""
+    cached = latest_readings.get(experiment_id) or latest_readings.load(experiment_id)
+    snapshot, etag = cached
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({'experiment_id': experiment_id, **snapshot})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/stream/<experiment_id>')
+@require_api_key
+def stream_readings(experiment_id):
+    """Server-Sent Events stream of every main/wake row ingested for an experiment"""
+    subscription = event_broadcaster.subscribe(experiment_id)
+
+    def generate():
+        try:
+            yield b'retry: 3000\n\n'
+            while not background_stop.is_set():
+                frames, dropped = subscription.wait(SSE_HEARTBEAT_SECONDS)
+                if dropped:
+                    yield f'event: dropped\ndata: {json.dumps({"dropped": dropped})}\n\n'.encode()
+                # Comment lines keep proxies from closing an idle stream
+                yield b''.join(frames) if frames else b': keepalive\n\n'
+        finally:
+            event_broadcaster.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+EXPORT_TABLES = ('main_data', 'wake_data')
+
+@app.route('/api/export/<table>')
+@require_api_key
+def export_data(table):
+    """Stream every row of one experiment as CSV, Parquet or an Arrow IPC stream"""
+    if table not in EXPORT_TABLES:
+        return jsonify({'error': f"Unknown table '{table}'; use one of {', '.join(EXPORT_TABLES)}"}), 404
+    experiment_id = request.args.get('experiment_id')
+    if not experiment_id:
+        return jsonify({'error': 'experiment_id query parameter is required'}), 400
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(export.FORMATS)}"}), 400
+    try:
+        start = parse_time(request.args.get('start'), 'start')
+        end = parse_time(request.args.get('end'), 'end')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        with get_db_connection() as conn:
+            yield from export.stream(conn, table, experiment_id, fmt, start, end)
+
+    mimetype, extension = export.FORMATS[fmt]
+    filename = f"{table}_{re.sub(r'[^A-Za-z0-9_.-]', '_', experiment_id)}.{extension}"
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/api/dead', methods=['POST'])
 @require_api_key
@@ -177,6 +404,7 @@ def send_sos():
     message_text = body.get('message', '🚨 I am drowning. Please help. 🚨')
 
     ok, err = send_slack_sos_message(message_text)
+    metrics.SOS_SENT.inc('manual', 'ok' if ok else 'failed')
     if ok:
         try:
             log_sos_event(experiment_id, 'manual', message_text)
@@ -186,17 +414,52 @@ def send_sos():
     else:
         return jsonify({'error': f'Failed to send SOS to Slack: {err}'}), 500
 
+@app.route('/api/dead', methods=['GET'])
+@require_api_key
+def get_dead_letters():
+    """Rows the write-behind queue could not insert, newest first"""
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("""
+                SELECT id, created_at, target_table, row_data, error
+                FROM dead_letters
+                ORDER BY id DESC
+                LIMIT %s
+            """, (limit,))
+            rows = cur.fetchall()
+    return jsonify([dict(row, created_at=row['created_at'].isoformat()) for row in rows])
+
 # Health check
 @app.route('/health')
 def health():
-    return jsonify({'status': 'healthy'})
+    status = {'status': 'healthy'}
+    if write_behind is not None:
+        status['write_behind'] = write_behind.stats()
+    return jsonify(status)
 
 if __name__ == '__main__':
     # Initialize database
-    init_db()
+    try:
+        init_db()
+    except partitions.NotPartitionedError as e:
+        app.logger.error(str(e))
+        sys.exit(1)
+    warmed = warm_sos_rate_limit()
+    start_background_job('rollups', ROLLUP_INTERVAL, refresh_rollups)
+    start_background_job('partitions', PARTITION_MAINTENANCE_INTERVAL, maintain_partitions)
+    # Rows ingested by asgi.py reach the latest cache and SSE subscribers through NOTIFY
+    start_rows_listener(rows_notified, latest_readings.clear, background_stop)
     
     print("🌊 GLAS Store Server Starting...")
     print("📊 Database initialized")
+    print(f"🚨 SOS rate limit cache warmed with {warmed} experiment(s)")
+    if write_behind is not None:
+        signal.signal(signal.SIGTERM, stop_on_sigterm)
+        print(f"✍️ Write-behind ingest on ({write_behind.durability} durability)")
     print(f"🚀 Server running on http://localhost:{os.environ.get('PORT', 5000)}")
     
     app.run(debug=True, host='0.0.0.0', port=os.environ.get('PORT', 5000))
@@ -0,0 +1,186 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms keep one dict per thread, so recording a value only
+touches the calling thread's dict and never takes a lock. A scrape sums the
+per-thread dicts; dicts of threads that have exited are folded into a
+retired total so short-lived request threads do not accumulate. Gauges are
+read from callbacks at scrape time.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a fast in-memory reply up to a slow Slack webhook
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+class _PerThread:
+    """One ``{labels: value}`` dict per thread, merged with ``combine`` on read"""
+
+    def __init__(self, combine):
+        self._combine = combine
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards[threading.current_thread()] = values
+            return values
+
+    def _fold(self, values):
+        for key, value in values.items():
+            self._retired[key] = self._combine(self._retired.get(key), value)
+
+    def snapshot(self):
+        with self._lock:
+            for thread in [thread for thread in self._shards if not thread.is_alive()]:
+                self._fold(self._shards.pop(thread))
+            total = dict(self._retired)
+            shards = list(self._shards.values())
+        for values in shards:
+            # dict.copy is atomic under the GIL, so the owning thread can keep writing
+            for key, value in values.copy().items():
+                total[key] = self._combine(total.get(key), value)
+        return total
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = _PerThread(lambda total, value: (total or 0) + value)
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        shard = self._values.shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.snapshot().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+def _add_histogram(total, value):
+    if total is None:
+        return list(value)
+    return [a + b for a, b in zip(total, value)]
+
+
+class Histogram:
+    """Cumulative-bucket histogram; each series is ``[count per bucket..., +Inf count, sum]``"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = _PerThread(_add_histogram)
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        shard = self._values.shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._values.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{plain} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{plain} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value read from ``read()`` at scrape time: a number, or ``{label values tuple: number}``"""
+
+    def __init__(self, name, documentation, read, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.read = read
+        REGISTRY.append(self)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        value = self.read()
+        if value is None:
+            return lines
+        series = value if isinstance(value, dict) else {(): value}
+        for labels, number in sorted(series.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(number)}')
+        return lines
+
+
+def render():
+    """The current value of every registered metric, in exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.collect())
+        except Exception as e:
+            lines.append(f'# {metric.name} unavailable: {e}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter('glas_http_requests_total', 'HTTP requests by route, method and status',
+                   ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram('glas_http_request_duration_seconds', 'Time spent in the request handler',
+                            ('route', 'method'))
+DB_CONNECT_SECONDS = Histogram('glas_db_connect_seconds', 'Time to check out a pooled database connection')
+DB_QUERY_SECONDS = Histogram('glas_db_query_seconds', 'Database statement time, including commit where noted',
+                             ('operation',))
+ROWS_INSERTED = Counter('glas_rows_inserted_total', 'Rows committed per table', ('table',))
+DUPLICATE_ROWS = Counter('glas_duplicate_rows_total', 'Rows skipped because their dedupe key was already stored',
+                         ('table',))
+SOS_SENT = Counter('glas_sos_sent_total', 'SOS webhook sends by source and result', ('source', 'result'))
+SOS_RATE_LIMITED = Counter('glas_sos_rate_limited_total', 'Auto SOS suppressed by the 24-hour rate limit',
+                           ('checked',))
+WRITE_BEHIND_FAILED_ROWS = Counter('glas_write_behind_failed_rows_total',
+                                   'Write-behind rows not inserted, by table and outcome (dead_letter or dropped)',
+                                   ('table', 'outcome'))
+SLACK_SECONDS = Histogram('glas_slack_webhook_seconds', 'Slack SOS webhook round-trip time')
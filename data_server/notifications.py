@@ -0,0 +1,69 @@
+"""LISTEN for rows committed by the ASGI ingest app (asgi.py) on ingest.ROWS_CHANNEL"""
+import os
+import select
+import threading
+
+import psycopg2
+from psycopg2 import extensions
+
+from ingest import ROWS_CHANNEL, parse_rows_notification
+
+# Seconds between reconnect attempts after the listening connection is lost
+LISTEN_RETRY_SECONDS = 5
+
+
+class RowsListener:
+    """Daemon thread holding a dedicated connection that LISTENs on ROWS_CHANNEL.
+
+    ``on_rows(table, experiment_id)`` runs for every notification. Notifications
+    sent while the connection was down are lost, so ``on_reconnect()`` runs each
+    time listening (re)starts to let callers drop whatever may have gone stale.
+    """
+
+    def __init__(self, dsn, on_rows, on_reconnect, stop):
+        self.dsn = dsn
+        self.on_rows = on_rows
+        self.on_reconnect = on_reconnect
+        self.stop = stop
+        self.received = 0
+
+    def start(self):
+        thread = threading.Thread(target=self._run, name='rows-listener', daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self):
+        while not self.stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"⚠️ Row notification listener failed, retrying in {LISTEN_RETRY_SECONDS}s: {e}")
+                self.stop.wait(LISTEN_RETRY_SECONDS)
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {ROWS_CHANNEL}')
+            self.on_reconnect()
+            while not self.stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.received += 1
+                    try:
+                        self.on_rows(*parse_rows_notification(notify.payload))
+                    except Exception as e:
+                        print(f"⚠️ Row notification {notify.payload!r} not handled: {e}")
+        finally:
+            conn.close()
+
+
+def start_rows_listener(on_rows, on_reconnect, stop):
+    """Start a RowsListener on DATABASE_URL and return it"""
+    listener = RowsListener(os.environ.get('DATABASE_URL'), on_rows, on_reconnect, stop)
+    listener.start()
+    return listener
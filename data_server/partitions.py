@@ -0,0 +1,201 @@
+"""Monthly range partitions on ``timestamp`` for main_data and wake_data.
+
+Partitions are named ``<table>_pYYYYMM`` and cover [first of month, first of
+next month). There is no default partition, so a month must exist before rows
+for it are inserted: the server keeps PARTITION_MONTHS_AHEAD future months
+created, and bulk loaders call ``ensure_range`` for historical data.
+
+    python partitions.py maintain   # create upcoming months, apply retention
+    python partitions.py migrate    # convert tables created before partitioning
+"""
+import os
+import re
+import sys
+from datetime import date
+
+PARTITIONED_TABLES = ('main_data', 'wake_data')
+PARTITION_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+# Unpartitioned side tables whose rows are pruned along with the table's partitions
+KEY_TABLES = {'main_data': 'main_data_keys'}
+
+
+class NotPartitionedError(RuntimeError):
+    """A table predates partitioning; CREATE TABLE IF NOT EXISTS in schema.sql left it as it was"""
+
+    def __init__(self, table):
+        super().__init__(f"{table} is not partitioned, so partition maintenance and retention cannot run. "
+                         f"Back up the database, run 'python partitions.py migrate' once, then start the server again.")
+        self.table = table
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month.year:04d}{month.month:02d}'
+
+
+def list_partitions(cur, table):
+    """Return {month: partition_name} for the partitions attached to ``table``"""
+    cur.execute('''
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+    ''', (table,))
+    partitions = {}
+    for (name,) in cur.fetchall():
+        match = PARTITION_NAME.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_range(conn, table, start, end):
+    """Create any missing monthly partitions covering ``start`` through ``end``; returns the names created"""
+    created = []
+    with conn.cursor() as cur:
+        existing = list_partitions(cur, table)
+        month = month_start(start)
+        last = month_start(end)
+        while month <= last:
+            if month not in existing:
+                name = partition_name(table, month)
+                cur.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+                    FOR VALUES FROM (%s) TO (%s)
+                ''', (month, add_months(month, 1)))
+                created.append(name)
+            month = add_months(month, 1)
+    conn.commit()
+    return created
+
+
+def apply_retention(conn, table, keep_months, mode='drop', today=None):
+    """Drop or archive partitions that end before the retention window.
+
+    ``keep_months`` counts the current month, so 12 keeps this month and the
+    previous eleven. In ``archive`` mode old partitions are detached and moved
+    into the ``archive`` schema instead of being dropped. Either way the
+    table's KEY_TABLES entry loses its keys from before the window.
+    """
+    if keep_months <= 0:
+        return []
+    cutoff = add_months(month_start(today or date.today()), -(keep_months - 1))
+    removed = []
+    with conn.cursor() as cur:
+        for month, name in sorted(list_partitions(cur, table).items()):
+            if month >= cutoff:
+                continue
+            if mode == 'archive':
+                cur.execute('CREATE SCHEMA IF NOT EXISTS archive')
+                cur.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+                cur.execute(f'ALTER TABLE {name} SET SCHEMA archive')
+            else:
+                cur.execute(f'DROP TABLE {name}')
+            removed.append(name)
+        if table in KEY_TABLES:
+            cur.execute(f'DELETE FROM {KEY_TABLES[table]} WHERE timestamp < %s', (cutoff,))
+    conn.commit()
+    return removed
+
+
+def maintain(conn, months_ahead=None, keep_months=None, mode=None):
+    """Create partitions through ``months_ahead`` future months and apply the retention policy.
+
+    Raises NotPartitionedError if a table has not been migrated, so the server
+    refuses to start instead of silently skipping retention.
+    """
+    months_ahead = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3)) if months_ahead is None else months_ahead
+    keep_months = int(os.environ.get('RETENTION_MONTHS', 0)) if keep_months is None else keep_months
+    mode = os.environ.get('RETENTION_MODE', 'drop') if mode is None else mode
+
+    with conn.cursor() as cur:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(cur, table):
+                raise NotPartitionedError(table)
+
+    today = date.today()
+    result = {}
+    for table in PARTITIONED_TABLES:
+        created = ensure_range(conn, table, today, add_months(month_start(today), months_ahead))
+        removed = apply_retention(conn, table, keep_months, mode, today)
+        result[table] = {'created': created, 'removed': removed}
+    return result
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relkind IN ('r', 'p')", (table,))
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def migrate(conn, table):
+    """Convert a plain ``table`` from an older schema into a partitioned one, keeping ids and data.
+
+    Runs in one transaction; indexes are recreated by running schema.sql
+    (init_db) afterwards.
+    """
+    with conn.cursor() as cur:
+        if is_partitioned(cur, table):
+            return False
+        legacy = f'{table}_unpartitioned'
+        cur.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        cur.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        cur.execute(f'UPDATE {legacy} SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL')
+        cur.execute(f'''
+            CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (timestamp)
+        ''')
+        cur.execute(f'SELECT MIN(timestamp), MAX(timestamp) FROM {legacy}')
+        start, end = cur.fetchone()
+        today = date.today()
+        month = month_start(min(start.date(), today) if start else today)
+        last = max(end.date(), today) if end else today
+        while month <= last:
+            cur.execute(f'''
+                CREATE TABLE {partition_name(table, month)} PARTITION OF {table}
+                FOR VALUES FROM (%s) TO (%s)
+            ''', (month, add_months(month, 1)))
+            month = add_months(month, 1)
+        cur.execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+        cur.execute(f"SELECT pg_get_serial_sequence('{legacy}', 'id')")
+        sequence = cur.fetchone()[0]
+        cur.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        cur.execute(f'DROP TABLE {legacy}')
+        cur.execute(f'ALTER TABLE {table} ALTER COLUMN timestamp SET NOT NULL')
+        cur.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, timestamp)')
+    conn.commit()
+    return True
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'maintain'
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+    try:
+        if command == 'migrate':
+            for table in PARTITIONED_TABLES:
+                changed = migrate(conn, table)
+                print(f"{'✓ Partitioned' if changed else '- Already partitioned:'} {table}")
+        elif command == 'maintain':
+            try:
+                results = maintain(conn)
+            except NotPartitionedError as e:
+                sys.exit(str(e))
+            for table, result in results.items():
+                print(f"{table}: created {result['created'] or 'nothing'}, removed {result['removed'] or 'nothing'}")
+        else:
+            sys.exit(f'Unknown command {command!r}; use maintain or migrate')
+    finally:
+        conn.close()
@@ -0,0 +1,122 @@
+"""Opt-in per-stage profiler for the ingest hot path.
+
+A request is profiled when PROFILE_SAMPLE_RATE (0-1, default 0) samples it,
+or when it carries ``X-Glas-Profile: <ADMIN_API_KEY>``. Code marks stages with
+``stage(name)``; outside a profiled request that is a single attribute
+lookup. Each stage's self time (its duration minus nested stages) is added
+up in memory per stack, and ``folded`` renders the totals as folded stacks
+(``root;stage;substage microseconds``), which flamegraph.pl, speedscope and
+inferno read directly.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY')
+PROFILE_HEADER = 'X-Glas-Profile'
+
+_local = threading.local()
+_lock = threading.Lock()
+# stack (tuple of frame names) -> [calls, self seconds, total seconds]
+_stacks = {}
+
+
+def should_profile(header_value=None):
+    """True if this request was asked for with the admin key or falls in the sample"""
+    if header_value and ADMIN_API_KEY and header_value == ADMIN_API_KEY:
+        return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def active():
+    return getattr(_local, 'frames', None) is not None
+
+
+def start(root):
+    """Begin profiling the current thread under the frame ``root``"""
+    if not active():
+        _local.frames = [[root, time.perf_counter(), 0.0]]
+
+
+def _pop():
+    frames = _local.frames
+    name, started, children = frames.pop()
+    elapsed = time.perf_counter() - started
+    path = tuple(frame[0] for frame in frames) + (name,)
+    with _lock:
+        entry = _stacks.get(path)
+        if entry is None:
+            entry = _stacks[path] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed - children
+        entry[2] += elapsed
+    if frames:
+        frames[-1][2] += elapsed
+
+
+def finish():
+    """Close any open stages and the root frame of the current thread"""
+    if not active():
+        return
+    while _local.frames:
+        _pop()
+    _local.frames = None
+
+
+@contextmanager
+def profile(root, enabled=True):
+    """Profile the block as its own root, e.g. work done on a background thread"""
+    if not enabled or active():
+        yield
+        return
+    start(root)
+    try:
+        yield
+    finally:
+        finish()
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current profiled request; a no-op otherwise"""
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        yield
+        return
+    depth = len(frames)
+    frames.append([name, time.perf_counter(), 0.0])
+    try:
+        yield
+    finally:
+        # A stage left open by an exception inside a nested stage is closed here too
+        while _local.frames is not None and len(_local.frames) > depth:
+            _pop()
+
+
+def folded():
+    """Self time per stack in microseconds, one ``a;b;c value`` line each"""
+    with _lock:
+        items = sorted(_stacks.items())
+    return ''.join(f"{';'.join(path)} {round(entry[1] * 1e6)}\n" for path, entry in items)
+
+
+def summary():
+    """Calls, total and self time per stack, slowest total first"""
+    with _lock:
+        items = list(_stacks.items())
+    items.sort(key=lambda item: item[1][2], reverse=True)
+    return [{
+        'stack': ';'.join(path),
+        'calls': calls,
+        'total_ms': round(total * 1000, 3),
+        'self_ms': round(self_time * 1000, 3),
+        'mean_ms': round(total / calls * 1000, 3),
+    } for path, (calls, self_time, total) in items]
+
+
+def reset():
+    with _lock:
+        _stacks.clear()
@@ -0,0 +1,116 @@
+"""Time-range reads for GET /api/main and GET /api/wake: parameter parsing and bucketed SQL"""
+import math
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import metrics
+import profiler
+import rollups
+from db import get_db_connection
+from ingest import MAIN_COLUMNS, WAKE_COLUMNS
+
+QUERY_MAX_POINTS = int(os.environ.get('QUERY_MAX_POINTS', 5000))
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_bucket(value):
+    """Parse a bucket width like '30', '30s', '5m', '1h' or '1d' into whole seconds"""
+    match = re.fullmatch(r'\s*(\d+)\s*([smhd]?)\s*', value or '')
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("bucket must be a positive number of seconds or use an s/m/h/d suffix, e.g. '5m'")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2) or 's']
+
+
+def parse_time(value, field):
+    """Parse an ISO 8601 query parameter; aware times are converted to naive UTC like the stored timestamps"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"{field} must be an ISO 8601 timestamp")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def numeric_columns(columns):
+    """Map data columns (minus experiment_id) to SQL expressions that can be aggregated"""
+    return [(column, f'{column}::int' if column == 'water_detected' else column) for column in columns[1:]]
+
+
+ROLLUP_SOURCES = {
+    'main_data': numeric_columns(MAIN_COLUMNS),
+    'wake_data': numeric_columns(WAKE_COLUMNS),
+}
+
+
+def auto_bucket(span):
+    """Bucket width for a ``span``-second range read without an explicit bucket.
+
+    The narrowest width that stays within QUERY_MAX_POINTS buckets is rounded
+    up to a multiple of the coarsest rollup level that still leaves at least
+    QUERY_MAX_POINTS / 2 buckets, so the read can be served from that rollup
+    (rollups.pick_level needs an exact multiple).
+    """
+    bucket = max(1, math.ceil(span / QUERY_MAX_POINTS))
+    for _, seconds in reversed(rollups.LEVELS):
+        rounded = math.ceil(bucket / seconds) * seconds
+        if span / rounded >= QUERY_MAX_POINTS / 2:
+            return rounded
+    return bucket
+
+
+def parse_range_args(args):
+    """Read experiment_id/start/end/bucket query parameters shared by the read endpoints"""
+    experiment_id = args.get('experiment_id')
+    if not experiment_id:
+        raise ValueError('experiment_id query parameter is required')
+    end = parse_time(args.get('end'), 'end') or datetime.now(timezone.utc).replace(tzinfo=None)
+    start = parse_time(args.get('start'), 'start') or end - timedelta(days=1)
+    if start >= end:
+        raise ValueError('start must be before end')
+
+    span = (end - start).total_seconds()
+    if args.get('bucket'):
+        bucket = parse_bucket(args['bucket'])
+    else:
+        bucket = auto_bucket(span)
+    if span / bucket > QUERY_MAX_POINTS:
+        raise ValueError(f'bucket is too small for this range; use at least {math.ceil(span / QUERY_MAX_POINTS)} seconds')
+    return experiment_id, start, end, bucket
+
+
+def query_buckets(table, columns, experiment_id, start, end, bucket, use_rollups=True):
+    """Aggregate a time range into fixed-width buckets (min/max/avg/last per column) in SQL.
+
+    Reads from the coarsest rollup level that divides the bucket width when
+    there is one. Returns ``(source_table, rows)``.
+    """
+    level = rollups.pick_level(bucket) if use_rollups else None
+    if level:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur, metrics.DB_QUERY_SECONDS.time('query_rollup'), profiler.stage('execute'):
+                rows = rollups.query_buckets(cur, table, numeric_columns(columns), level,
+                                             experiment_id, start, end, bucket)
+        return rollups.rollup_table(table, level[0]), rows
+
+    aggregates = []
+    for _, expr in numeric_columns(columns):
+        aggregates += [f'MIN({expr})', f'MAX({expr})', f'AVG({expr})',
+                       f'(ARRAY_AGG({expr} ORDER BY timestamp DESC))[1]']
+    sql = f"""
+        SELECT to_timestamp(floor(EXTRACT(EPOCH FROM timestamp) / %(bucket)s) * %(bucket)s) AT TIME ZONE 'UTC' AS bucket,
+               COUNT(*), {', '.join(aggregates)}
+        FROM {table}
+        WHERE experiment_id = %(experiment_id)s
+          AND timestamp >= %(start)s
+          AND timestamp < %(end)s
+        GROUP BY 1
+        ORDER BY 1
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, metrics.DB_QUERY_SECONDS.time('query_raw'), profiler.stage('execute'):
+            cur.execute(sql, {'bucket': bucket, 'experiment_id': experiment_id, 'start': start, 'end': end})
+            return table, cur.fetchall()
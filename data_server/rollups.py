@@ -0,0 +1,180 @@
+"""Incrementally maintained 1-minute, 1-hour and 1-day rollups of the sensor tables.
+
+Every rollup row holds, per numeric column, the min, max, sum, non-null count
+and last value for one (experiment_id, bucket). Those combine associatively,
+so new raw rows are folded into existing buckets with an upsert, and any
+coarser bucket width that is a multiple of a level can be answered from it.
+
+The rollup tables are generated from query.ROLLUP_SOURCES (built from the
+column lists in ingest.py) rather than written out in schema.sql, since each
+sensor column becomes five.
+"""
+
+# (suffix, bucket width in seconds), finest first
+LEVELS = (('1m', 60), ('1h', 3600), ('1d', 86400))
+
+# Upper bound on raw rows folded in per refresh, so a large backlog is caught
+# up over several runs instead of in one long transaction
+REFRESH_BATCH_ROWS = 500000
+
+
+def _bucket_expr(column, seconds):
+    return f"to_timestamp(floor(EXTRACT(EPOCH FROM {column}) / {seconds}) * {seconds}) AT TIME ZONE 'UTC'"
+
+
+def rollup_table(table, suffix):
+    return f'{table}_{suffix}'
+
+
+def create_tables(conn, sources):
+    """Create the rollup and watermark tables if they do not exist.
+
+    ``sources`` maps a raw table name to its ``(column, sql_expression)`` pairs.
+    """
+    with conn.cursor() as cur:
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                source_table TEXT PRIMARY KEY,
+                last_id BIGINT NOT NULL DEFAULT 0,
+                pending_id BIGINT,
+                pending_xmax BIGINT,
+                refreshed_at TIMESTAMP
+            )
+        ''')
+        for table, columns in sources.items():
+            per_column = []
+            for column, _ in columns:
+                per_column += [f'{column}_min REAL', f'{column}_max REAL', f'{column}_sum DOUBLE PRECISION',
+                               f'{column}_count BIGINT', f'{column}_last REAL']
+            for suffix, _ in LEVELS:
+                cur.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {rollup_table(table, suffix)} (
+                        experiment_id TEXT NOT NULL,
+                        bucket TIMESTAMP NOT NULL,
+                        row_count BIGINT NOT NULL,
+                        last_at TIMESTAMP NOT NULL,
+                        {', '.join(per_column)},
+                        PRIMARY KEY (experiment_id, bucket)
+                    )
+                ''')
+            cur.execute('INSERT INTO rollup_watermarks (source_table) VALUES (%s) ON CONFLICT DO NOTHING', (table,))
+
+
+def _fold_delta(cur, table, columns, suffix, seconds):
+    """Merge the 1-minute delta in rollup_delta into one rollup level"""
+    names = [column for column, _ in columns]
+    selects = []
+    updates = []
+    for name in names:
+        selects += [f'MIN({name}_min)', f'MAX({name}_max)', f'SUM({name}_sum)', f'SUM({name}_count)',
+                    f'(ARRAY_AGG({name}_last ORDER BY last_at DESC))[1]']
+        updates += [
+            f'{name}_min = LEAST(t.{name}_min, EXCLUDED.{name}_min)',
+            f'{name}_max = GREATEST(t.{name}_max, EXCLUDED.{name}_max)',
+            f'{name}_sum = COALESCE(t.{name}_sum, 0) + COALESCE(EXCLUDED.{name}_sum, 0)',
+            f'{name}_count = t.{name}_count + EXCLUDED.{name}_count',
+            f'{name}_last = CASE WHEN EXCLUDED.last_at >= t.last_at THEN EXCLUDED.{name}_last ELSE t.{name}_last END',
+        ]
+    targets = []
+    for name in names:
+        targets += [f'{name}_min', f'{name}_max', f'{name}_sum', f'{name}_count', f'{name}_last']
+    target = rollup_table(table, suffix)
+    cur.execute(f'''
+        INSERT INTO {target} AS t (experiment_id, bucket, row_count, last_at, {', '.join(targets)})
+        SELECT experiment_id, {_bucket_expr('bucket', seconds)}, SUM(row_count), MAX(last_at), {', '.join(selects)}
+        FROM rollup_delta
+        GROUP BY 1, 2
+        ON CONFLICT (experiment_id, bucket) DO UPDATE SET
+            row_count = t.row_count + EXCLUDED.row_count,
+            {', '.join(updates)},
+            last_at = GREATEST(t.last_at, EXCLUDED.last_at)
+    ''')
+
+
+def refresh(conn, table, columns):
+    """Fold raw rows added since the watermark into every rollup level; returns rows processed.
+
+    Row ids come from a sequence, so a transaction that is still open can
+    commit an id below one that is already visible. Each refresh therefore
+    only records the current max id together with the snapshot's xmax, and
+    folds rows up to it on a later run once every transaction that was open
+    at that point has finished.
+    """
+    with conn.cursor() as cur:
+        cur.execute('''
+            SELECT last_id, pending_id, pending_xmax, txid_snapshot_xmin(txid_current_snapshot())
+            FROM rollup_watermarks
+            WHERE source_table = %s
+            FOR UPDATE
+        ''', (table,))
+        last_id, pending_id, pending_xmax, oldest_running = cur.fetchone()
+
+        processed = 0
+        if pending_id is not None and pending_id > last_id and oldest_running >= pending_xmax:
+            upper = min(pending_id, last_id + REFRESH_BATCH_ROWS)
+            aggregates = []
+            for name, expr in columns:
+                aggregates += [f'MIN({expr}) AS {name}_min', f'MAX({expr}) AS {name}_max',
+                               f'SUM({expr}) AS {name}_sum', f'COUNT({expr}) AS {name}_count',
+                               f'(ARRAY_AGG({expr} ORDER BY timestamp DESC))[1] AS {name}_last']
+            cur.execute(f'''
+                CREATE TEMP TABLE rollup_delta ON COMMIT DROP AS
+                SELECT experiment_id, {_bucket_expr('timestamp', LEVELS[0][1])} AS bucket,
+                       COUNT(*) AS row_count, MAX(timestamp) AS last_at,
+                       {', '.join(aggregates)}
+                FROM {table}
+                WHERE id > %s AND id <= %s
+                  AND experiment_id IS NOT NULL
+                  AND timestamp IS NOT NULL
+                GROUP BY 1, 2
+            ''', (last_id, upper))
+            for suffix, seconds in LEVELS:
+                _fold_delta(cur, table, columns, suffix, seconds)
+            cur.execute('SELECT COALESCE(SUM(row_count), 0) FROM rollup_delta')
+            processed = int(cur.fetchone()[0])
+            cur.execute('DROP TABLE rollup_delta')
+            last_id = upper
+
+        if pending_id is None or pending_id <= last_id:
+            cur.execute(f'SELECT MAX(id), txid_snapshot_xmax(txid_current_snapshot()) FROM {table}')
+            pending_id, pending_xmax = cur.fetchone()
+
+        cur.execute('''
+            UPDATE rollup_watermarks
+            SET last_id = %s, pending_id = %s, pending_xmax = %s, refreshed_at = NOW()
+            WHERE source_table = %s
+        ''', (last_id, pending_id, pending_xmax, table))
+    conn.commit()
+    return processed
+
+
+def pick_level(bucket):
+    """Return the coarsest (suffix, seconds) level whose width divides ``bucket``, or None for raw"""
+    for suffix, seconds in reversed(LEVELS):
+        if bucket % seconds == 0:
+            return suffix, seconds
+    return None
+
+
+def query_buckets(cur, table, columns, level, experiment_id, start, end, bucket):
+    """Aggregate a rollup level into ``bucket``-second buckets, shaped like the raw query.
+
+    Rollup buckets that overlap ``start`` are included whole, so the first
+    bucket can contain up to one level's width of rows before ``start``.
+    """
+    suffix, seconds = level
+    aggregates = []
+    for name, _ in columns:
+        aggregates += [f'MIN({name}_min)', f'MAX({name}_max)',
+                       f'SUM({name}_sum) / NULLIF(SUM({name}_count), 0)',
+                       f'(ARRAY_AGG({name}_last ORDER BY last_at DESC))[1]']
+    cur.execute(f'''
+        SELECT {_bucket_expr('bucket', '%(bucket)s')}, SUM(row_count)::bigint, {', '.join(aggregates)}
+        FROM {rollup_table(table, suffix)}
+        WHERE experiment_id = %(experiment_id)s
+          AND bucket >= {_bucket_expr('%(start)s::timestamp', seconds)}
+          AND bucket < %(end)s
+        GROUP BY 1
+        ORDER BY 1
+    ''', {'bucket': bucket, 'experiment_id': experiment_id, 'start': start, 'end': end})
+    return cur.fetchall()
@@ -1,7 +1,7 @@
--- Main data table
+-- Main data table, partitioned by month (see partitions.py)
 CREATE TABLE IF NOT EXISTS main_data (
-    id SERIAL PRIMARY KEY,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    id SERIAL,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     experiment_id TEXT,
     temperature_1 REAL,
     temperature_2 REAL,
@@ -11,13 +11,14 @@ CREATE TABLE IF NOT EXISTS main_data (
     battery_level REAL,
     tds REAL,
     turbidity REAL,
-    water_detected BOOLEAN
-);
+    water_detected BOOLEAN,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
 
--- Wake data table  
+-- Wake data table, partitioned by month (see partitions.py)
 CREATE TABLE IF NOT EXISTS wake_data (
-    id SERIAL PRIMARY KEY,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    id SERIAL,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     experiment_id TEXT,
     -- Rotation data separated into individual columns
     yaw REAL,
@@ -37,13 +38,60 @@ CREATE TABLE IF NOT EXISTS wake_data (
     lay REAL,
     laz REAL,
     hydrophone_reading REAL,
-    water_level REAL
+    water_level REAL,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Per-packet dedupe key from the gateway (LoRa payload fields 0-2), added
+-- separately so databases created before it pick it up
+ALTER TABLE main_data ADD COLUMN IF NOT EXISTS probe_id TEXT;
+ALTER TABLE main_data ADD COLUMN IF NOT EXISTS iterations INTEGER;
+ALTER TABLE main_data ADD COLUMN IF NOT EXISTS device_timestamp TEXT;
+
+-- Unique index on the dedupe key. main_data is partitioned on timestamp, so a
+-- unique index there would have to include timestamp; keys are claimed here
+-- with ON CONFLICT DO NOTHING in the same statement that inserts the row.
+CREATE TABLE IF NOT EXISTS main_data_keys (
+    probe_id TEXT NOT NULL,
+    iterations INTEGER NOT NULL,
+    device_timestamp TEXT NOT NULL,
+    PRIMARY KEY (probe_id, iterations, device_timestamp)
+);
+
+-- When each key was stored, so retention can prune keys along with the
+-- main_data partitions they belong to (partitions.apply_retention)
+ALTER TABLE main_data_keys ADD COLUMN IF NOT EXISTS timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_main_keys_timestamp ON main_data_keys(timestamp);
+
+-- Progress of SD card log imports (sd_import.py): the byte offset each log
+-- has been loaded up to, advanced in the same transaction as its rows
+CREATE TABLE IF NOT EXISTS sd_imports (
+    source TEXT PRIMARY KEY,
+    path TEXT,
+    target_table TEXT NOT NULL,
+    experiment_id TEXT NOT NULL,
+    byte_offset BIGINT NOT NULL,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rows the write-behind queue could not insert even on their own (GET /api/dead)
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id SERIAL PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    target_table TEXT NOT NULL,
+    row_data JSONB NOT NULL,
+    error TEXT
 );
 
 -- Create indexes for timestamp queries
 CREATE INDEX IF NOT EXISTS idx_main_timestamp ON main_data(timestamp);
 CREATE INDEX IF NOT EXISTS idx_wake_timestamp ON wake_data(timestamp); 
 
+-- Per-experiment time range queries (GET /api/main, GET /api/wake)
+CREATE INDEX IF NOT EXISTS idx_main_experiment_timestamp ON main_data(experiment_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_wake_experiment_timestamp ON wake_data(experiment_id, timestamp);
+
 -- SOS events table for rate limiting and audit
 CREATE TABLE IF NOT EXISTS sos_events (
     id SERIAL PRIMARY KEY,
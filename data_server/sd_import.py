@@ -0,0 +1,368 @@
+"""Backfill main_data/wake_data from a probe's SD card log (/sd/data.txt).
+
+Both probes append one line per reading, ``f"{cur_time}: {data}\\n"``: the RTC
+tuple ``(year, month, day, weekday, hour, minute, second, subseconds)`` and
+the repr of a dict keyed by SensorID, e.g.
+
+    (2025, 8, 7, 3, 11, 46, 36, 0): {'BATTERY_VOLTAGE': 84.91, 'TEMPERATURE': (24.38, -1.0, -1.0, -1.0), ...}
+
+Older main probe firmware logged TEMPERATURE as a '24.38,-1.0,-1.0,-1.0' string; both are read.
+
+Lines are parsed with a regex over the raw bytes (never ``eval``), in
+newline-aligned chunks spread over a process pool, and each parsed chunk is
+loaded with COPY in its own transaction together with the byte offset it
+ends at. An interrupted import therefore resumes exactly where the last
+committed chunk stopped, and importing a later copy of the same card only
+loads the lines appended since. A trailing line without a newline (a write
+cut off by power loss, or a file still being copied) is left for next time.
+
+Main rows carry the same (probe_id, iterations, device_timestamp) key as the
+LoRa gateway sends, so readings that also arrived over the radio are skipped
+through main_data_keys. Wake rows have no key and rely on the offsets alone.
+
+    python sd_import.py /media/sd/data.txt --experiment-id lake-2025-08
+    python sd_import.py wake.txt --experiment-id lake-2025-08 --table wake_data --workers 8
+"""
+import argparse
+import hashlib
+import io
+import os
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from multiprocessing import Pool
+
+import partitions
+from ingest import MAIN_COLUMNS, MAIN_KEY_COLUMNS, WAKE_COLUMNS
+
+SD_IMPORT_CHUNK_BYTES = int(os.environ.get('SD_IMPORT_CHUNK_BYTES', 32 * 1024 * 1024))
+
+# SensorID values (main_pico/structs.py, wake_pico/structs.py) that mark which probe wrote a log
+MAIN_SENSORS = ('BATTERY_VOLTAGE', 'TEMPERATURE', 'PH', 'TDS', 'TURBIDITY')
+WAKE_SENSORS = ('HYDROPHONE', 'ABSOLUTE_ORIENTATION', 'WATER_LEVEL')
+
+# Columns written by COPY, in order; experiment_id is filled in by the loader
+MAIN_COPY_COLUMNS = ('timestamp',) + MAIN_COLUMNS + MAIN_KEY_COLUMNS
+WAKE_COPY_COLUMNS = ('timestamp',) + WAKE_COLUMNS
+ROTATION_VALUES = len(WAKE_COLUMNS) - 3
+
+LINE = re.compile(rb'^\((\d+), (\d+), (\d+), \d+, (\d+), (\d+), (\d+), \d+\): \{(.*)\}$')
+# 'KEY': value, where value is a quoted string or tuple (either may hold commas) or a bare number
+ENTRY = re.compile(rb"'(\w+)': ('[^']*'|\"[^\"]*\"|\([^)]*\)|[^,}]+)")
+
+NUMBER = re.compile(rb'-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?')
+
+NULL = '\\N'
+
+# Whole-field values the probes log in place of a reading: "-9" for a failed
+# read and "-1" for an absent sensor or IntentionalNull (main_pico/structs.py).
+# They are logged as strings, so a number such as a hydrophone reading of -1.0
+# is kept; only an error string, or a lone value in a tuple field, is NULL
+ERROR_VALUES = (-9.0, -1.0)
+# The gateway's sample payload shows -5 for turbidity when it was not measured
+TURBIDITY_PLACEHOLDER = (-5.0,)
+# temperature.NO_SENSOR, logged for each DS18B20 channel with nothing connected
+NO_TEMPERATURE = (-1.0,)
+
+
+def _value(raw, sentinels=()):
+    """A logged number as a float string for COPY, or \\N if it is not a number or is one of ``sentinels``"""
+    try:
+        number = float(raw)
+    except ValueError:
+        return NULL
+    if number in sentinels:
+        return NULL
+    # Plain decimals go to COPY as written; anything else (nan, inf) is normalised through float
+    return raw.decode() if NUMBER.fullmatch(raw) else repr(number)
+
+
+def _scalar(raw, sentinels=()):
+    """A single-value field as a COPY field; a "-9" or "-1" error string is \\N"""
+    if raw[:1] in (b"'", b'"'):
+        return _value(raw[1:-1], sentinels + ERROR_VALUES)
+    return _value(raw, sentinels)
+
+
+def _values(raw, count, sentinels=()):
+    """A comma-separated string or tuple logged value as ``count`` COPY fields.
+
+    Sensors report an error as a single value in place of the tuple ("-9",
+    or "-1,-1,-1" for a forced rotation error); a single value is repeated,
+    with "-9" and "-1" stored as nulls, and any other length is stored as
+    nulls. Parts of a full-length tuple are readings and are only nulled if
+    they are in ``sentinels``, such as the -1.0 of an unconnected
+    temperature channel.
+    """
+    if raw[:1] in (b"'", b'"', b'('):
+        raw = raw[1:-1]
+    parts = raw.split(b',')
+    if len(parts) == 1:
+        return [_value(parts[0].strip(), sentinels + ERROR_VALUES)] * count
+    if len(parts) != count:
+        return [NULL] * count
+    return [_value(part.strip(), sentinels) for part in parts]
+
+
+def _main_fields(fields, device_time, probe_id):
+    temperatures = _values(fields.get(b'TEMPERATURE', b''), 4, NO_TEMPERATURE)
+    iterations = fields.get(b'_ITERATIONS')
+    if iterations is not None and iterations.isdigit():
+        key = [probe_id, iterations.decode(), device_time]
+    else:
+        key = [NULL] * len(MAIN_KEY_COLUMNS)
+    # The SD log does not record the GP19 water signal, so water_detected is unknown
+    return [*temperatures, _scalar(fields.get(b'PH', b'')), _scalar(fields.get(b'BATTERY_VOLTAGE', b'')),
+            _scalar(fields.get(b'TDS', b'')), _scalar(fields.get(b'TURBIDITY', b''), TURBIDITY_PLACEHOLDER), NULL,
+            *key]
+
+
+def _wake_fields(fields, device_time, probe_id):
+    return [*_values(fields.get(b'ABSOLUTE_ORIENTATION', b''), ROTATION_VALUES),
+            _scalar(fields.get(b'HYDROPHONE', b'')), _scalar(fields.get(b'WATER_LEVEL', b''))]
+
+
+def parse_chunk(task):
+    """Parse the lines in ``[start, end)`` of a log into COPY text.
+
+    Runs in a worker process. Returns ``(end, copy_text, rows, rejected,
+    first_time, last_time, examples)``, where the times bound the RTC
+    timestamps seen (for partition creation) and ``examples`` holds a few
+    rejected lines.
+    """
+    path, start, end, table, probe_id = task
+    fields_for = _main_fields if table == 'main_data' else _wake_fields
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    out = io.StringIO()
+    rows = rejected = 0
+    first_time = last_time = None
+    examples = []
+    for line in data.split(b'\n'):
+        line = line.rstrip(b'\r')
+        if not line:
+            continue
+        match = LINE.match(line)
+        if match is None:
+            rejected += 1
+            if len(examples) < 3:
+                examples.append(line[:200].decode(errors='replace'))
+            continue
+        year, month, day, hour, minute, second, body = match.groups()
+        try:
+            stamp = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+        except ValueError:
+            rejected += 1
+            if len(examples) < 3:
+                examples.append(line[:200].decode(errors='replace'))
+            continue
+        first_time = stamp if first_time is None or stamp < first_time else first_time
+        last_time = stamp if last_time is None or stamp > last_time else last_time
+
+        # Same "/"-joined form the probe sends over BLE/LoRa as the device timestamp
+        raw_time = line[1:line.index(b')')]
+        device_time = raw_time.replace(b', ', b'/').decode()
+        fields = dict(ENTRY.findall(body))
+        out.write('\t'.join([stamp.isoformat(sep=' '), '\x00', *fields_for(fields, device_time, probe_id)]))
+        out.write('\n')
+        rows += 1
+    return end, out.getvalue(), rows, rejected, first_time, last_time, examples
+
+
+def split_chunks(path, start, chunk_bytes):
+    """Yield ``(start, end)`` byte ranges from ``start`` that each end just after a newline.
+
+    Stops before a final line with no newline, since the probe may still be
+    writing it (or lost power mid-write); it is imported once it is complete.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = f.tell()
+            if end >= size:
+                # Back up to the last newline in the file
+                f.seek(start)
+                tail = f.read(size - start)
+                last_newline = tail.rfind(b'\n')
+                if last_newline < 0:
+                    return
+                end = start + last_newline + 1
+            yield start, end
+            start = end
+
+
+def detect_table(path):
+    """Guess main_data or wake_data from the sensors in the first parseable line"""
+    with open(path, 'rb') as f:
+        for line in f:
+            match = LINE.match(line.rstrip(b'\r\n'))
+            if match is None:
+                continue
+            keys = {key.decode() for key, _ in ENTRY.findall(match.group(7))}
+            if keys & set(MAIN_SENSORS):
+                return 'main_data'
+            if keys & set(WAKE_SENSORS):
+                return 'wake_data'
+    return None
+
+
+def source_name(path, table, experiment_id):
+    """Identify a log by its first line, so later copies of the same card resume from the stored offset"""
+    with open(path, 'rb') as f:
+        first_line = f.readline()
+    digest = hashlib.sha1(first_line).hexdigest()[:16]
+    return f'{table}:{experiment_id}:{digest}'
+
+
+def _copy_sql(table, columns):
+    return f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+
+def _load_main(cur):
+    """Move staged main rows into main_data, skipping keys already stored (see ingest.main_insert_sql)"""
+    columns = ', '.join(MAIN_COPY_COLUMNS)
+    key = ', '.join(MAIN_KEY_COLUMNS)
+    cur.execute(f"""
+        WITH claimed AS (
+            INSERT INTO main_data_keys ({key}, timestamp)
+            SELECT {key}, MIN(timestamp) FROM sd_import_main WHERE probe_id IS NOT NULL
+            GROUP BY {key}
+            ON CONFLICT DO NOTHING
+            RETURNING {key}
+        )
+        INSERT INTO main_data ({columns})
+        SELECT {columns} FROM (
+            SELECT DISTINCT ON ({key}) sd_import_main.*
+            FROM sd_import_main JOIN claimed USING ({key})
+            ORDER BY {key}, timestamp
+        ) AS first_seen
+        UNION ALL
+        SELECT {columns} FROM sd_import_main WHERE probe_id IS NULL
+    """)
+    inserted = cur.rowcount
+    cur.execute('TRUNCATE sd_import_main')
+    return inserted
+
+
+def _parsed(pool, tasks, workers):
+    """Parse chunks on the pool, yielding results in file order.
+
+    At most two chunks per worker are parsed ahead of the loader, so a slow
+    database cannot let parsed COPY text pile up in memory.
+    """
+    window = deque()
+    limit = 2 * (workers or os.cpu_count() or 1)
+    for task in tasks:
+        window.append(pool.apply_async(parse_chunk, (task,)))
+        if len(window) >= limit:
+            yield window.popleft().get()
+    while window:
+        yield window.popleft().get()
+
+
+def import_log(conn, path, experiment_id, table=None, probe_id=None, workers=None,
+               chunk_bytes=SD_IMPORT_CHUNK_BYTES, restart=False, log=print):
+    """Import one SD card log; returns a summary dict.
+
+    Chunks are parsed in parallel but loaded in file order, one transaction
+    per chunk, each also advancing the offset stored in sd_imports.
+    """
+    table = table or detect_table(path)
+    if table not in partitions.PARTITIONED_TABLES:
+        raise ValueError(f'Could not tell whether {path} is a main or wake log; pass --table')
+    probe_id = probe_id or ('MAIN' if table == 'main_data' else 'WAKE')
+    source = source_name(path, table, experiment_id)
+    columns = MAIN_COPY_COLUMNS if table == 'main_data' else WAKE_COPY_COLUMNS
+
+    with conn.cursor() as cur:
+        cur.execute('SELECT byte_offset FROM sd_imports WHERE source = %s', (source,))
+        found = cur.fetchone()
+        if table == 'main_data':
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS sd_import_main AS
+                SELECT {', '.join(MAIN_COPY_COLUMNS)} FROM main_data LIMIT 0
+            """)
+    conn.commit()
+    offset = 0 if restart or found is None else found[0]
+    size = os.path.getsize(path)
+    if offset > size:
+        raise ValueError(f'{path} is shorter than the stored offset {offset}; is it a different card? '
+                         'Pass --restart to import it from the start')
+    log(f"📥 {path} -> {table} ({experiment_id}) from byte {offset:,} of {size:,}")
+
+    summary = {'source': source, 'table': table, 'rows': 0, 'inserted': 0, 'rejected': 0,
+               'start_offset': offset, 'offset': offset}
+    started = time.monotonic()
+    tasks = ((path, start, end, table, probe_id) for start, end in split_chunks(path, offset, chunk_bytes))
+    with Pool(workers) as pool:
+        for end, text, rows, rejected, first_time, last_time, examples in _parsed(pool, tasks, workers):
+            for example in examples:
+                log(f"⚠️ Skipped unparseable line: {example!r}")
+            if rows:
+                partitions.ensure_range(conn, table, first_time, last_time)
+            # experiment_id is left as a NUL placeholder by the workers; swap it in here
+            text = text.replace('\x00', experiment_id.replace('\\', '\\\\').replace('\t', '\\t'))
+            with conn.cursor() as cur:
+                if table == 'main_data':
+                    cur.copy_expert(_copy_sql('sd_import_main', columns), io.StringIO(text))
+                    inserted = _load_main(cur)
+                else:
+                    cur.copy_expert(_copy_sql(table, columns), io.StringIO(text))
+                    inserted = rows
+                cur.execute('''
+                    INSERT INTO sd_imports (source, path, target_table, experiment_id, byte_offset, rows_loaded)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (source) DO UPDATE SET
+                        path = EXCLUDED.path,
+                        byte_offset = EXCLUDED.byte_offset,
+                        rows_loaded = sd_imports.rows_loaded + EXCLUDED.rows_loaded,
+                        updated_at = CURRENT_TIMESTAMP
+                ''', (source, os.path.abspath(path), table, experiment_id, end, inserted))
+            conn.commit()
+            summary['rows'] += rows
+            summary['inserted'] += inserted
+            summary['rejected'] += rejected
+            summary['offset'] = end
+            elapsed = time.monotonic() - started
+            log(f"  {end:,}/{size:,} bytes, {summary['inserted']:,} rows "
+                f"({summary['rows'] / elapsed if elapsed else 0:,.0f} lines/s)")
+
+    summary['duplicates'] = summary['rows'] - summary['inserted']
+    summary['elapsed_s'] = round(time.monotonic() - started, 3)
+    return summary
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='copy of /sd/data.txt')
+    parser.add_argument('--experiment-id', required=True)
+    parser.add_argument('--table', choices=partitions.PARTITIONED_TABLES,
+                        help='target table (default: detected from the sensors in the log)')
+    parser.add_argument('--probe-id', help='probe_id for the dedupe key (default MAIN or WAKE)')
+    parser.add_argument('--workers', type=int, help='parser processes (default: one per CPU)')
+    parser.add_argument('--chunk-mb', type=float, default=SD_IMPORT_CHUNK_BYTES / 1024 / 1024,
+                        help='bytes parsed and committed per chunk, in MiB')
+    parser.add_argument('--restart', action='store_true', help='ignore the stored offset and import from the start')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+    try:
+        result = import_log(conn, args.path, args.experiment_id, args.table, args.probe_id, args.workers,
+                            int(args.chunk_mb * 1024 * 1024), args.restart)
+    except (ValueError, OSError) as e:
+        sys.exit(f'❌ {e}')
+    finally:
+        conn.close()
+    print(f"✓ {result['inserted']:,} rows imported into {result['table']} "
+          f"({result['duplicates']:,} duplicates skipped, {result['rejected']:,} lines rejected) "
+          f"in {result['elapsed_s']}s; offset {result['offset']:,}")
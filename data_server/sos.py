@@ -0,0 +1,171 @@
+"""Slack SOS sending and the background auto-SOS dispatcher used by the Flask app"""
+import atexit
+import os
+import queue
+import threading
+
+import requests
+
+import metrics
+import profiler
+from db import get_db_connection
+from ingest import SosRateLimitCache, auto_sos_message
+
+
+def send_slack_sos_message(message_text: str):
+    """Send a message to the Slack SOS webhook. Returns (ok, error_message)."""
+    slack_webhook_url = os.environ.get('SLACK_SOS_WEBHOOK')
+    if not slack_webhook_url:
+        return False, 'SLACK_SOS_WEBHOOK environment variable not set'
+
+    payload = {'text': message_text}
+    try:
+        with metrics.SLACK_SECONDS.time(), profiler.stage('slack_webhook'):
+            response = requests.post(slack_webhook_url, json=payload, timeout=10)
+        response.raise_for_status()
+        return True, None
+    except requests.exceptions.RequestException as e:
+        return False, str(e)
+
+
+sos_rate_limit = SosRateLimitCache()
+
+
+def warm_sos_rate_limit():
+    """Load every SOS sent within the rate-limit window from sos_events into the cache"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT experiment_id, EXTRACT(EPOCH FROM NOW() - MAX(created_at))
+                FROM sos_events
+                WHERE created_at >= NOW() - make_interval(secs => %s)
+                GROUP BY experiment_id
+                """,
+                (sos_rate_limit.ttl,),
+            )
+            return sos_rate_limit.load(cur.fetchall())
+
+
+def log_sos_event(experiment_id: str, source: str, message: str):
+    """Insert an SOS event record for auditing/rate limiting. Best-effort; exceptions bubble up."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO sos_events (experiment_id, source, message)
+                VALUES (%s, %s, %s)
+                """,
+                (experiment_id, source, message),
+            )
+        conn.commit()
+    sos_rate_limit.record(experiment_id)
+
+
+def maybe_send_auto_sos(experiment_id: str):
+    """Send an SOS for this experiment if one hasn't been sent in the last 24 hours."""
+    if sos_rate_limit.is_limited(experiment_id):
+        metrics.SOS_RATE_LIMITED.inc('cache')
+        return False  # rate-limited, no DB read needed
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT EXTRACT(EPOCH FROM NOW() - created_at)
+                FROM sos_events
+                WHERE experiment_id = %s
+                  AND created_at >= NOW() - make_interval(secs => %s)
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (experiment_id, sos_rate_limit.ttl),
+            )
+            recent = cur.fetchone()
+
+    if recent:
+        sos_rate_limit.record(experiment_id, float(recent[0]))
+        metrics.SOS_RATE_LIMITED.inc('database')
+        return False  # rate-limited
+
+    # Not rate-limited; send and log
+    message_text = auto_sos_message(experiment_id)
+    ok, err = send_slack_sos_message(message_text)
+    metrics.SOS_SENT.inc('auto', 'ok' if ok else 'failed')
+    if ok:
+        # Cache before logging so a failed insert cannot cause a repeat SOS from this process
+        sos_rate_limit.record(experiment_id)
+        try:
+            log_sos_event(experiment_id, 'auto', message_text)
+        except Exception:
+            # Best-effort logging; do not raise to caller
+            pass
+    return ok
+
+
+class SosDispatcher:
+    """Runs maybe_send_auto_sos on a background thread so ingest never waits on Slack.
+
+    Submissions for an experiment that is already queued are collapsed, and a
+    single worker sends them in order, so the 24-hour rate limit checked by
+    maybe_send_auto_sos still holds.
+    """
+
+    def __init__(self, maxsize=1000):
+        self._queue = queue.Queue(maxsize)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sos-dispatcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, experiment_id: str):
+        """Queue an auto SOS check; returns False if it was collapsed or dropped"""
+        self.start()
+        with self._lock:
+            if experiment_id in self._pending:
+                return False
+            try:
+                # Profile the send too when the request that queued it is being profiled
+                self._queue.put_nowait((experiment_id, profiler.active()))
+            except queue.Full:
+                print(f"⚠️ SOS queue full, dropping auto SOS for experiment {experiment_id}")
+                return False
+            self._pending.add(experiment_id)
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            experiment_id, profile = item
+            try:
+                with profiler.profile('sos-dispatcher', profile or profiler.should_profile()), \
+                        profiler.stage('maybe_send_auto_sos'):
+                    maybe_send_auto_sos(experiment_id)
+            except Exception as e:
+                print(f"⚠️ Auto SOS for experiment {experiment_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(experiment_id)
+                self._queue.task_done()
+
+    def stop(self, timeout=15):
+        """Send everything already queued, then stop the worker"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+sos_dispatcher = SosDispatcher(int(os.environ.get('SOS_QUEUE_SIZE', 1000)))
+atexit.register(sos_dispatcher.stop)
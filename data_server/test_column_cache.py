@@ -0,0 +1,71 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import column_cache
+from column_cache import (CACHED_COLUMNS, NPY_HEADER_BYTES, PG_EPOCH_US, _append, _create, _npy_header, _wire_dtype,
+                          _write_meta, load)
+
+# 2025-08-07 00:00 as Postgres sends it, in microseconds from 2000-01-01
+DAY_US = int(np.datetime64('2025-08-07', 'us').astype('<i8')) - PG_EPOCH_US
+
+
+def wake_records(ids):
+    """Records shaped like copy_records output for wake_data, one second apart"""
+    records = np.zeros(len(ids), _wire_dtype(CACHED_COLUMNS['wake_data']))
+    records['id'] = ids
+    records['timestamp'] = [DAY_US + id * 1000000 for id in ids]
+    records['yaw'] = [id / 2 for id in ids]
+    records['water_level'] = np.nan
+    return records
+
+
+@pytest.mark.parametrize('dtype, rows', [('<f4', 0), ('<M8[us]', 12345678901), ('<i2', 3)])
+def test_npy_header_is_fixed_size_and_readable(tmp_path, dtype, rows):
+    header = _npy_header(dtype, rows)
+    assert len(header) == NPY_HEADER_BYTES and header.endswith(b'\n')
+    path = tmp_path / 'column.npy'
+    path.write_bytes(header)
+    with open(path, 'rb') as f:
+        assert np.lib.format.read_magic(f) == (1, 0)
+        shape, fortran_order, read_dtype = np.lib.format.read_array_header_1_0(f)
+    assert (shape, fortran_order, read_dtype) == ((rows,), False, np.dtype(dtype))
+
+
+def test_append_extends_every_column_in_place(tmp_path):
+    directory = str(tmp_path / 'wake_data')
+    _create(directory, 'wake_data')
+    assert np.load(os.path.join(directory, 'yaw.npy')).shape == (0,)
+    _append(directory, 'wake_data', wake_records([1, 2]), 0)
+    _append(directory, 'wake_data', wake_records([3]), 2)
+    yaw = np.load(os.path.join(directory, 'yaw.npy'))
+    assert yaw.dtype == np.dtype('<f4') and list(yaw) == [0.5, 1.0, 1.5]
+    assert list(np.load(os.path.join(directory, 'id.npy'))) == [1, 2, 3]
+    timestamps = np.load(os.path.join(directory, 'timestamp.npy'))
+    assert timestamps[0] == np.datetime64('2025-08-07T00:00:01', 'us')
+
+
+def test_append_trims_a_tail_left_by_a_crashed_sync(tmp_path):
+    directory = str(tmp_path / 'wake_data')
+    _create(directory, 'wake_data')
+    _append(directory, 'wake_data', wake_records([1, 2]), 0)
+    # The crashed sync wrote its rows but never recorded them
+    _append(directory, 'wake_data', wake_records([3, 4]), 2)
+    _append(directory, 'wake_data', wake_records([5]), 2)
+    assert list(np.load(os.path.join(directory, 'id.npy'))) == [1, 2, 5]
+
+
+def test_load_maps_a_time_window(tmp_path):
+    directory = column_cache._table_dir(str(tmp_path), 'lake/1', 'wake_data')
+    _create(directory, 'wake_data')
+    _append(directory, 'wake_data', wake_records([1, 2, 3, 4]), 0)
+    _write_meta(directory, {'rows': 4, 'columns': [column for column, _, _ in CACHED_COLUMNS['wake_data']]})
+    window = load('lake/1', 'wake_data', ['id', 'water_level'], start=datetime(2025, 8, 7, 0, 0, 2),
+                  end=datetime(2025, 8, 7, 0, 0, 4), cache_dir=str(tmp_path))
+    assert list(window['id']) == [2, 3] and np.isnan(window['water_level']).all()
+    with pytest.raises(KeyError, match='nope'):
+        load('lake/1', 'wake_data', ['nope'], cache_dir=str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        load('other', 'wake_data', cache_dir=str(tmp_path))
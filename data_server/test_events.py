@@ -0,0 +1,39 @@
+import json
+
+from events import EventBroadcaster, Subscription
+
+
+def test_slow_subscriber_drops_the_oldest_frames_and_is_told_how_many():
+    subscription = Subscription('x', max_pending=2)
+    for frame in (b'1', b'2', b'3', b'4'):
+        subscription.push(frame)
+    assert subscription.wait(0) == ([b'3', b'4'], 2)
+    # The count is reported once
+    subscription.push(b'5')
+    assert subscription.wait(0) == ([b'5'], 0)
+
+
+def test_wait_times_out_empty():
+    assert Subscription('x', max_pending=2).wait(0.01) == ([], 0)
+
+
+def test_publish_shares_one_encoded_frame_among_that_experiments_subscribers():
+    broadcaster = EventBroadcaster(max_pending=4)
+    first, second, other = broadcaster.subscribe('x'), broadcaster.subscribe('x'), broadcaster.subscribe('y')
+    broadcaster.publish('x', 'main', {'ph': 7.0})
+    frames, _ = first.wait(0)
+    assert frames[0] is second.wait(0)[0][0]
+    assert other.wait(0) == ([], 0)
+    header, data = frames[0].decode().rstrip('\n').rsplit('\n', 1)
+    assert header == 'id: 1\nevent: main'
+    assert json.loads(data[len('data: '):]) == {'ph': 7.0}
+
+
+def test_unsubscribe_forgets_experiments_without_subscribers():
+    broadcaster = EventBroadcaster()
+    subscription = broadcaster.subscribe('x')
+    assert broadcaster.has_subscribers('x') and broadcaster.subscriber_count() == 1
+    broadcaster.unsubscribe(subscription)
+    assert not broadcaster.has_subscribers('x') and broadcaster.subscriber_count() == 0
+    broadcaster.publish('x', 'main', {})
+    assert subscription.wait(0) == ([], 0)
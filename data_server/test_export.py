@@ -0,0 +1,49 @@
+import io
+from collections import namedtuple
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from export import encode_arrow, encode_csv
+
+Column = namedtuple('Column', 'name type_code')
+
+DESCRIPTION = [Column('id', 23), Column('timestamp', 1114), Column('experiment_id', 25), Column('ph', 700),
+               Column('water_detected', 16)]
+
+
+def chunks():
+    yield DESCRIPTION, [(1, datetime(2025, 7, 1), 'e', 7.0, False), (2, datetime(2025, 7, 1, 0, 1), 'e', None, True)]
+    yield DESCRIPTION, [(3, datetime(2025, 7, 1, 0, 2), 'e', 6.5, None)]
+
+
+def test_csv_writes_one_header_and_a_piece_per_chunk():
+    pieces = list(encode_csv(chunks()))
+    assert len(pieces) == 2
+    lines = b''.join(pieces).decode().splitlines()
+    assert lines[0] == 'id,timestamp,experiment_id,ph,water_detected'
+    assert lines[1:] == ['1,2025-07-01 00:00:00,e,7.0,False', '2,2025-07-01 00:01:00,e,,True',
+                         '3,2025-07-01 00:02:00,e,6.5,']
+
+
+def test_csv_of_no_rows_is_just_the_header():
+    assert b''.join(encode_csv(iter([(DESCRIPTION, [])]))) == b'id,timestamp,experiment_id,ph,water_detected\r\n'
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_arrow_formats_round_trip(fmt):
+    data = b''.join(encode_arrow(chunks(), fmt))
+    table = pq.read_table(io.BytesIO(data)) if fmt == 'parquet' else pa.ipc.open_stream(data).read_all()
+    assert table.schema.field('ph').type == pa.float32()
+    assert table.schema.field('timestamp').type == pa.timestamp('us')
+    assert table.column('id').to_pylist() == [1, 2, 3]
+    assert table.column('ph').to_pylist() == [7.0, None, 6.5]
+    assert table.column('water_detected').to_pylist() == [False, True, None]
+
+
+def test_arrow_of_no_rows_keeps_the_schema():
+    data = b''.join(encode_arrow(iter([(DESCRIPTION, [])]), 'arrow'))
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.num_rows == 0 and table.schema.names == [column.name for column in DESCRIPTION]
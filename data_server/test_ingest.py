@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from ingest import (MAIN_INGEST_COLUMNS, WAKE_BINARY_FIELDS, WAKE_COLUMNS, BatchError, SosRateLimitCache,
+                    batch_summary, main_row_key, mark_duplicates, parse_batch, parse_main_row, parse_wake_binary,
+                    parse_wake_row)
+
+
+def main_body(**extra):
+    body = {'experiment_id': 'e', 'temperature_1': 20, 'temperature_2': 20.5, 'temperature_3': None,
+            'temperature_4': '21', 'ph': 7, 'battery_level': 80, 'tds': 200, 'turbidity': 1, 'water_detected': False}
+    return {**body, **extra}
+
+
+def keyed(iterations, **extra):
+    return main_body(probe_id='MAIN', iterations=iterations, device_timestamp=f'2025/8/7/{iterations}', **extra)
+
+
+def test_parse_main_row_orders_columns_and_leaves_key_empty():
+    row = parse_main_row(main_body())
+    assert len(row) == len(MAIN_INGEST_COLUMNS)
+    assert row[:2] == ('e', 20.0)
+    assert row[3] is None and row[4] == 21.0
+    assert row[-3:] == (None, None, None)
+
+
+@pytest.mark.parametrize('extra, message', [
+    ({'ph': 'acid'}, "'ph' must be a number"),
+    ({'ph': 1e39}, "'ph' is out of range"),
+    ({'ph': float('inf')}, "'ph' is out of range"),
+    ({'probe_id': 'MAIN'}, 'must be sent together'),
+    ({'probe_id': 'MAIN', 'iterations': 2 ** 31, 'device_timestamp': 't'}, "'iterations' is out of range"),
+])
+def test_parse_main_row_rejects(extra, message):
+    with pytest.raises(ValueError, match=message):
+        parse_main_row(main_body(**extra))
+
+
+def test_nan_is_a_valid_real():
+    assert np.isnan(parse_main_row(main_body(ph='nan'))[5])
+
+
+def test_parse_wake_row():
+    row = parse_wake_row({'experiment_id': 'w', 'rotation_data': ','.join(['1.5'] * 16),
+                          'hydrophone_reading': 3, 'water_level': None})
+    assert len(row) == len(WAKE_COLUMNS)
+    assert row[1:17] == (1.5,) * 16 and row[-1] is None
+    with pytest.raises(ValueError, match='exactly 16'):
+        parse_wake_row({'experiment_id': 'w', 'rotation_data': '1,2', 'hydrophone_reading': 3, 'water_level': 1})
+    with pytest.raises(ValueError, match="'rotation_data' is out of range"):
+        parse_wake_row({'experiment_id': 'w', 'rotation_data': ','.join(['inf'] * 16),
+                        'hydrophone_reading': 3, 'water_level': 1})
+
+
+def test_parse_batch_keeps_valid_rows_and_reports_bad_ones():
+    rows, results = parse_batch([main_body(), {'experiment_id': 'e'}, main_body(ph=1)], parse_main_row, 10)
+    assert [row[5] for row in rows] == [7.0, 1.0]
+    assert [result['status'] for result in results] == ['ok', 'error', 'ok']
+    assert 'Missing field' in results[1]['error']
+    response, status = batch_summary(len(rows), results, len(results), 0.5)
+    assert (response['status'], response['inserted'], response['rejected'], status) == ('partial', 2, 1, 200)
+
+
+@pytest.mark.parametrize('body, status', [({'rows': 1}, 400), ('rows', 400), ([main_body()] * 3, 413)])
+def test_parse_batch_rejects_whole_body(body, status):
+    with pytest.raises(BatchError) as error:
+        parse_batch(body, parse_main_row, 2)
+    assert error.value.status == status
+
+
+def test_batch_summary_all_rejected():
+    response, status = batch_summary(0, [{'index': 0, 'status': 'error', 'error': 'x'}], 1, 0.1)
+    assert (response['status'], status) == ('error', 400)
+
+
+def test_sos_rate_limit_cache(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ingest.time.monotonic', lambda: now[0])
+    cache = SosRateLimitCache(ttl=60)
+    assert cache.load([('a', 10), ('b', 120)]) == 2
+    assert cache.is_limited('a') and not cache.is_limited('b') and not cache.is_limited('c')
+    cache.record('a', 50)  # older than what is cached, so ignored
+    now[0] += 45
+    assert cache.is_limited('a')
+    now[0] += 10
+    assert not cache.is_limited('a')
+
+
+def test_parse_wake_binary():
+    values = np.arange(2 * WAKE_BINARY_FIELDS, dtype='<f4')
+    values[5] = np.nan
+    rows, results = parse_wake_binary(values.tobytes(), 'w')
+    assert len(rows) == 2 and all(len(row) == len(WAKE_COLUMNS) for row in rows)
+    assert rows[0][0] == 'w' and rows[0][1] == 0.0 and rows[0][6] is None
+    assert rows[1][1] == float(WAKE_BINARY_FIELDS)
+    assert [result['status'] for result in results] == ['ok', 'ok']
+
+
+def test_parse_wake_binary_rejects_infinite_records_like_json_rows():
+    values = np.zeros((3, WAKE_BINARY_FIELDS), dtype='<f4')
+    values[1, 3] = np.inf
+    values[2, 0] = -np.inf
+    values[2, 4] = np.inf
+    rows, results = parse_wake_binary(values.tobytes(), 'w')
+    assert len(rows) == 1
+    assert [result['status'] for result in results] == ['ok', 'error', 'error']
+    assert [result.get('error') for result in results[1:]] == ["Field 'ax' is out of range", "Field 'yaw' is out of range"]
+
+
+@pytest.mark.parametrize('body, experiment_id, message', [
+    (b'\x00' * 72, None, 'experiment_id'),
+    (b'\x00' * 70, 'w', 'multiple of 72'),
+    (b'', 'w', 'multiple of 72'),
+])
+def test_parse_wake_binary_rejects_body(body, experiment_id, message):
+    with pytest.raises(ValueError, match=message):
+        parse_wake_binary(body, experiment_id)
+
+
+@pytest.mark.parametrize('value, expected', [(True, True), (0, False), ('false', False), ('TRUE', True), ('1', True)])
+def test_water_detected_is_parsed_strictly(value, expected):
+    assert parse_main_row(main_body(water_detected=value))[9] is expected
+
+
+@pytest.mark.parametrize('value', ['no', 2, None, 1.0])
+def test_water_detected_rejects_other_values(value):
+    with pytest.raises(ValueError, match='water_detected'):
+        parse_main_row(main_body(water_detected=value))
+
+
+def test_dedupe_key():
+    assert main_row_key(parse_main_row(keyed('7'))) == ('MAIN', 7, '2025/8/7/7')
+    assert main_row_key(parse_main_row(main_body())) is None
+
+
+def test_mark_duplicates_flags_repeats_and_stored_keys():
+    bodies = [keyed(1), keyed(2), keyed(1), main_body(), {'experiment_id': 'e'}, keyed(3)]
+    rows, results = parse_batch(bodies, parse_main_row, 10)
+    # Key 3 was already stored, so only the first key-1 row, key 2 and the unkeyed row went in
+    inserted = [rows[0], rows[1], rows[3]]
+    assert mark_duplicates(rows, inserted, results) == 2
+    assert [result['status'] for result in results] == ['ok', 'ok', 'duplicate', 'ok', 'error', 'duplicate']
+    response, status = batch_summary(len(inserted), results, len(results), 0.5)
+    assert (response['status'], response['inserted'], response['duplicates'], response['rejected'], status) == \
+        ('partial', 3, 2, 1, 200)
@@ -0,0 +1,83 @@
+import pytest
+
+from ingest import MAIN_INGEST_COLUMNS, WAKE_COLUMNS
+from latest import LatestReadings
+
+MAIN_ROW = ('x', *[1.0] * 8, False, None, None, None)
+WAKE_ROW = ('x', *[2.0] * 18)
+
+
+class FakeDatabase:
+    """Stand-in for the newest stored rows that LatestReadings._read would query"""
+
+    def __init__(self):
+        self.stored = {'main': None, 'wake': None}
+        self.reads = []
+
+    def read(self, latest, experiment_id):
+        self.reads.append(experiment_id)
+        return dict(self.stored) if experiment_id == 'x' else dict(LatestReadings.EMPTY)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(LatestReadings, '_read', lambda self, experiment_id: database.read(self, experiment_id))
+    return database
+
+
+def test_insert_for_an_uncached_experiment_does_not_hide_the_other_kind(database):
+    latest = LatestReadings()
+    database.stored['wake'] = {'yaw': 2.0}
+    # After a restart, eviction or clear(), a main insert arrives before any GET
+    latest.update('main_data', MAIN_INGEST_COLUMNS, [MAIN_ROW], 'now')
+    assert latest.get('x') is None
+    database.stored['main'] = {'temperature_1': 1.0}
+    snapshot, _ = latest.load('x')
+    assert snapshot == {'main': {'temperature_1': 1.0}, 'wake': {'yaw': 2.0}}
+
+
+def test_cached_experiment_is_updated_in_memory_with_a_new_etag(database):
+    latest = LatestReadings()
+    database.stored['wake'] = {'yaw': 2.0}
+    _, etag = latest.load('x')
+    latest.update('main_data', MAIN_INGEST_COLUMNS, [MAIN_ROW], 'now')
+    snapshot, new_etag = latest.get('x')
+    assert new_etag != etag
+    assert snapshot['wake'] == {'yaw': 2.0} and snapshot['main']['temperature_1'] == 1.0
+    assert snapshot['main']['received_at'] == 'now'
+    assert database.reads == ['x']
+
+
+def test_experiments_without_rows_are_not_cached(database):
+    latest = LatestReadings()
+    snapshot, etag = latest.load('nothing')
+    assert snapshot == LatestReadings.EMPTY and latest.get('nothing') is None
+    assert latest.load('nothing')[1] == etag
+
+
+def test_load_racing_an_insert_is_not_cached(database, monkeypatch):
+    latest = LatestReadings()
+    read = LatestReadings._read
+
+    def read_then_insert(self, experiment_id):
+        loaded = read(self, experiment_id)
+        # Committed after the read above saw the table
+        latest.update('wake_data', WAKE_COLUMNS, [WAKE_ROW], 'now')
+        return loaded
+
+    monkeypatch.setattr(LatestReadings, '_read', read_then_insert)
+    database.stored['main'] = {'temperature_1': 1.0}
+    latest.load('x')
+    assert latest.get('x') is None
+
+
+def test_least_recently_used_experiment_is_evicted(monkeypatch):
+    monkeypatch.setattr(LatestReadings, '_read', lambda self, experiment_id: {'main': {'id': experiment_id},
+                                                                                'wake': None})
+    latest = LatestReadings(max_entries=2)
+    latest.load('a')
+    latest.load('b')
+    latest.get('a')
+    latest.load('c')
+    assert latest.get('b') is None and latest.get('a') is not None and latest.get('c') is not None
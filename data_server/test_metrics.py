@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, 'REGISTRY', [])
+
+
+def test_counter_sums_threads_and_escapes_labels():
+    counter = metrics.Counter('t_total', 'Test counter', ('route',))
+    counter.inc('/a')
+    thread = threading.Thread(target=counter.inc, args=('/a',), kwargs={'amount': 2})
+    thread.start()
+    thread.join()
+    counter.inc('say "hi"\n')
+    assert metrics.render().splitlines() == [
+        '# HELP t_total Test counter',
+        '# TYPE t_total counter',
+        't_total{route="/a"} 3',
+        't_total{route="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('t_seconds', 'Test histogram', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert metrics.render().splitlines()[2:] == [
+        't_seconds_bucket{le="0.1"} 2',
+        't_seconds_bucket{le="1.0"} 3',
+        't_seconds_bucket{le="+Inf"} 4',
+        't_seconds_sum 3.65',
+        't_seconds_count 4',
+    ]
+
+
+def test_gauge_reads_at_scrape_time_and_skips_none():
+    values = {('main',): 2, ('wake',): 0.5}
+    metrics.Gauge('t_depth', 'Test gauge', lambda: values, ('table',))
+    metrics.Gauge('t_off', 'Disabled gauge', lambda: None)
+    assert metrics.render().splitlines() == [
+        '# HELP t_depth Test gauge',
+        '# TYPE t_depth gauge',
+        't_depth{table="main"} 2',
+        't_depth{table="wake"} 0.5',
+        '# HELP t_off Disabled gauge',
+        '# TYPE t_off gauge',
+    ]
+
+
+def test_failing_metric_does_not_break_render():
+    metrics.Gauge('t_broken', 'Broken gauge', lambda: 1 / 0)
+    metrics.Counter('t_after_total', 'Still rendered').inc()
+    lines = metrics.render().splitlines()
+    assert lines[0].startswith('# t_broken unavailable:')
+    assert lines[-1] == 't_after_total 1'
@@ -0,0 +1,50 @@
+import pytest
+
+import profiler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(profiler.time, 'perf_counter', lambda: now[0])
+    profiler.reset()
+    yield now
+    profiler.finish()
+    profiler.reset()
+
+
+def test_folded_reports_self_time_per_stack(clock):
+    for _ in range(2):
+        with profiler.profile('POST /api/main'):
+            clock[0] += 0.001
+            with profiler.stage('parse'):
+                clock[0] += 0.002
+            with profiler.stage('insert'):
+                clock[0] += 0.003
+                with profiler.stage('commit'):
+                    clock[0] += 0.004
+    assert profiler.folded() == ('POST /api/main 2000\n'
+                                 'POST /api/main;insert 6000\n'
+                                 'POST /api/main;insert;commit 8000\n'
+                                 'POST /api/main;parse 4000\n')
+    summary = {entry['stack']: entry for entry in profiler.summary()}
+    assert summary['POST /api/main;insert']['calls'] == 2
+    assert summary['POST /api/main;insert']['total_ms'] == 14.0
+
+
+def test_stage_outside_a_profiled_request_records_nothing(clock):
+    with profiler.stage('parse'):
+        clock[0] += 1
+    assert profiler.folded() == ''
+
+
+def test_stages_left_open_by_an_exception_are_closed(clock):
+    with pytest.raises(RuntimeError):
+        with profiler.profile('job'):
+            with profiler.stage('outer'):
+                inner = profiler.stage('inner')
+                inner.__enter__()
+                clock[0] += 0.001
+                raise RuntimeError
+    assert not profiler.active()
+    assert profiler.folded().splitlines() == ['job 0', 'job;outer 0', 'job;outer;inner 1000']
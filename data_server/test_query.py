@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import rollups
+from query import QUERY_MAX_POINTS, auto_bucket, parse_bucket, parse_range_args
+
+
+def range_args(days, **extra):
+    end = datetime(2025, 7, 15)
+    return {'experiment_id': 'e', 'start': (end - timedelta(days=days)).isoformat(), 'end': end.isoformat(), **extra}
+
+
+def test_seven_day_default_query_reads_the_1m_rollup():
+    _, _, _, bucket = parse_range_args(range_args(7))
+    assert bucket == 180
+    assert rollups.pick_level(bucket) == ('1m', 60)
+
+
+@pytest.mark.parametrize('days, level', [(30, '1m'), (365, '1h'), (3650, '1d')])
+def test_auto_bucket_uses_the_coarsest_rollup_that_keeps_enough_points(days, level):
+    span = days * 86400
+    bucket = auto_bucket(span)
+    assert rollups.pick_level(bucket)[0] == level
+    assert QUERY_MAX_POINTS / 2 <= span / bucket <= QUERY_MAX_POINTS
+
+
+def test_short_ranges_keep_fine_raw_buckets():
+    bucket = auto_bucket(86400)
+    assert bucket == 18
+    assert rollups.pick_level(bucket) is None
+
+
+@pytest.mark.parametrize('bucket, level', [(60, ('1m', 60)), (7200, ('1h', 3600)), (172800, ('1d', 86400)),
+                                           (90, None), (30, None)])
+def test_pick_level_takes_the_coarsest_width_dividing_the_bucket(bucket, level):
+    assert rollups.pick_level(bucket) == level
+
+
+def test_explicit_bucket_is_kept():
+    assert parse_range_args(range_args(7, bucket='5m'))[3] == 300
+
+
+def test_bucket_too_small_for_range():
+    with pytest.raises(ValueError, match='too small'):
+        parse_range_args(range_args(30, bucket='1s'))
+
+
+def test_parse_bucket_units():
+    assert [parse_bucket(v) for v in ('30', '30s', '5m', '1h', '1d')] == [30, 30, 300, 3600, 86400]
+    with pytest.raises(ValueError):
+        parse_bucket('0m')
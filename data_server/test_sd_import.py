@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+
+from sd_import import NULL, ROTATION_VALUES, _scalar, _value, _values, detect_table, parse_chunk, split_chunks
+
+MAIN_LINE = ("(2025, 8, 7, 3, 11, 46, 36, 0): {'BATTERY_VOLTAGE': 84.91, 'TEMPERATURE': (24.38, -1.0, -1.0, -1.0), "
+             "'PH': '-9', 'TDS': 223.07, 'TURBIDITY': 3, '_ITERATIONS': 12}\n")
+OLD_MAIN_LINE = ("(2025, 8, 7, 3, 11, 46, 37, 0): {'BATTERY_VOLTAGE': 84.9, 'TEMPERATURE': '24.5,24.6,-1.0,-1.0', "
+                 "'PH': 7.01, 'TDS': 'nan', 'TURBIDITY': -5}\n")
+WAKE_LINE = "(2025, 8, 7, 3, 11, 46, 38, 0): {'HYDROPHONE': 0.5, 'ABSOLUTE_ORIENTATION': '-1,-1,-1', 'WATER_LEVEL': 2}\n"
+
+
+@pytest.mark.parametrize('raw, expected', [
+    (b'24.38', '24.38'), (b'1e3', '1e3'), (b'nan', 'nan'), (b'-1.0', '-1.0'), (b'-9', '-9'),
+    (b'None', NULL), (b'', NULL),
+])
+def test_value(raw, expected):
+    assert _value(raw) == expected
+
+
+@pytest.mark.parametrize('raw, sentinels, expected', [
+    (b"'7.5'", (), '7.5'), (b"'-9'", (), NULL), (b"'-1'", (), NULL), (b'-1.0', (), '-1.0'),
+    (b'-5', (-5.0,), NULL), (b"'-5'", (-5.0,), NULL), (b"'-5'", (), '-5'),
+])
+def test_scalar_nulls_only_whole_field_errors(raw, sentinels, expected):
+    assert _scalar(raw, sentinels) == expected
+
+
+def test_values():
+    assert _values(b'(24.38, -1.0, 25, -1.0)', 4, (-1.0,)) == ['24.38', NULL, '25', NULL]
+    assert _values(b"'-9'", 4) == [NULL] * 4
+    assert _values(b"'-1,-1,-1'", ROTATION_VALUES) == [NULL] * ROTATION_VALUES
+
+
+def test_values_keeps_sentinel_numbers_inside_a_full_tuple():
+    rotation = ['0.5', '-1.0', '-9.0', '-5.0'] * 4
+    assert _values(("'" + ','.join(rotation) + "'").encode(), ROTATION_VALUES) == rotation
+
+
+def log_file(tmp_path, *lines):
+    path = tmp_path / 'data.txt'
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+def test_parse_chunk_main(tmp_path):
+    path = log_file(tmp_path, MAIN_LINE, 'garbage\n', OLD_MAIN_LINE)
+    end, text, rows, rejected, first, last, examples = parse_chunk((path, 0, len(MAIN_LINE + 'garbage\n' + OLD_MAIN_LINE),
+                                                                     'main_data', 'MAIN'))
+    assert (rows, rejected, examples) == (2, 1, ['garbage'])
+    assert (first, last) == (datetime(2025, 8, 7, 11, 46, 36), datetime(2025, 8, 7, 11, 46, 37))
+    first_row, second_row = [line.split('\t') for line in text.splitlines()]
+    assert first_row == ['2025-08-07 11:46:36', '\x00', '24.38', NULL, NULL, NULL, NULL, '84.91', '223.07', '3', NULL,
+                         'MAIN', '12', '2025/8/7/3/11/46/36/0']
+    # No _ITERATIONS, so no dedupe key
+    assert second_row[2:11] == ['24.5', '24.6', NULL, NULL, '7.01', '84.9', 'nan', NULL, NULL]
+    assert second_row[11:] == [NULL] * 3
+
+
+def test_parse_chunk_wake(tmp_path):
+    path = log_file(tmp_path, WAKE_LINE)
+    _, text, rows, *_ = parse_chunk((path, 0, len(WAKE_LINE), 'wake_data', 'WAKE'))
+    fields = text.rstrip('\n').split('\t')
+    assert rows == 1
+    assert fields[2:18] == [NULL] * 16 and fields[18:] == ['0.5', '2']
+
+
+def test_parse_chunk_wake_keeps_a_full_tuple_containing_minus_one(tmp_path):
+    rotation = ['-1.0'] + ['0.25'] * 15
+    line = (f"(2025, 8, 7, 3, 11, 46, 39, 0): {{'HYDROPHONE': -1.0, 'ABSOLUTE_ORIENTATION': '{','.join(rotation)}', "
+            "'WATER_LEVEL': '-9'}\n")
+    path = log_file(tmp_path, line)
+    _, text, rows, *_ = parse_chunk((path, 0, len(line), 'wake_data', 'WAKE'))
+    fields = text.rstrip('\n').split('\t')
+    assert rows == 1
+    assert fields[2:18] == rotation and fields[18:] == ['-1.0', NULL]
+
+
+def test_split_chunks_stops_before_an_unterminated_line(tmp_path):
+    path = log_file(tmp_path, MAIN_LINE * 3, MAIN_LINE[:40])
+    chunks = list(split_chunks(path, 0, len(MAIN_LINE)))
+    assert chunks[0][0] == 0 and chunks[-1][1] == 3 * len(MAIN_LINE)
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+    assert all(end % len(MAIN_LINE) == 0 for _, end in chunks)
+
+
+def test_detect_table(tmp_path):
+    assert detect_table(log_file(tmp_path, MAIN_LINE)) == 'main_data'
+    assert detect_table(log_file(tmp_path, WAKE_LINE)) == 'wake_data'
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import wake_metrics
+from wake_metrics import MetricCache, bucket_rows, bucketize, check_names, snap_range
+
+
+def stamps(*seconds):
+    return np.array([int(s * 1000000) for s in seconds], dtype='i8').astype('M8[us]')
+
+
+def test_bucketize_aggregates_per_epoch_aligned_bucket():
+    timestamps = stamps(0, 10, 59, 60, 130, 150)
+    values = np.array([1.0, 3.0, np.nan, 5.0, np.nan, np.nan])
+    starts, counts, mins, maxes, means, lasts = bucketize(timestamps, values, 60)
+    assert starts.astype('i8').tolist() == [0, 60000000, 120000000]
+    assert counts.tolist() == [3, 1, 2]
+    assert mins[:2].tolist() == [1.0, 5.0] and maxes[:2].tolist() == [3.0, 5.0]
+    assert means[:2].tolist() == [2.0, 5.0]
+    # NaNs are left out, so the last value of the first bucket is 3 and an all-NaN bucket is NaN throughout
+    assert lasts[:2].tolist() == [3.0, 5.0]
+    assert all(np.isnan(aggregate[2]) for aggregate in (mins, maxes, means, lasts))
+
+
+def test_bucketize_empty():
+    starts, counts, *_ = bucketize(stamps(), np.empty(0), 60)
+    assert len(starts) == 0 and len(counts) == 0
+
+
+def test_bucket_rows_shape():
+    rows = bucket_rows(stamps(0, 1), {'tilt': np.array([1.0, 2.0]), 'heave': np.array([np.nan, np.nan])}, 60)
+    assert rows == [[datetime(1970, 1, 1), 2, 1.0, 2.0, 1.5, 2.0, None, None, None, None]]
+
+
+def test_snap_range_widens_to_whole_buckets():
+    start, end = snap_range(datetime(2025, 7, 1, 10, 0, 7, 500), datetime(2025, 7, 1, 10, 5, 0, 1), 60)
+    assert (start, end) == (datetime(2025, 7, 1, 10, 0), datetime(2025, 7, 1, 10, 6))
+    # Already aligned ranges are kept, so repeated requests within a bucket share a cache key
+    assert snap_range(start, datetime(2025, 7, 1, 10, 6), 60) == (start, end)
+
+
+def test_check_names():
+    check_names(list(wake_metrics.METRICS))
+    with pytest.raises(ValueError, match='Unknown metric'):
+        check_names(['tilt', 'nope'])
+
+
+def test_metric_cache_invalidates_only_ranges_reaching_past_since():
+    cache = MetricCache(max_bytes=10 ** 6, ttl=60)
+    series = np.zeros(4), np.zeros(4)
+    old = ('a', datetime(2025, 1, 1), datetime(2025, 1, 2), 'tilt')
+    recent = ('a', datetime(2025, 1, 1), datetime(2025, 2, 1), 'tilt')
+    other = ('b', datetime(2025, 1, 1), datetime(2025, 2, 1), 'tilt')
+    for key in (old, recent, other):
+        cache.put(key, *series)
+    cache.invalidate({'a'}, datetime(2025, 1, 15))
+    assert cache.get(old) is not None and cache.get(other) is not None
+    assert cache.get(recent) is None
+    assert cache.stats()['entries'] == 2
+
+
+def test_metric_cache_evicts_least_recently_used_by_bytes():
+    cache = MetricCache(max_bytes=2 * 64, ttl=60)
+    keys = [('a', datetime(2025, 1, 1), datetime(2025, 1, day), 'tilt') for day in (2, 3, 4)]
+    for key in keys:
+        cache.put(key, np.zeros(4), np.zeros(4))
+    assert cache.get(keys[0]) is None
+    assert cache.stats()['bytes'] == 128
+    # Evicted keys leave the per-experiment index too
+    cache.invalidate({'a'}, datetime(2025, 1, 1))
+    assert cache.stats()['entries'] == 0
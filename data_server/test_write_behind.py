@@ -0,0 +1,101 @@
+import contextlib
+
+import psycopg2
+import pytest
+
+import write_behind
+from db import PoolTimeout
+from write_behind import WriteBehindQueue
+
+COLUMNS = ('experiment_id', 'value')
+
+
+class FakeConnection:
+    def __init__(self, stored):
+        self.stored = stored
+        self.pending = []
+
+    def commit(self):
+        self.stored.extend(self.pending)
+
+
+class FakeDatabase:
+    """Stands in for get_db_connection, insert_rows and store_dead_letter"""
+
+    def __init__(self, errors=()):
+        # Raised in order by the next insert_rows calls, one per call
+        self.errors = list(errors)
+        self.stored = []
+        self.dead = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield FakeConnection(self.stored)
+
+    def insert_rows(self, conn, table, columns, rows):
+        if self.errors:
+            raise self.errors.pop(0)
+        if any(row[1] is None for row in rows):
+            raise psycopg2.IntegrityError('null value in column "value"')
+        conn.pending.extend(rows)
+        return rows
+
+    def store_dead_letter(self, conn, table, columns, row, error):
+        self.dead.append((table, row, str(error)))
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(write_behind, 'get_db_connection', database.connection)
+    monkeypatch.setattr(write_behind, 'store_dead_letter', database.store_dead_letter)
+    monkeypatch.setattr(write_behind.time, 'sleep', lambda seconds: None)
+    return database
+
+
+def flush(database, rows):
+    committed = []
+    writer = WriteBehindQueue(database.insert_rows, lambda table, columns, rows: committed.extend(rows))
+    writer._flush([('main_readings', COLUMNS, row) for row in rows])
+    return writer.stats(), committed
+
+
+def test_batch_is_written_in_one_go(database):
+    stats, committed = flush(database, [('e', 1), ('e', 2)])
+    assert database.stored == committed == [('e', 1), ('e', 2)]
+    assert (stats['written'], stats['batches'], stats['dead_letters'], stats['dropped']) == (2, 1, 0, 0)
+
+
+@pytest.mark.parametrize('error', [psycopg2.OperationalError('server closed the connection'),
+                                   psycopg2.InterfaceError('connection already closed'), PoolTimeout('pool')])
+def test_connection_errors_are_retried_without_losing_rows(database, error):
+    # More failures than retries: an outage must not send the batch to dead_letters
+    database.errors = [error] * 10
+    stats, committed = flush(database, [('e', 1), ('e', 2)])
+    assert database.stored == committed == [('e', 1), ('e', 2)]
+    assert database.dead == []
+    assert (stats['written'], stats['dead_letters'], stats['dropped']) == (2, 0, 0)
+
+
+def test_bad_row_is_dead_lettered_alone(database):
+    stats, committed = flush(database, [('e', 1), ('e', None), ('e', 3)])
+    assert database.stored == committed == [('e', 1), ('e', 3)]
+    assert [(table, row) for table, row, _ in database.dead] == [('main_readings', ('e', None))]
+    assert (stats['written'], stats['dead_letters'], stats['dropped']) == (2, 1, 0)
+
+
+def test_connection_lost_while_writing_rows_one_by_one(database):
+    # The batch fails on its bad row, then the database drops during the row-by-row pass
+    database.errors = [psycopg2.IntegrityError('duplicate'), psycopg2.OperationalError('gone')]
+    stats, _ = flush(database, [('e', 1), ('e', 2)])
+    assert database.stored == [('e', 1), ('e', 2)]
+    assert (stats['dead_letters'], stats['dropped']) == (0, 0)
+
+
+def test_row_is_dropped_when_dead_letter_fails(database, monkeypatch):
+    def refuse(*args):
+        raise psycopg2.DataError('too large')
+    monkeypatch.setattr(write_behind, 'store_dead_letter', refuse)
+    stats, _ = flush(database, [('e', None)])
+    assert database.stored == []
+    assert (stats['written'], stats['dead_letters'], stats['dropped']) == (0, 0, 1)
@@ -0,0 +1,280 @@
+"""Derived wake IMU series, computed in NumPy over whole time ranges.
+
+Each metric turns the raw wake_data columns of a range into one value per
+sample, with NaN where an input was missing:
+
+- ``tilt``: angle between the probe's up axis and vertical, in degrees, from the quaternion
+- ``angular_speed``: norm of the gyro vector, rad/s
+- ``linear_accel``: norm of the linear (gravity-free) acceleration, m/s²
+- ``vertical_accel``: linear acceleration rotated into the world frame, vertical component, m/s²
+- ``heave``: vertical displacement in metres, double-integrated from
+  ``vertical_accel`` with the drift high-passed out; its max - min over a
+  bucket is a crest-to-trough wave height proxy
+- ``rotation_delta``: |Δyaw + Δpitch + Δroll| between samples in radians,
+  capped at 40, the same figure wake_pico sends in its BLE payload
+
+Series are cached per (experiment, range, metric) in a size-bounded LRU;
+ranges are snapped to whole buckets (``snap_range``) so repeated reads,
+including the default one ending now, share keys within a bucket. Ingest
+invalidates an experiment's ranges that reach the present, and entries also
+expire after WAKE_METRICS_CACHE_TTL seconds so rows loaded out of band
+(sd_import.py) show up. A range holding more than WAKE_METRICS_MAX_ROWS rows
+is refused rather than loaded into memory.
+"""
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import column_cache
+
+WAKE_METRICS_CACHE_MB = float(os.environ.get('WAKE_METRICS_CACHE_MB', 256))
+WAKE_METRICS_CACHE_TTL = float(os.environ.get('WAKE_METRICS_CACHE_TTL', 600))
+WAKE_METRICS_MAX_ROWS = int(os.environ.get('WAKE_METRICS_MAX_ROWS', 1000000))
+
+# Heave integration: gaps longer than this are not integrated across, and drift is removed with a centred moving average this wide
+HEAVE_MAX_GAP_SECONDS = 5.0
+HEAVE_WINDOW_SECONDS = 30.0
+
+# Device cap on the rotation delta (wake_pico/main.py)
+ROTATION_DELTA_CAP = 40
+
+
+def _norm(x, y, z):
+    return np.sqrt(x * x + y * y + z * z)
+
+
+def tilt(data):
+    qx, qy = data['qx'], data['qy']
+    # World z of the body z axis is 1 - 2(qx² + qy²) for a unit quaternion
+    cos_tilt = np.clip(1 - 2 * (qx * qx + qy * qy), -1, 1)
+    return np.degrees(np.arccos(cos_tilt))
+
+
+def angular_speed(data):
+    return _norm(data['gx'], data['gy'], data['gz'])
+
+
+def linear_accel(data):
+    return _norm(data['lax'], data['lay'], data['laz'])
+
+
+def vertical_accel(data):
+    qx, qy, qz, qw = data['qx'], data['qy'], data['qz'], data['qw']
+    lax, lay, laz = data['lax'], data['lay'], data['laz']
+    # z row of the rotation matrix of (qx, qy, qz, qw)
+    return (2 * (qx * qz - qw * qy) * lax + 2 * (qy * qz + qw * qx) * lay
+            + (1 - 2 * (qx * qx + qy * qy)) * laz)
+
+
+def _high_pass(values, window):
+    """Subtract a centred moving average ``window`` samples wide"""
+    if window < 2 or len(values) < window:
+        return values - values.mean()
+    padded = np.pad(values, (window // 2, window - 1 - window // 2), mode='edge')
+    sums = np.cumsum(padded)
+    sums[window:] = sums[window:] - sums[:-window]
+    return values - sums[window - 1:] / window
+
+
+def heave(data):
+    accel = vertical_accel(data)
+    missing = np.isnan(accel)
+    seconds = (data['timestamp'] - data['timestamp'][0]) / np.timedelta64(1, 's')
+    dt = np.diff(seconds, prepend=seconds[:1])
+    dt[dt > HEAVE_MAX_GAP_SECONDS] = 0
+    step = np.median(dt[dt > 0]) if np.any(dt > 0) else 1.0
+    window = int(HEAVE_WINDOW_SECONDS / step)
+
+    accel = _high_pass(np.where(missing, 0, accel), window)
+    velocity = _high_pass(np.cumsum(accel * dt), window)
+    displacement = _high_pass(np.cumsum(velocity * dt), window)
+    displacement[missing] = np.nan
+    return displacement
+
+
+def rotation_delta(data):
+    total = np.radians(data['yaw'].astype('f8') + data['pitch'] + data['roll'])
+    delta = np.abs(np.diff(total, prepend=np.nan))
+    return np.minimum(delta, ROTATION_DELTA_CAP)
+
+
+METRICS = {
+    'tilt': tilt,
+    'angular_speed': angular_speed,
+    'linear_accel': linear_accel,
+    'vertical_accel': vertical_accel,
+    'heave': heave,
+    'rotation_delta': rotation_delta,
+}
+
+
+def check_names(names):
+    """Raise ValueError for metric names not in METRICS"""
+    unknown = [name for name in names if name not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metric(s) {', '.join(unknown)}; use {', '.join(METRICS)}")
+
+
+def snap_range(start, end, bucket):
+    """Widen ``[start, end)`` to whole ``bucket``-second buckets aligned to the epoch, as bucketize groups them"""
+    epoch = datetime(1970, 1, 1)
+    start_seconds = (start - epoch) // timedelta(seconds=1)
+    end_seconds = -((epoch - end) // timedelta(seconds=1))
+    return (epoch + timedelta(seconds=start_seconds - start_seconds % bucket),
+            epoch + timedelta(seconds=-(-end_seconds // bucket) * bucket))
+
+
+def fetch_range(conn, experiment_id, start, end, max_rows=WAKE_METRICS_MAX_ROWS):
+    """Raw wake_data columns for ``[start, end)`` as ``{column: array}``, in timestamp order.
+
+    Raises ValueError if the range holds more than ``max_rows`` rows.
+    """
+    records = column_cache.copy_records(conn, 'wake_data', 'experiment_id = %s AND timestamp >= %s AND timestamp < %s',
+                                        (experiment_id, start, end), io.BytesIO(), limit=max_rows + 1)
+    if records is None:
+        return None
+    if len(records) > max_rows:
+        raise ValueError(f'Range holds more than {max_rows} wake rows; narrow start/end')
+    return {name: column_cache.column_values(records, name) for name in records.dtype.names
+            if name in column_cache.COLUMN_DTYPES}
+
+
+class MetricCache:
+    """LRU of computed series keyed by (experiment_id, start, end, metric), bounded by bytes.
+
+    Keys are also indexed by experiment, so ingest invalidation only looks at
+    that experiment's entries.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_experiment = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, timestamps, values):
+        size = timestamps.nbytes + values.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), timestamps, values, size)
+            self._by_experiment.setdefault(key[0], set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+            keys = self._by_experiment[key[0]]
+            keys.discard(key)
+            if not keys:
+                del self._by_experiment[key[0]]
+
+    def invalidate(self, experiment_ids, since):
+        """Drop cached ranges of ``experiment_ids`` that end after ``since``"""
+        with self._lock:
+            for experiment_id in experiment_ids:
+                for key in [key for key in self._by_experiment.get(experiment_id, ()) if key[2] > since]:
+                    self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+metric_cache = MetricCache(int(WAKE_METRICS_CACHE_MB * 1024 * 1024), WAKE_METRICS_CACHE_TTL)
+
+
+def compute(conn, experiment_id, start, end, names, cache=metric_cache):
+    """Return ``(timestamps, {metric: values})`` for ``[start, end)``, from the cache where possible"""
+    check_names(names)
+    timestamps = None
+    series = {}
+    for name in names:
+        cached = cache.get((experiment_id, start, end, name))
+        if cached is not None and (timestamps is None or len(cached[0]) == len(timestamps)):
+            timestamps, series[name] = cached
+    missing = [name for name in names if name not in series]
+    if missing:
+        data = fetch_range(conn, experiment_id, start, end)
+        if data is None:
+            return np.empty(0, dtype='M8[us]'), {name: np.empty(0, dtype='f8') for name in names}
+        timestamps = data['timestamp']
+        with np.errstate(invalid='ignore'):
+            for name in names:
+                # Cached series from before rows were added would no longer line up
+                if name in missing or len(series[name]) != len(timestamps):
+                    series[name] = METRICS[name](data).astype('f8')
+                    cache.put((experiment_id, start, end, name), timestamps, series[name])
+    return timestamps, series
+
+
+def bucketize(timestamps, values, bucket):
+    """Aggregate a series into ``bucket``-second buckets aligned to the epoch, like the SQL bucket queries.
+
+    Returns ``(bucket_starts, counts, mins, maxes, means, lasts)``, skipping
+    empty buckets; NaNs are left out of every aggregate.
+    """
+    if len(timestamps) == 0:
+        empty = np.empty(0)
+        return np.empty(0, dtype='M8[us]'), empty.astype(int), empty, empty, empty, empty
+    index = timestamps.astype('i8') // (bucket * 1000000)
+    edges = np.flatnonzero(np.diff(index, prepend=index[0] - 1))
+    counts = np.diff(np.append(edges, len(index)))
+    valid = ~np.isnan(values)
+    valid_counts = np.add.reduceat(valid.astype(int), edges)
+    sums = np.add.reduceat(np.where(valid, values, 0), edges)
+    mins = np.fmin.reduceat(values, edges)
+    maxes = np.fmax.reduceat(values, edges)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(valid_counts > 0, sums / valid_counts, np.nan)
+    # Last non-NaN value per bucket: carry the latest valid index forward
+    latest = np.maximum.accumulate(np.where(valid, np.arange(len(values)), -1))
+    last_index = latest[np.append(edges[1:], len(values)) - 1]
+    lasts = np.where(last_index >= edges, values[np.maximum(last_index, 0)], np.nan)
+    starts = (index[edges] * (bucket * 1000000)).astype('M8[us]')
+    return starts, counts, mins, maxes, means, lasts
+
+
+def bucket_rows(timestamps, series, bucket):
+    """Bucket several series into rows shaped like the raw bucket query: time, count, then min/max/avg/last each"""
+    columns = []
+    starts = counts = None
+    for values in series.values():
+        starts, counts, *aggregates = bucketize(timestamps, values, bucket)
+        columns.append(aggregates)
+    if starts is None:
+        return []
+
+    def value(x):
+        return None if np.isnan(x) else float(x)
+
+    rows = []
+    for i, bucket_start in enumerate(starts.astype(datetime)):
+        row = [bucket_start, int(counts[i])]
+        for aggregates in columns:
+            row += [value(aggregate[i]) for aggregate in aggregates]
+        rows.append(row)
+    return rows
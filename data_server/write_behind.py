@@ -0,0 +1,234 @@
+"""Optional write-behind queue for single-row ingest (WRITE_BEHIND=1)"""
+import math
+import queue
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import Json
+
+import metrics
+from db import PoolTimeout, get_db_connection
+
+# The database is unreachable: the batch is kept and retried, and the full queue answers 503 meanwhile
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout)
+# A row in the batch is bad: only those rows are set aside
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+# Ceiling for the wait between attempts while the database is unreachable
+MAX_BACKOFF_SECONDS = 5
+
+
+def store_dead_letter(conn, table, columns, row, error):
+    """Keep a row that could not be inserted in dead_letters (GET /api/dead), inside the caller's transaction"""
+    data = {column: None if isinstance(value, float) and math.isnan(value) else value
+            for column, value in zip(columns, row)}
+    with conn.cursor() as cur:
+        cur.execute('INSERT INTO dead_letters (target_table, row_data, error) VALUES (%s, %s, %s)',
+                    (table, Json(data), str(error)))
+
+
+class WriteBehindQueue:
+    """Optional write-behind mode for single-row ingest (WRITE_BEHIND=1).
+
+    Requests only validate and enqueue, then get a 202. One writer thread
+    collects up to ``batch_rows`` rows or waits ``flush_ms`` after the first
+    one, whichever comes first, and writes the batch in a single transaction,
+    so the commit (and its WAL flush) is paid once per batch instead of once
+    per row. With ``durability='group'`` batches also commit with
+    synchronous_commit off, letting Postgres flush several commits together;
+    a database crash can then lose the last fraction of a second of batches.
+    Connection errors (CONNECTION_ERRORS) never lose rows: the writer keeps
+    retrying with backoff until the database is back, and the queue fills up
+    so ingest answers 503 instead. A batch that fails because of a row in it
+    (ROW_ERRORS, or any other error ``retries`` times in a row) is written
+    row by row, so only the rows that fail on their own are set aside in
+    dead_letters; rows that cannot even be stored there are dropped and
+    counted. Rows still queued when the process exits are lost unless
+    ``stop`` drains them, which main.py calls at exit and on SIGTERM.
+    """
+
+    DURABILITY = ('sync', 'group')
+
+    def __init__(self, insert_rows, on_commit, maxsize=10000, batch_rows=500, flush_ms=50, durability='sync',
+                 retries=3):
+        # insert_rows(conn, table, columns, rows) inserts inside the caller's transaction and returns the rows stored;
+        # on_commit(table, columns, rows) runs the post-commit hooks
+        if durability not in self.DURABILITY:
+            raise ValueError(f"WRITE_BEHIND_DURABILITY must be one of {', '.join(self.DURABILITY)}")
+        self.insert_rows = insert_rows
+        self.on_commit = on_commit
+        self.maxsize = maxsize
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_ms / 1000
+        self.durability = durability
+        self.retries = retries
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.dead_letters = 0
+        self.last_batch_rows = 0
+        self.last_flush_ms = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def submit(self, table, columns, row):
+        """Queue one validated row; returns False if the queue is full"""
+        self.start()
+        try:
+            self._queue.put_nowait((table, columns, row))
+        except queue.Full:
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+        # Drain whatever was submitted before the stop sentinel was seen
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_rows):
+            self._flush(remaining[start:start + self.batch_rows])
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        tables = {}
+        for table, columns, row in batch:
+            tables.setdefault(table, (columns, []))[1].append(row)
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                inserted = self._until_connected(lambda: self._write(tables))
+                break
+            except ROW_ERRORS as e:
+                print(f"⚠️ Write-behind flush of {len(batch)} row(s) hit a bad row, writing rows one by one: {e}")
+                inserted = self._write_rows(tables)
+                break
+            except Exception as e:
+                print(f"⚠️ Write-behind flush of {len(batch)} row(s) failed (attempt {attempt}/{self.retries}): {e}")
+                time.sleep(min(2 ** attempt * 0.1, 2))
+        else:
+            inserted = self._write_rows(tables)
+
+        for table, rows in inserted.items():
+            if rows:
+                self.on_commit(table, tables[table][0], rows)
+        with self._lock:
+            self.written += sum(len(rows) for _, rows in tables.values())
+            self.batches += 1
+            self.last_batch_rows = len(batch)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def _until_connected(self, write):
+        """Call ``write()`` until it gets through, waiting out connection errors with capped backoff"""
+        attempt = 0
+        while True:
+            try:
+                return write()
+            except CONNECTION_ERRORS as e:
+                attempt += 1
+                if attempt == 1 or attempt % 10 == 0:
+                    print(f"⚠️ Write-behind cannot reach the database (attempt {attempt}), retrying: {e}")
+                time.sleep(min(2 ** attempt * 0.1, MAX_BACKOFF_SECONDS))
+
+    def _write(self, tables):
+        """Insert ``{table: (columns, rows)}`` in one transaction; returns the rows stored per table"""
+        with get_db_connection() as conn:
+            if self.durability == 'group':
+                with conn.cursor() as cur:
+                    cur.execute('SET LOCAL synchronous_commit TO OFF')
+            inserted = {table: self.insert_rows(conn, table, columns, rows)
+                        for table, (columns, rows) in tables.items()}
+            with metrics.DB_QUERY_SECONDS.time('commit'):
+                conn.commit()
+        return inserted
+
+    def _write_rows(self, tables):
+        """Insert a failed batch one row per transaction, setting aside the rows that fail on their own.
+
+        Failed rows are removed from ``tables`` so only stored rows count as written.
+        """
+        inserted = {}
+        for table, (columns, rows) in tables.items():
+            inserted[table] = []
+            for row in list(rows):
+                try:
+                    inserted[table] += self._until_connected(lambda: self._write({table: (columns, [row])}))[table]
+                    continue
+                except Exception as e:
+                    error = e
+                rows.remove(row)
+                try:
+                    self._until_connected(lambda: self._dead_letter(table, columns, row, error))
+                    outcome = 'dead_letter'
+                except Exception as e:
+                    print(f"⚠️ Write-behind row for {table} dropped: {error} (dead letter failed: {e})")
+                    outcome = 'dropped'
+                metrics.WRITE_BEHIND_FAILED_ROWS.inc(table, outcome)
+                with self._lock:
+                    if outcome == 'dropped':
+                        self.dropped += 1
+                    else:
+                        self.dead_letters += 1
+        return inserted
+
+    def _dead_letter(self, table, columns, row, error):
+        with get_db_connection() as conn:
+            store_dead_letter(conn, table, columns, row, error)
+            conn.commit()
+
+    def stop(self, timeout=30):
+        """Write every queued row, then stop the writer"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'capacity': self.maxsize,
+                'durability': self.durability,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'dead_letters': self.dead_letters,
+                'last_batch_rows': self.last_batch_rows,
+                'last_flush_ms': self.last_flush_ms,
+            }
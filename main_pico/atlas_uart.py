@@ -0,0 +1,142 @@
+# Incremental reader for Atlas Scientific EZO circuits on a UART.
+#
+# The circuit ends every frame with "\r": either a reading ("7.012") or a
+# response code ("*OK", "*ER", ...). In continuous mode ("C,1") it sends a
+# reading every second by itself, so poll() only picks up whatever has arrived
+# and the latest value is at hand without a request/wait round trip.
+#
+# Bytes go through a preallocated ring buffer and readings are parsed in
+# place, so polling allocates nothing but the resulting float. A frame split
+# across several polls is completed on a later one.
+#
+# Nothing here touches `machine`, so it also runs under CPython with a fake
+# UART (see host_checks.py).
+
+CR = 13
+LF = 10
+STAR = 42
+MINUS = 45
+DOT = 46
+ZERO = 48
+NINE = 57
+
+CODES = (b"*OK", b"*ER", b"*OV", b"*UV", b"*RS", b"*RE", b"*SL", b"*WA", b"*DONE")
+UNKNOWN_CODE = b"*?"
+
+
+class AtlasReader:
+    def __init__(self, uart, size=64, clock=None):
+        # uart: anything with any() and readinto(buf); write(data) for send()
+        # size: longest frame kept (readings are ~6 bytes), longer ones are dropped as overruns
+        # clock: called when a reading arrives, e.g. time.ticks_ms
+        self.uart = uart
+        self.ring = bytearray(size)
+        self.chunk = bytearray(16)
+        self.head = 0 # index of the first byte of the current frame
+        self.count = 0 # bytes of the current frame buffered so far
+        self.discarding = False # dropping the rest of an overlong frame
+        self.clock = clock
+
+        self.value = None
+        self.updated = None
+        self.readings = 0
+        self.code = None
+        self.ok = 0
+        self.errors = 0
+        self.ignored = 0
+        self.overruns = 0
+
+    def send(self, command):
+        self.uart.write(command)
+        self.uart.write(b"\r")
+
+    def poll(self):
+        # Consume everything the UART has buffered; returns the number of new readings
+        readings = self.readings
+        while self.uart.any():
+            n = self.uart.readinto(self.chunk)
+            if not n:
+                break
+            for i in range(n):
+                self._push(self.chunk[i])
+        return self.readings - readings
+
+    def _push(self, byte):
+        if byte == CR:
+            if self.discarding:
+                self.discarding = False
+            elif self.count:
+                self._frame()
+            self.head = (self.head + self.count) % len(self.ring)
+            self.count = 0
+        elif byte == LF or self.discarding:
+            pass
+        elif self.count == len(self.ring):
+            # No terminator within the buffer: drop the frame up to the next "\r"
+            self.overruns += 1
+            self.discarding = True
+            self.head = (self.head + self.count) % len(self.ring)
+            self.count = 0
+        else:
+            self.ring[(self.head + self.count) % len(self.ring)] = byte
+            self.count += 1
+
+    def _byte(self, i):
+        return self.ring[(self.head + i) % len(self.ring)]
+
+    def _frame(self):
+        if self._byte(0) == STAR:
+            self.code = UNKNOWN_CODE
+            for code in CODES:
+                if self._matches(code):
+                    self.code = code
+                    break
+            if self.code == b"*OK":
+                self.ok += 1
+            elif self.code == b"*ER":
+                self.errors += 1
+            return
+
+        value = self._number()
+        if value is None:
+            # Replies to other commands ("?I,pH,2.0", ...) and line noise
+            self.ignored += 1
+            return
+        self.value = value
+        self.readings += 1
+        if self.clock:
+            self.updated = self.clock()
+
+    def _matches(self, code):
+        if len(code) != self.count:
+            return False
+        for i in range(self.count):
+            if self._byte(i) != code[i]:
+                return False
+        return True
+
+    def _number(self):
+        # "-1.234" style decimal without building a string; None if the frame is anything else
+        i = 0
+        negative = self._byte(0) == MINUS
+        if negative:
+            i = 1
+        digits = 0
+        decimals = -1
+        mantissa = 0
+        while i < self.count:
+            byte = self._byte(i)
+            if ZERO <= byte <= NINE:
+                mantissa = mantissa * 10 + byte - ZERO
+                digits += 1
+                if decimals >= 0:
+                    decimals += 1
+            elif byte == DOT and decimals < 0:
+                decimals = 0
+            else:
+                return None
+            i += 1
+        if not digits:
+            return None
+        value = mantissa / 10 ** decimals if decimals > 0 else float(mantissa)
+        return -value if negative else value
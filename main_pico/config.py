@@ -0,0 +1,10 @@
+# Probe hardware configuration
+
+# DS18B20 ROM codes, as returned by a OneWire scan, and the temperature
+# channel each one reports as (0 = temperature_1 ... 3 = temperature_4)
+TEMPERATURE_ROMS = {
+    b'(Pl\x81\xe3j<\xd5': 0,
+    b'(\xff\xa6v\x90\x15\x03\x9f': 1,
+    b'(.oI\xf6b<<': 2,
+    b'(h\x8du@$\x0b\x99': 3,
+}
@@ -0,0 +1,174 @@
+# Checks for the hardware-independent parts of the main probe, run on a
+# computer with CPython (not on the Pico):
+#
+#   python main_pico/host_checks.py
+
+import asyncio
+import time
+
+from structs import Sensor, IntentionalUndefined
+from scheduler import Scheduler
+from atlas_uart import AtlasReader
+
+
+class FakeSensor(Sensor):
+    def __init__(self, id, value, delay=0.0):
+        super().__init__(id)
+        self.value = value
+        self.delay = delay
+
+    async def read_async(self):
+        await asyncio.sleep(self.delay)
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+class TwoPhaseSensor(Sensor):
+    # Like Temperature: start() begins a conversion, read_async waits out the rest of it
+    def __init__(self, id, conversion):
+        super().__init__(id)
+        self.conversion = conversion
+        self.ready_at = None
+        self.starts = 0
+
+    def start(self):
+        self.starts += 1
+        self.ready_at = time.monotonic() + self.conversion
+
+    async def read_async(self):
+        if self.ready_at is None:
+            self.start()
+        await asyncio.sleep(max(0, self.ready_at - time.monotonic()))
+        self.ready_at = None
+        return (20.0, 21.0, -1.0, 23.0)
+
+
+class BlockingSensor(Sensor):
+    # Uses the default read_async, which calls read()
+    def read(self):
+        return 4.2
+
+
+class FakeUART:
+    # Hands out the queued bytes in the given fragments, at most len(buf) per readinto()
+    def __init__(self, *fragments):
+        self.fragments = [bytes(fragment) for fragment in fragments]
+        self.written = b""
+
+    def feed(self, *fragments):
+        self.fragments += [bytes(fragment) for fragment in fragments]
+
+    def any(self):
+        return sum(len(fragment) for fragment in self.fragments)
+
+    def readinto(self, buf):
+        if not self.fragments:
+            return None
+        fragment = self.fragments.pop(0)
+        n = min(len(buf), len(fragment))
+        buf[:n] = fragment[:n]
+        if n < len(fragment):
+            self.fragments.insert(0, fragment[n:])
+        return n
+
+    def write(self, data):
+        self.written += data.encode() if isinstance(data, str) else data
+
+
+def check(name, condition, detail=""):
+    if not condition:
+        raise AssertionError(f"{name} {detail}")
+    print(f"  ✓ {name}")
+
+
+async def check_scheduler():
+    errors = []
+    sent = {"sd": [], "lora": []}
+
+    async def slow_lora(item):
+        await asyncio.sleep(0.2)
+        sent["lora"].append(item)
+
+    def broken_ble(item):
+        raise OSError("not connected")
+
+    sensors = [
+        FakeSensor("PH", 7.0, delay=0.3),
+        TwoPhaseSensor("TEMPERATURE", 0.25),
+        FakeSensor("TDS", ValueError("adc"), delay=0.1),
+        FakeSensor("STATUS_LED", IntentionalUndefined),
+        BlockingSensor("BATTERY_VOLTAGE"),
+    ]
+    scheduler = Scheduler(sensors, {
+        "sd": (sent["sd"].append, 16),
+        "ble": (broken_ble, 1),
+        "lora": (slow_lora, 2),
+    }, lambda name, err: errors.append((name, type(err).__name__)))
+    scheduler.start()
+
+    started = time.monotonic()
+    data = await scheduler.read()
+    elapsed = time.monotonic() - started
+    check("reads overlap (cycle takes the slowest sensor)", 0.3 <= elapsed < 0.4, f"took {elapsed:.2f}s")
+    check("values keyed by sensor id", data["PH"] == 7.0 and data["BATTERY_VOLTAGE"] == 4.2)
+    check("two-phase sensor started once per cycle", sensors[1].starts == 1 and data["TEMPERATURE"][3] == 23.0)
+    check("failed sensor reads as -9", data["TDS"] == "-9")
+    check("undefined sensor is left out", "STATUS_LED" not in data)
+    check("sensor error reported", ("TDS", "ValueError") in errors)
+
+    started = time.monotonic()
+    for i in range(5):
+        scheduler.emit("sd", f"line {i}")
+        scheduler.emit("ble", f"frame {i}")
+        scheduler.emit("lora", f"packet {i}")
+    check("emit does not wait for outputs", time.monotonic() - started < 0.05)
+    await scheduler.flush()
+    check("sd lines written in order", sent["sd"] == [f"line {i}" for i in range(5)])
+    check("full outbox keeps the newest items", sent["lora"] == ["packet 3", "packet 4"], str(sent["lora"]))
+    check("dropped items counted", scheduler.outboxes["lora"].dropped == 3)
+    check("failing output reported and kept running", errors.count(("ble", "OSError")) == 1)
+    scheduler.emit("ble", "again")
+    await scheduler.flush()
+    check("output task survives errors", errors.count(("ble", "OSError")) == 2)
+    scheduler.stop()
+
+
+def check_atlas_reader():
+    uart = FakeUART(b"7.0")
+    reader = AtlasReader(uart, clock=lambda: 1234)
+    reader.send("C,1")
+    check("command terminated with \\r", uart.written == b"C,1\r")
+    check("partial frame held back", reader.poll() == 0 and reader.value is None)
+    uart.feed(b"12", b"\r*O", b"K\r")
+    check("frame completed on a later poll", reader.poll() == 1 and reader.value == 7.012, str(reader.value))
+    check("reading timestamped", reader.updated == 1234)
+    check("*OK code detected", reader.ok == 1 and reader.code == b"*OK")
+
+    uart.feed(b"7.01\r7.0", b"2\r6.99\r")
+    check("several frames in one poll keep the latest", reader.poll() == 3 and reader.value == 6.99)
+
+    uart.feed(b"*ER\r-0.5\r?I,pH,2.0\r*WA\r\n")
+    reader.poll()
+    check("*ER counted", reader.errors == 1)
+    check("negative reading parsed", reader.value == -0.5)
+    check("other replies ignored", reader.ignored == 1 and reader.code == b"*WA")
+
+    # Frames wrapping around a small ring, arriving 3 bytes at a time
+    reader = AtlasReader(FakeUART(), size=8)
+    stream = b"".join(f"{v / 100:.2f}\r".encode() for v in range(700, 760))
+    for i in range(0, len(stream), 3):
+        reader.uart.feed(stream[i:i + 3])
+        reader.poll()
+    check("frames wrapping the ring parse", reader.readings == 60 and reader.value == 7.59, str(reader.value))
+
+    reader.uart.feed(b"0123456789ABCDEF", b"GH\r8.25\r")
+    reader.poll()
+    check("overlong frame dropped up to the next \\r", reader.overruns == 1 and reader.value == 8.25 and reader.ignored == 0)
+
+
+if __name__ == "__main__":
+    print("scheduler")
+    asyncio.run(check_scheduler())
+    print("atlas reader")
+    check_atlas_reader()
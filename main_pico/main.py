@@ -1,5 +1,7 @@
 import bluetooth, math, time, json, uos, os, sdcard, ds1307
-from structs import Sensor, ProbeID, SensorID, LogFormat, IntentionalUndefined
+import uasyncio as asyncio
+from structs import Sensor, ProbeID, SensorID, LogFormat
+from scheduler import Scheduler
 from btlib.ble_simple_peripheral import BLESimplePeripheral
 from machine import I2C, Pin, RTC
 import machine
@@ -7,10 +9,13 @@ from rfm9x import RFM9x
 # from sensors.main.led import StatusLED
 from sensors.main.battery import Battery
 from sensors.main.temperature import Temperature
-# from sensors.main.turbidity import Turbidity
+from sensors.main.turbidity import Turbidity
 from sensors.main.ph import pH
 from sensors.main.tds import TDS
 
+# write_sd yields to the other tasks after each piece of this size
+SD_CHUNK_BYTES = 128
+
 
 class Probe:
     def __init__(self, id):
@@ -22,9 +27,9 @@ class Probe:
         # self.sensors[SensorID.status_led] = StatusLED()
         self.sensors[SensorID.voltage] = Battery()
         self.sensors[SensorID.temperature] = Temperature()
-        # self.sensors[SensorID.turbidity] = Turbidity()
+        self.sensors[SensorID.turbidity] = Turbidity()
         self.sensors[SensorID.ph] = pH()
-        self.sensors[SensorID.tds] = TDS()
+        self.sensors[SensorID.tds] = TDS(self.sensors[SensorID.temperature])
 
         # Connect to Bluetooth
         ble = bluetooth.BLE()
@@ -61,44 +66,56 @@ class Probe:
         # Setup GP19 as input pin for signal reading
         self.water_signal_pin = machine.Pin(19, machine.Pin.IN)
 
+        # Sensors are read concurrently; SD, BLE and LoRa each send from their own task
+        self.scheduler = Scheduler(self.sensors.values(), {
+            "sd": (self.write_sd, 16),
+            "ble": (self.ble_sp.send, 1), # Only the newest BLE frame is worth sending
+            "lora": (self.send_lora, 4),
+        }, self.report_error)
+
         self.init()
         print(f"{LogFormat.Foreground.ORANGE}↓ {LogFormat.RESET}Data intake loop is about to start...")
         time.sleep(5)
-                
+
+        asyncio.run(self.run())
+
+    async def run(self):
+        self.scheduler.start()
         while True:
-            data = self.read_loop()
+            data = await self.read_loop()
             self.save_data(data)
             
-            def check_scheduled_reboot():
+            async def check_scheduled_reboot():
                 if self.rtc.datetime()[3] == 23 and self.rtc.datetime()[4] == 54 and self.rtc.datetime()[5] >= 45 and self.rtc.datetime()[5] <= 59:
                     print(LogFormat.Foreground.RED + "About to perform scheduled reboot...")
                     self.save_data(data, -10) # -10 is code for about to run a scheduled reboot
+                    await self.scheduler.flush()
                     machine.reset()
             
             if self.iterations >= 20:
                 # Scheduled reboot
-                check_scheduled_reboot()
+                await check_scheduled_reboot()
                 
                 # Custom: sleep time dynamic to battery percentage
                 if data[SensorID.voltage] >= 90.0:  # 90% battery
                     for i in range(60):
                         self.save_data(data, 60 - i)
-                        check_scheduled_reboot()
-                        time.sleep(1)
+                        await check_scheduled_reboot()
+                        await asyncio.sleep(1)
                 elif data[SensorID.voltage] >= 80.0:  # 80% battery
                     for i in range(90):
                         self.save_data(data, 90 - i)
-                        check_scheduled_reboot()
-                        time.sleep(1)
+                        await check_scheduled_reboot()
+                        await asyncio.sleep(1)
                 else:  # Low battery
                     for i in range(150):
                         self.save_data(data, 150 - i)
-                        check_scheduled_reboot()
-                        time.sleep(1)
+                        await check_scheduled_reboot()
+                        await asyncio.sleep(1)
             else:
                 for i in range(10):
                    self.save_data(data, 10 - i)
-                   time.sleep(1)
+                   await asyncio.sleep(1)
     
     def init(self):
         time.sleep(10)
@@ -113,34 +130,50 @@ class Probe:
                 print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}Accessory {LogFormat.Foreground.LIGHT_GREY}{sensor.id}{LogFormat.RESET} has errored during initialization:")
                 print(result)
 
-    def read_loop(self):
-        data = {}        
-        for sensor in list(self.sensors.values()):
-            value = sensor.read()
-            if not isinstance(value, Exception):
-                # Succeeded
-                if value != IntentionalUndefined:
-                    data[sensor.id] = value
-            else:
-                # Errored
-                data[sensor.id] = "-9"
-                print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}Sensor {LogFormat.Foreground.LIGHT_GREY}{sensor.id}{LogFormat.RESET} has errored during runtime:")
-                print(LogFormat.Foreground.DARK_GREY + "  > " + str(value))
-        
+    async def read_loop(self):
+        data = await self.scheduler.read()
         self.iterations += 1
         return data
 
+    def report_error(self, name, err):
+        if name in self.sensors:
+            print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}Sensor {LogFormat.Foreground.LIGHT_GREY}{name}{LogFormat.RESET} has errored during runtime:")
+            print(LogFormat.Foreground.DARK_GREY + "  > " + str(err))
+        else:
+            print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}Output {LogFormat.Foreground.LIGHT_GREY}{name}{LogFormat.RESET} failed: {err}")
+
+    async def write_sd(self, line):
+        # Written in SD_CHUNK_BYTES pieces, yielding in between so sensor reads and the other outputs keep running;
+        # the flush on close (one block write) still blocks briefly
+        with open("/sd/data.txt", "a") as file:
+            for start in range(0, len(line), SD_CHUNK_BYTES):
+                file.write(line[start:start + SD_CHUNK_BYTES])
+                await asyncio.sleep_ms(0)
+
+    async def send_lora(self, payload):
+        try:
+            # Use the new simple send_text API with GP19 state appended; waits for TX done without blocking the loop
+            await self.lora.send_text_async(payload)
+        except TimeoutError:
+            print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}LoRa transmission timed out")
+        except Exception as e:
+            print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}LoRa transmission failed: {e}")
+
+    def temperature_fields(self, temperatures):
+        # Four payload fields; a failed read ("-9") fills all four so the packet keeps its layout
+        if isinstance(temperatures, tuple):
+            return ";".join([str(t) for t in temperatures])
+        return ";".join([str(temperatures)] * 4)
+
     def save_data(self, data, refresh_countdown = 0):
         cur_time = self.rtc.datetime() #Sometimes wants ()(), if getting tuple error reduce to ()
 
         # Save to SD card
         data["_ITERATIONS"] = self.iterations
-        data[SensorID.turbidity] = -5 # TEMP/TODO
         if refresh_countdown != 0:
             data["_REFRESH_COUNTDOWN"] = refresh_countdown
         else:
-            with open("/sd/data.txt", "a") as file:
-                file.write(f"{cur_time}: {data}\n")
+            self.scheduler.emit("sd", f"{cur_time}: {data}\n")
 
         # Read GP19 signal state
         water_signal_state = bool(self.water_signal_pin.value())
@@ -151,7 +184,7 @@ class Probe:
             str(self.iterations),
             "/".join(list(map(lambda x: str(x), list(cur_time)))),
             str(data[SensorID.voltage]),
-            data[SensorID.temperature].replace(",", ";"),
+            self.temperature_fields(data[SensorID.temperature]),
             str(data[SensorID.ph]),
             str(data[SensorID.tds]),
             str(data[SensorID.turbidity]),
@@ -163,17 +196,11 @@ class Probe:
 
         # Send over BLE
         if self.ble_sp.is_connected():
-            self.ble_sp.send(ble_payload)
+            self.scheduler.emit("ble", ble_payload)
         
         # Send over LoRa
         if self.lora is not None and refresh_countdown == 0:
-            try:
-                # Use the new simple send_text API with GP19 state appended
-                self.lora.send_text(lora_payload)
-            except TimeoutError:
-                print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}LoRa transmission timed out")
-            except Exception as e:
-                print(f"{LogFormat.Foreground.RED}X {LogFormat.RESET}LoRa transmission failed: {e}")
+            self.scheduler.emit("lora", lora_payload)
 
         # Print for debugging
         print()
@@ -22,6 +22,7 @@ Example (Raspberry Pi Pico):
 from micropython import const
 from machine import Pin, SPI
 import time
+import uasyncio as asyncio
 from typing import Union
 
 # ---------------------------------------------------------------------------
@@ -47,6 +48,7 @@ _OPMODE_STDBY    = const(0x01)
 _OPMODE_TX       = const(0x03)
 
 _IRQ_TX_DONE = const(0x08)      # Bit 3 of _REG_IRQ_FLAGS
+_TX_POLL_MS  = const(5)         # send_text_async: TxDone poll interval
 
 # Frequency helper constants
 _FXOSC  = 32_000_000            # Crystal oscillator frequency (Hz)
@@ -105,6 +107,29 @@ class RFM9x:
     # ------------------------------------------------------------------
     def send_text(self, text: Union[str, bytes]) -> None:
         """Send *text* (str / bytes) over LoRa. Blocks until TX done."""
+        self._start_tx(text)
+
+        # Wait for TxDone or timeout.
+        start = time.ticks_ms()
+        while (self._read_reg(_REG_IRQ_FLAGS) & _IRQ_TX_DONE) == 0:
+            if time.ticks_diff(time.ticks_ms(), start) > self.timeout_ms:
+                raise TimeoutError("LoRa transmit timeout")
+        # Clear all IRQ flags.
+        self._write_reg(_REG_IRQ_FLAGS, 0xFF)
+
+    async def send_text_async(self, text: Union[str, bytes]) -> None:
+        """Like send_text, but yields to the uasyncio loop while the packet is on air."""
+        self._start_tx(text)
+
+        # Poll TxDone between sleeps; a packet takes tens of ms on air at SF7.
+        start = time.ticks_ms()
+        while (self._read_reg(_REG_IRQ_FLAGS) & _IRQ_TX_DONE) == 0:
+            if time.ticks_diff(time.ticks_ms(), start) > self.timeout_ms:
+                raise TimeoutError("LoRa transmit timeout")
+            await asyncio.sleep_ms(_TX_POLL_MS)
+        self._write_reg(_REG_IRQ_FLAGS, 0xFF)
+
+    def _start_tx(self, text: Union[str, bytes]) -> None:
         if isinstance(text, str):
             data = text.encode()
         else:
@@ -128,14 +153,6 @@ class RFM9x:
         # Start transmission.
         self._write_reg(_REG_OP_MODE, _LONG_RANGE_MODE | _OPMODE_TX)
 
-        # Wait for TxDone or timeout.
-        start = time.ticks_ms()
-        while (self._read_reg(_REG_IRQ_FLAGS) & _IRQ_TX_DONE) == 0:
-            if time.ticks_diff(time.ticks_ms(), start) > self.timeout_ms:
-                raise TimeoutError("LoRa transmit timeout")
-        # Clear all IRQ flags.
-        self._write_reg(_REG_IRQ_FLAGS, 0xFF)
-
     # ------------------------------------------------------------------
     # Helpers – frequency & power
     # ------------------------------------------------------------------
@@ -0,0 +1,123 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio  # CPython, for host_checks.py
+
+from structs import IntentionalUndefined
+
+
+# Cooperative scheduling for the acquisition cycle.
+#
+# All sensor reads of a cycle are started together, so the slow ones (the
+# DS18B20 conversion) wait concurrently and a cycle takes as long as the
+# slowest sensor instead of the sum of all of them.
+# Outputs (SD card, BLE, LoRa) each drain their own Outbox in a separate task,
+# so a slow write or transmission never holds up the next reading.
+#
+# Nothing here touches `machine`, so it also runs under CPython asyncio with
+# fake sensors (see host_checks.py).
+
+
+class Outbox:
+    # FIFO between the cycle and one output task (MicroPython's asyncio has no Queue).
+    # Holds at most `limit` items; when full the oldest is dropped and counted.
+    def __init__(self, limit=8):
+        self.limit = limit
+        self.items = []
+        self.event = asyncio.Event()
+        self.busy = False
+        self.dropped = 0
+
+    def put(self, item):
+        if len(self.items) >= self.limit:
+            self.items.pop(0)
+            self.dropped += 1
+        self.items.append(item)
+        self.event.set()
+
+    async def get(self):
+        while not self.items:
+            self.event.clear()
+            await self.event.wait()
+        return self.items.pop(0)
+
+    def idle(self):
+        return not self.items and not self.busy
+
+
+async def read_sensor(sensor):
+    try:
+        return await sensor.read_async()
+    except Exception as err:
+        return err
+
+
+class Scheduler:
+    def __init__(self, sensors, outputs, on_error=None):
+        # sensors: iterable of Sensor
+        # outputs: {name: (send, limit)}; send(item) may be a plain function or a coroutine function
+        # on_error(name, err): called when a sensor read returns/raises an exception (name = sensor id)
+        # or an output fails (name = output name)
+        self.sensors = list(sensors)
+        self.senders = {}
+        self.outboxes = {}
+        for name, (send, limit) in outputs.items():
+            self.senders[name] = send
+            self.outboxes[name] = Outbox(limit)
+        self.on_error = on_error
+        self.tasks = []
+
+    def start(self):
+        for name in self.outboxes:
+            self.tasks.append(asyncio.create_task(self._drain(name)))
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    async def _drain(self, name):
+        outbox = self.outboxes[name]
+        send = self.senders[name]
+        while True:
+            item = await outbox.get()
+            outbox.busy = True
+            try:
+                result = send(item)
+                if hasattr(result, "send"):
+                    # Coroutine (a generator on MicroPython)
+                    await result
+            except Exception as err:
+                if self.on_error:
+                    self.on_error(name, err)
+            finally:
+                outbox.busy = False
+
+    async def read(self):
+        # Read every sensor concurrently; errors become "-9" like the blocking loop did.
+        # Two-phase sensors (Temperature) start converting first, so their wait overlaps everything else.
+        for sensor in self.sensors:
+            try:
+                sensor.start()
+            except Exception:
+                pass # read_async starts it again and reports the error
+        values = await asyncio.gather(*[read_sensor(sensor) for sensor in self.sensors])
+        data = {}
+        for sensor, value in zip(self.sensors, values):
+            if isinstance(value, Exception):
+                data[sensor.id] = "-9"
+                if self.on_error:
+                    self.on_error(sensor.id, value)
+            elif value != IntentionalUndefined:
+                data[sensor.id] = value
+        return data
+
+    def emit(self, name, item):
+        self.outboxes[name].put(item)
+
+    async def flush(self, timeout=10):
+        # Wait until every output has sent what was queued (e.g. before machine.reset())
+        waited = 0
+        while not all(outbox.idle() for outbox in self.outboxes.values()) and waited < timeout:
+            await asyncio.sleep(0.01)
+            waited += 0.01
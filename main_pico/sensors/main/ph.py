@@ -1,6 +1,13 @@
 import machine
 from structs import Sensor, SensorID, IntentionalNull
+from atlas_uart import AtlasReader
 import time
+import uasyncio as asyncio
+
+# Continuous mode sends a reading every second; older than this and the circuit has stopped (or been reset)
+STALE_MS = 3000
+# How long read_async waits for the first reading after init
+FIRST_READING_MS = 1500
 
 class pH(Sensor):
     def __init__(self):
@@ -8,20 +15,32 @@ class pH(Sensor):
 
     def init(self):
         try:
-            self.uart = machine.UART(1, baudrate=9600, tx=machine.Pin(8), rx=machine.Pin(9))
-            self.uart.init(bits=8, parity=None, stop=1)
-            # self.uart.write(b"*IDN?\n")
+            # rxbuf holds a whole countdown's worth of readings (~7 bytes/s for up to 150 s) between reads
+            self.uart = machine.UART(1, baudrate=9600, bits=8, parity=None, stop=1, tx=machine.Pin(8), rx=machine.Pin(9), rxbuf=2048)
+            self.reader = AtlasReader(self.uart, clock=time.ticks_ms)
+            self.reader.send("C,1")
             return True
         except Exception as err:
             return err
-    
+
     def read(self):
         try:
-            self.uart.write("R\r")
-            time.sleep(1)
-            if self.uart.any():
-                return float(str(self.uart.read())[2:].split("\\")[0])
-            else:
+            self.reader.poll()
+            if self.reader.value is None:
                 return IntentionalNull
+            if time.ticks_diff(time.ticks_ms(), self.reader.updated) > STALE_MS:
+                # Turn continuous mode back on in case the circuit was reset; fresh readings resume next cycle
+                self.reader.send("C,1")
+                return IntentionalNull
+            return self.reader.value
         except Exception as err:
             return err
+
+    async def read_async(self):
+        # Only waits when there is no reading yet (right after init); afterwards the latest one is returned at once
+        waited = 0
+        while self.reader.value is None and waited < FIRST_READING_MS:
+            self.reader.poll()
+            await asyncio.sleep_ms(50)
+            waited += 50
+        return self.read()
@@ -1,26 +1,76 @@
-from machine import ADC, Pin
+from machine import ADC, Pin, Timer
+from array import array
 from structs import Sensor, SensorID
 
+# The ADC is sampled by a hardware timer into a ring buffer and read() takes the
+# median of the last SAMPLES readings (1.2 s), which rejects the spikes a
+# single sample per cycle used to pass straight through
+SAMPLE_MS = 40
+SAMPLES = 30
+# Compensation temperature used until, and whenever, no valid reading is available
+DEFAULT_TEMPERATURE = 25.0
+
 
 class TDS(Sensor):
-    def __init__(self):
+    def __init__(self, temperature=None):
         super().__init__(SensorID.tds)
         self.pin = 27
         self.VREF = 3.3
-        self.temperature = 25.0
+        # Temperature sensor whose latest reading compensates the conductivity; DEFAULT_TEMPERATURE without one
+        self.temperature_sensor = temperature
+        self.temperature = DEFAULT_TEMPERATURE
+        self.samples = array("H", [0] * SAMPLES)
+        self.scratch = array("H", [0] * SAMPLES)
+        self.index = 0
+        self.count = 0
+        self.timer = None
 
     def init(self):
         try:
             self.adc = ADC(Pin(self.pin))
+            self._sample(None)
+            if self.timer is None:
+                self.timer = Timer(period=SAMPLE_MS, mode=Timer.PERIODIC, callback=self._sample)
             self.read()
             return True
         except Exception as err:
             return err
 
-    def _read_raw_10bit(self) -> int:
-        return self.adc.read_u16() >> 6
+    def _sample(self, timer):
+        # Timer callback: stores one 10-bit reading, allocates nothing
+        self.samples[self.index] = self.adc.read_u16() >> 6
+        self.index = (self.index + 1) % SAMPLES
+        if self.count < SAMPLES:
+            self.count += 1
+
+    def _median(self) -> float:
+        # Insertion sort into the preallocated scratch array rather than sorted(), which would allocate a list every cycle.
+        # Until the ring has filled, the samples taken so far are at the start of it.
+        count = self.count
+        samples = self.samples
+        scratch = self.scratch
+        for i in range(count):
+            value = samples[i]
+            j = i - 1
+            while j >= 0 and scratch[j] > value:
+                scratch[j + 1] = scratch[j]
+                j -= 1
+            scratch[j + 1] = value
+        middle = count // 2
+        if count % 2:
+            return float(scratch[middle])
+        return (scratch[middle - 1] + scratch[middle]) / 2
+
+    def _update_temperature(self):
+        # The scheduler reads every sensor of a cycle concurrently, so this is the mean from the previous cycle's
+        # collect(): compensation lags the temperature by one cycle. mean() leaves out channels reading -1.0 (no
+        # sensor) or 85.0 (DS18B20 power-on value); with none left, DEFAULT_TEMPERATURE is used rather than a stale value.
+        temperature = None
+        if self.temperature_sensor is not None:
+            temperature = self.temperature_sensor.mean()
+        self.temperature = DEFAULT_TEMPERATURE if temperature is None else temperature
 
-    def _convert_to_tds(self, raw: int) -> float:
+    def _convert_to_tds(self, raw: float) -> float:
         voltage = raw * self.VREF / 1024.0
         comp_coeff = 1.0 + 0.02 * (self.temperature - 25.0)
         comp_voltage = voltage / comp_coeff
@@ -34,8 +84,8 @@ class TDS(Sensor):
 
     def read(self):
         try:
-            raw = self._read_raw_10bit()
-            ppm = self._convert_to_tds(raw)
+            self._update_temperature()
+            ppm = self._convert_to_tds(self._median())
             return float(f"{ppm:.2f}")
         except Exception as err:
             return err
@@ -43,7 +93,8 @@ class TDS(Sensor):
 
 if __name__ == "__main__":
     tds = TDS()
-    if tds.init() is True:
+    result = tds.init()
+    if result is True:
         print(f"TDS value: {tds.read()} ppm")
     else:
-        print("TDS initialisation failed:", tds.init())
+        print("TDS initialisation failed:", result)
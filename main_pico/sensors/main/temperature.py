@@ -1,11 +1,22 @@
-import machine, ds18x20, onewire
+import machine, ds18x20, onewire, time
+import uasyncio as asyncio
 from structs import Sensor, SensorID
+from config import TEMPERATURE_ROMS
+
+# DS18B20 conversion time at 12-bit resolution
+CONVERSION_MS = 750
+CHANNELS = 4
+# Placeholder for a channel without a sensor, and the DS18B20 power-on register value (no conversion has completed)
+NO_SENSOR = -1.0
+POWER_ON_RESET = 85.0
 
 
 class Temperature(Sensor):
     def __init__(self):
         super().__init__(SensorID.temperature)
         self.pin = machine.Pin(13)
+        self.values = [NO_SENSOR] * CHANNELS
+        self.ready_at = None
 
     def init(self):
         try:
@@ -13,29 +24,56 @@ class Temperature(Sensor):
             self.roms = self.sensor.scan()
             if len(self.roms) != 4:
                 raise Exception("Could not find one or more configured temperature sensor.")
+            # (rom, channel) for every scanned sensor listed in config.TEMPERATURE_ROMS
+            self.channels = [(rom, TEMPERATURE_ROMS[bytes(rom)]) for rom in self.roms if bytes(rom) in TEMPERATURE_ROMS]
             self.read()
             return True
         except Exception as err:
             return err
-    
+
+    def start(self):
+        # Begin a conversion on every sensor on the bus; collect() reads the results
+        self.sensor.convert_temp()
+        self.ready_at = time.ticks_add(time.ticks_ms(), CONVERSION_MS)
+
+    def remaining_ms(self):
+        return max(0, time.ticks_diff(self.ready_at, time.ticks_ms()))
+
+    def collect(self):
+        # (temperature_1, ..., temperature_4); -1.0 for a channel without a sensor
+        values = self.values
+        for channel in range(CHANNELS):
+            values[channel] = NO_SENSOR
+        for rom, channel in self.channels:
+            values[channel] = round(self.sensor.read_temp(rom), 2)
+        self.ready_at = None
+        return tuple(values)
+
+    def mean(self):
+        # Mean of the valid channels read by the last collect(); None before the first one or if none is valid (TDS compensation)
+        total = 0.0
+        count = 0
+        for value in self.values:
+            if value != NO_SENSOR and value != POWER_ON_RESET:
+                total += value
+                count += 1
+        return total / count if count else None
+
     def read(self):
         try:
-            # Initialize all temperature variables to a default value
-            temp1 = temp2 = temp3 = temp4 = -1.0
-            
-            self.sensor.convert_temp()
-            for rom in self.roms:
-                if rom == bytearray(b'(Pl\x81\xe3j<\xd5'):
-                    temp1 = round(self.sensor.read_temp(rom), 2)
-                elif rom == bytearray(b'(\xff\xa6v\x90\x15\x03\x9f'):
-                    temp2 = round(self.sensor.read_temp(rom), 2)
-                elif rom == bytearray(b'(.oI\xf6b<<'):
-                    temp3 = round(self.sensor.read_temp(rom), 2)
-                elif rom == bytearray(b'(h\x8du@$\x0b\x99'):
-                    temp4 = round(self.sensor.read_temp(rom), 2)
-            return f"{temp1},{temp2},{temp3},{temp4}"
+            self.start()
+            time.sleep_ms(self.remaining_ms())
+            return self.collect()
         except Exception as err:
             return err
 
-
-
+    async def read_async(self):
+        # The scheduler calls start() at the beginning of the cycle, so this
+        # only waits for whatever is left of the conversion
+        try:
+            if self.ready_at is None:
+                self.start()
+            await asyncio.sleep_ms(self.remaining_ms())
+            return self.collect()
+        except Exception as err:
+            return err
@@ -1,9 +1,25 @@
 import machine, time
+import uasyncio as asyncio
+from rp2 import StateMachine, asm_pio
 from structs import Sensor, SensorID
 
-# failsafe
-import micropython
-micropython.alloc_emergency_exception_buf(100)
+# Each TSL light-to-frequency output is counted by its own PIO state machine, so
+# no pulse costs an interrupt and counts stay exact at high frequencies. PIO0
+# only: the Pico W's wireless chip driver uses PIO1.
+STATE_MACHINES = (0, 1)
+# Time for the TSL outputs to follow an LED change before a window is counted
+SETTLE_MS = 50
+# Counting window for each of the dark and light phases
+WINDOW_MS = 250
+
+
+# Counts rising edges by decrementing X; read with mov(isr, x) + push
+@asm_pio()
+def edge_counter():
+    label("loop")
+    wait(0, pin, 0)
+    wait(1, pin, 0)
+    jmp(x_dec, "loop")
 
 
 class Turbidity(Sensor):
@@ -12,72 +28,78 @@ class Turbidity(Sensor):
         self.trigger_pin1 = machine.Pin(22, machine.Pin.IN, machine.Pin.PULL_UP)
         self.trigger_pin2 = machine.Pin(21, machine.Pin.IN, machine.Pin.PULL_UP)
         self.led = machine.Pin(15, machine.Pin.OUT)
-        self.pulses_list = []
-        self.total_list = []
-        self.pulses_average = 0
-        self.total = 0
-        self.count = 0
-        self.darks = False
-        self.lights = False
-    
-    def TriggerCount(self, pin):
-        try:
-            self.count += 1
-        except Exception as err:
-            print(err)
+        self.machines = []
+        self.counts = [0, 0]
 
     def init(self):
         try:
-            self.trigger_pin1.irq(trigger=machine.Pin.IRQ_RISING, handler=self.TriggerCount)
-            self.trigger_pin2.irq(trigger=machine.Pin.IRQ_RISING, handler=self.TriggerCount)
+            self.machines = []
+            for sm_id, pin in zip(STATE_MACHINES, (self.trigger_pin1, self.trigger_pin2)):
+                sm = StateMachine(sm_id, edge_counter, in_base=pin)
+                sm.exec("set(x, 0)")
+                sm.active(1)
+                self.machines.append(sm)
+            self.led.value(0)
             return True
         except Exception as err:
             return err
-    
+
+    def _snapshot(self):
+        # Current edge count of each channel, in self.counts
+        for i, sm in enumerate(self.machines):
+            sm.exec("mov(isr, x)")
+            sm.exec("push()")
+            self.counts[i] = -sm.get() & 0xFFFFFFFF
+
+    def _open_window(self):
+        self._snapshot()
+        return tuple(self.counts), time.ticks_ms()
+
+    def _close_window(self, window):
+        # Mean pulses per second of both channels over the window (counts wrap at 32 bits)
+        start, started_ms = window
+        self._snapshot()
+        total = 0
+        for i in range(len(self.machines)):
+            total += (self.counts[i] - start[i]) & 0xFFFFFFFF
+        return total * 1000 / max(1, time.ticks_diff(time.ticks_ms(), started_ms)) / len(self.machines)
+
     def read(self):
+        # Net light (LED on minus LED off) in pulses per second, mean of both sensors
+        try:
+            self.led.value(0)
+            time.sleep_ms(SETTLE_MS)
+            window = self._open_window()
+            time.sleep_ms(WINDOW_MS)
+            dark = self._close_window(window)
+
+            self.led.value(1)
+            time.sleep_ms(SETTLE_MS)
+            window = self._open_window()
+            time.sleep_ms(WINDOW_MS)
+            light = self._close_window(window)
+            self.led.value(0)
+            return round(light - dark, 1)
+        except Exception as err:
+            self.led.value(0)
+            return err
+
+    async def read_async(self):
+        # Same phases as read(), awaiting the settle and counting windows so the rest of the cycle runs meanwhile
         try:
-            self.count = 0
-            iterations = 0
-            darks_total = 0
-            lights_total = 0
-            darks_list = []
-            lights_list = []
-            
-            while self.darks == False:
-                print("while 1")
-                self.count = 0
-                time.sleep(.1)
-                self.led.value(0)
-                darks_list.append(self.count)
-                iterations += 1
-                if iterations == 5:
-                    self.darks = True
-                    for i in range(0, len(darks_list)):
-                        print("while 1.1")
-                        darks_total += darks_list[i]
-                    darks_average = round(darks_total/len(darks_list))
+            self.led.value(0)
+            await asyncio.sleep_ms(SETTLE_MS)
+            window = self._open_window()
+            await asyncio.sleep_ms(WINDOW_MS)
+            dark = self._close_window(window)
 
-                
-            while self.lights == False:
-                print("while 2")
-                self.count = 0
-                time.sleep(.1)
-                self.led.value(1)
-                lights_list.append(self.count)
-                iterations += 1
-                if iterations == 10:
-                    self.lights = True
-                    for i in range(0, len(lights_list)):
-                        print("while 2.1")
-                        lights_total += lights_list[i]
-                    lights_average = round(lights_total/len(lights_list))
-                        
-            turbidity_range = lights_average - darks_average
-            turbidity_avg = (lights_average + darks_average) / 2
-            
-            self.lights = False
-            self.darks = False
-            
-            return turbidity_avg
+            self.led.value(1)
+            await asyncio.sleep_ms(SETTLE_MS)
+            window = self._open_window()
+            await asyncio.sleep_ms(WINDOW_MS)
+            light = self._close_window(window)
+            self.led.value(0)
+            return round(light - dark, 1)
         except Exception as err:
+            self.led.value(0)
             return err
@@ -26,6 +26,14 @@ class Sensor:
     def read(self):
         pass
 
+    def start(self):
+        # Two-phase sensors begin a measurement here at the start of each cycle
+        pass
+
+    async def read_async(self):
+        # Sensors that wait on hardware override this to await instead of sleeping
+        return self.read()
+
 
 ProbeID = enum(main="MAIN", wake="WAKE", demo="DEMO")
 
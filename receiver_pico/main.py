@@ -424,7 +424,11 @@ class LoRaGateway:
                 "battery_level": data["battery"],
                 "tds": data["tds"] if data["tds"] != -1.0 else 0,
                 "turbidity": data["turbidity"] if data["turbidity"] != -1.0 else 0,
-                "water_detected": data["water_detected"] if data["water_detected"] else False
+                "water_detected": data["water_detected"] if data["water_detected"] else False,
+                # Dedupe key: the server drops retransmits and replays it has already stored
+                "probe_id": data["probe_id"],
+                "iterations": data["iterations"],
+                "device_timestamp": data["timestamp"]
             }
             
             headers = {
@@ -435,7 +439,7 @@ class LoRaGateway:
             url = SERVER_URL + "/api/main"
             response = urequests.post(url, json=payload, headers=headers)
             
-            success = response.status_code == 200
+            success = response.status_code in (200, 202)
             response.close()
             
             if success:
@@ -453,7 +457,7 @@ class LoRaGateway:
                     fallback_url = fallback_base + "/api/main"
                     print("Retrying over HTTP:", fallback_url)
                     response = urequests.post(fallback_url, json=payload, headers=headers)
-                    success = response.status_code == 200
+                    success = response.status_code in (200, 202)
                     response.close()
                     if success:
                         self.packets_forwarded += 1